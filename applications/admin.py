@@ -1,10 +1,21 @@
 from django.contrib import admin
 
-from applications.models import Application
+from applications.models import Application, Attachment, OutboxMessage
 
 
 class ApplicationAdmin(admin.ModelAdmin):
     pass
 
 
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "content_type", "size", "sha256", "created_at")
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("id", "application", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+
+
 admin.site.register(Application, ApplicationAdmin)
+admin.site.register(Attachment, AttachmentAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
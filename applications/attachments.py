@@ -0,0 +1,56 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+
+from applications.models import Attachment
+
+
+def store_upload(upload: UploadedFile) -> Tuple[Attachment, bool]:
+    """
+    Streams the upload to disk chunk by chunk while hashing it, then keeps a single copy per content:
+    returns (attachment, created) where created is False when the same bytes were already stored.
+    """
+    root = Path(settings.MEDIA_ROOT)
+    tmp_dir = root / "attachments" / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    # Same filesystem as the final location, so the move below is an atomic rename
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        for chunk in upload.chunks():
+            digest.update(chunk)
+            tmp.write(chunk)
+            size += len(chunk)
+
+    try:
+        sha256 = digest.hexdigest()
+        existing = Attachment.objects.filter(sha256=sha256).first()
+        if existing:
+            return existing, False
+
+        attachment = Attachment(
+            sha256=sha256,
+            name=os.path.basename(upload.name or sha256),
+            content_type=upload.content_type or "application/octet-stream",
+            size=size,
+        )
+        target = root / attachment.path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp.name, target)
+        try:
+            with transaction.atomic():
+                attachment.save()
+            return attachment, True
+        except IntegrityError:
+            # A concurrent upload of the same content won the insert; the file it wrote is identical
+            return Attachment.objects.get(sha256=sha256), False
+    finally:
+        if os.path.exists(tmp.name):
+            os.unlink(tmp.name)
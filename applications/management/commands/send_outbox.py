@@ -0,0 +1,45 @@
+import os
+import socket
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from applications.outbox import claim_batch, deliver, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Delivers queued application emails over one reused SMTP connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--poll-interval", type=float, default=2.0)
+        parser.add_argument("--lease", type=int, default=300, help="Seconds before a claimed message is considered abandoned")
+        parser.add_argument("--once", action="store_true", help="Drain the due messages and exit")
+
+    def handle(self, *args, **options):
+        worker_id: str = options["worker_id"]
+        self.stdout.write(f"Outbox worker {worker_id} started")
+        connection = get_connection(fail_silently=False)
+
+        try:
+            while True:
+                # Long-lived process: drop connections the DB may have closed meanwhile
+                close_old_connections()
+                requeue_stale(options["lease"])
+                messages = claim_batch(worker_id, options["batch_size"])
+
+                if not messages:
+                    # Servers drop idle sessions anyway, release it until there is mail again
+                    connection.close()
+                    if options["once"]:
+                        return
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                delivered = deliver(messages, connection)
+                self.stdout.write(f"Delivered {delivered}/{len(messages)} messages")
+        finally:
+            connection.close()
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0001_initial'),
+        ('applications', '0002_remove_application_application_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='approved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='applications', to='campaigns.campaign'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='send_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
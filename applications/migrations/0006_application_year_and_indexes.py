@@ -0,0 +1,117 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+def season_year(application_date):
+    # Frozen copy of applications.models.season_year
+    if not application_date:
+        return None
+    return application_date.year + 1 if application_date.month >= 9 else application_date.year
+
+
+# How far an application got, used to pick the row kept among duplicates (higher wins)
+STATUS_PROGRESS = {
+    "NOT_APPLIED": 0,
+    "OTHER": 0,
+    "DRAFT": 1,
+    "APPLIED": 2,
+    "IGNORED": 3,
+    "POSTPONED": 4,
+    "IN_DISCUSSION": 4,
+    "CANCELLED": 5,
+    "REJECTED": 5,
+    "ACCEPTED": 6,
+}
+
+# Copied from a removed duplicate when the kept application has no value
+MERGED_FIELDS = (
+    "email_subject",
+    "message",
+    "attachments_sent",
+    "attachments_received",
+    "answer_date",
+    "follow_up_date",
+    "response_details",
+    "performance_details",
+    "payment_amount",
+    "comments",
+    "campaign_id",
+)
+# True on the kept application when true on any duplicate
+MERGED_FLAGS = ("approved", "answer_received", "contract_received", "contract_signed", "payment_received")
+
+
+def keep_order(application):
+    # Most advanced status first, then the latest date, then the latest row
+    return (
+        STATUS_PROGRESS.get(application.application_status, 0),
+        application.application_date,
+        application.id,
+    )
+
+
+def fill_application_year(apps, schema_editor):
+    """
+    Stores the season of every existing application and resolves festivals that already have several
+    applications for one season, so the unique constraint can be added.
+
+    DATA LOSS: of each duplicate group only one application is kept, chosen by keep_order. Fields
+    empty on it are filled from the others (MERGED_FIELDS / MERGED_FLAGS), their attachments and
+    outbox messages are moved to it, and the other rows are then DELETED. Values that conflict with
+    the kept row (e.g. a different message) are lost. Not reversible.
+    """
+    Application = apps.get_model("applications", "Application")
+    OutboxMessage = apps.get_model("applications", "OutboxMessage")
+
+    groups = {}
+    for application in Application.objects.exclude(application_date__isnull=True):
+        key = (application.festival_id, season_year(application.application_date))
+        groups.setdefault(key, []).append(application)
+
+    for (_, year), applications in groups.items():
+        kept, *duplicates = sorted(applications, key=keep_order, reverse=True)
+        for duplicate in duplicates:
+            for field in MERGED_FIELDS:
+                if getattr(kept, field) in (None, "", [], {}):
+                    setattr(kept, field, getattr(duplicate, field))
+            for flag in MERGED_FLAGS:
+                setattr(kept, flag, bool(getattr(kept, flag) or getattr(duplicate, flag)))
+            kept.attachments.add(*duplicate.attachments.all())
+            OutboxMessage.objects.filter(application_id=duplicate.id).update(application_id=kept.id)
+        Application.objects.filter(id__in=[d.id for d in duplicates]).delete()
+        # Historical models have no custom save(), the year is set explicitly
+        kept.application_year = year
+        kept.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0005_attachment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='application_year',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_application_year, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['application_status'], name='application_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['application_date'], name='application_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['updated_at'], name='application_updated_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='application',
+            constraint=models.UniqueConstraint(fields=('festival', 'application_year'), name='unique_application_per_festival_year'),
+        ),
+    ]
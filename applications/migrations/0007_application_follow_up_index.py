@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0006_application_year_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['follow_up_date'], name='application_follow_up_date_idx'),
+        ),
+    ]
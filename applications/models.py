@@ -1,7 +1,36 @@
+from datetime import date
 from django.db import models
+from django.utils import timezone
 
 from festivals.models import Festival
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+
+def season_year(application_date: Optional[date]) -> Optional[int]:
+    """Festival year an application is for: applications sent from September on are for next year."""
+    if not application_date:
+        return None
+    if 9 <= application_date.month <= 12:
+        return application_date.year + 1
+    return application_date.year
+
+
+class Attachment(models.Model):
+    """A file stored once on disk under its content hash and shared by every application that sends it."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default="application/octet-stream")
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self) -> str:
+        # Relative to MEDIA_ROOT; fanned out so no directory grows too large
+        return f"attachments/{self.sha256[:2]}/{self.sha256}"
+
+    def __str__(self):
+        return f"{self.name} ({self.sha256[:12]})"
 
 
 class Application(models.Model):
@@ -26,6 +55,20 @@ class Application(models.Model):
 
     festival = models.ForeignKey(Festival, on_delete=models.CASCADE)
     application_date = models.DateField(blank=True, null=True)
+    # Derived from application_date on save(); stored so one application per festival and season
+    # can be enforced by the database
+    application_year = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    # Set for drafts generated by a mail-merge campaign
+    campaign = models.ForeignKey(
+        "campaigns.Campaign",
+        on_delete=models.SET_NULL,
+        related_name="applications",
+        blank=True,
+        null=True,
+    )
+    # Campaign drafts are only sent once reviewed and approved
+    approved = models.BooleanField(default=False)
+    send_error = models.TextField(blank=True, null=True)
     application_method = models.CharField(
         max_length=50,
         choices=APPLICATION_TYPE,
@@ -36,6 +79,7 @@ class Application(models.Model):
     email_subject = models.CharField(max_length=100, blank=True, null=True)
     message = models.CharField(max_length=2000, blank=True, null=True)
     attachments_sent = models.JSONField(blank=True, null=True)
+    attachments = models.ManyToManyField(Attachment, blank=True, related_name="applications")
     attachments_received = models.JSONField(blank=True, null=True)
     answer_received = models.BooleanField(default=False)
     answer_date = models.DateField(blank=True, null=True)
@@ -55,19 +99,80 @@ class Application(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["festival", "application_year"], name="unique_application_per_festival_year"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["application_status"], name="application_status_idx"),
+            models.Index(fields=["application_date"], name="application_date_idx"),
+            models.Index(fields=["follow_up_date"], name="application_follow_up_date_idx"),
+            models.Index(fields=["updated_at"], name="application_updated_at_idx"),
+        ]
+
+    def __str__(self):
+        # Campaign drafts get their date when they are queued for sending
+        season = self.application_date.year if self.application_date else "draft"
+        return f"{self.festival.festival_name} {season}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so save() only recomputes the season when the date actually changed
+        instance._loaded_application_date = instance.__dict__.get("application_date")
+        return instance
+
+    def application_date_changed(self) -> bool:
+        if "application_date" in self.get_deferred_fields():
+            return False
+        if self._state.adding or not hasattr(self, "_loaded_application_date"):
+            return True
+        return self.application_date != self._loaded_application_date
+
+    def save(self, *args, **kwargs):
+        # Rows whose season was resolved by hand (or by migration 0006) keep it until their date changes
+        if self.application_date_changed():
+            self.application_year = season_year(self.application_date)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "application_year"}
+        super().save(*args, **kwargs)
+        self._loaded_application_date = self.__dict__.get("application_date")
+
+
+class OutboxMessage(models.Model):
+    """An email waiting to be delivered by the `send_outbox` worker, written in the same transaction as its Application."""
+
+    STATUS: List[Tuple[str, str]] = [
+        ("PENDING", "Pending"),
+        ("SENDING", "Sending"),
+        ("SENT", "Sent"),
+        ("FAILED", "Failed"),
+    ]
+
+    application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name="outbox_messages")
+    subject = models.CharField(max_length=200)
+    from_email = models.CharField(max_length=200)
+    to = models.JSONField(default=list)
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    # [{"name": ..., "path": <storage path>, "content_type": ...}]
+    attachments = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS, default="PENDING")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
     def __str__(self):
-        return f"{self.festival.festival_name} {self.application_date.year}"
-    
-    @property
-    def application_year(self) -> int:
-        """Derive the festival year based on the application date."""
-        if not self.application_date:
-            return None
-
-        month = self.application_date.month
-        year = self.application_date.year
-
-        if 9 <= month <= 12:
-            return year + 1
-        else:
-            return year
\ No newline at end of file
+        return f"Outbox #{self.pk} for application {self.application_id} ({self.status})"
@@ -0,0 +1,213 @@
+import base64
+import logging
+import random
+from datetime import datetime, timedelta
+from email.mime.base import MIMEBase
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.message import DEFAULT_ATTACHMENT_MIME_TYPE
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from applications.models import Application, Attachment, OutboxMessage
+from campaigns.models import Campaign
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk: a multiple of 57, so every chunk encodes to whole 76 character base64 lines
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+
+
+def queue_application_email(
+    application: Application,
+    attachments: Iterable[Attachment],
+    names: Optional[List[str]] = None,
+    to: Optional[List[str]] = None,
+    not_before: Optional[datetime] = None,
+) -> OutboxMessage:
+    """
+    Must run inside the transaction that saves `application`, so both commit or neither does.
+    `names` overrides the stored attachment names (the name a file had in this upload).
+    `to` defaults to APPLICATION_TO_EMAIL; `not_before` delays the first attempt (send throttling).
+    """
+    attachments = list(attachments)
+    names = names or [attachment.name for attachment in attachments]
+    return OutboxMessage.objects.create(
+        application=application,
+        subject=application.email_subject,
+        from_email=settings.APPLICATION_FROM_EMAIL,
+        to=to or [settings.APPLICATION_TO_EMAIL],
+        text_body=strip_tags(application.message),  # plain text fallback
+        html_body=application.message,  # Tiptap HTML
+        # The worker reads the files from the attachment store, only references are queued
+        attachments=[
+            {"name": name, "path": attachment.path, "content_type": attachment.content_type}
+            for name, attachment in zip(names, attachments)
+        ],
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+        next_attempt_at=not_before or timezone.now(),
+    )
+
+
+def claim_batch(worker_id: str, limit: int) -> List[OutboxMessage]:
+    """
+    Moves up to `limit` due messages to SENDING for this worker. As in jobs.queue.claim_next the
+    conditional UPDATE is the lock, so several workers never pick the same message.
+    """
+    candidates = list(
+        OutboxMessage.objects.filter(status="PENDING", next_attempt_at__lte=timezone.now())
+        .order_by("next_attempt_at", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    claimed = [
+        message_id
+        for message_id in candidates
+        if OutboxMessage.objects.filter(id=message_id, status="PENDING").update(
+            status="SENDING",
+            locked_by=worker_id,
+            locked_at=timezone.now(),
+            attempts=F("attempts") + 1,
+            updated_at=timezone.now(),
+        )
+    ]
+    return list(OutboxMessage.objects.filter(id__in=claimed).order_by("next_attempt_at", "id"))
+
+
+def requeue_stale(lease_seconds: int) -> int:
+    """
+    Puts back messages whose worker died between claiming and recording the delivery, or fails them once
+    they have used up their attempts (as jobs.queue.requeue_stale does).
+    Delivery is at-least-once: the worker may have died after the SMTP server accepted the email but
+    before mark_sent, and the message is then sent again.
+    """
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds)
+    stale = OutboxMessage.objects.filter(status="SENDING", locked_at__lt=cutoff)
+    error = "Worker lease expired"
+    exhausted = list(stale.filter(attempts__gte=F("max_attempts")).values_list("id", "application_id"))
+    with transaction.atomic():
+        failed = stale.filter(id__in=[message_id for message_id, _ in exhausted]).update(
+            status="FAILED", last_error=error, locked_by=None, locked_at=None, updated_at=timezone.now()
+        )
+        # The application stays a DRAFT, the error shows in its review list
+        Application.objects.filter(pk__in=[application_id for _, application_id in exhausted]).update(
+            send_error=error, updated_at=timezone.now()
+        )
+    requeued = stale.update(status="PENDING", locked_by=None, locked_at=None, updated_at=timezone.now())
+    for _, application_id in exhausted:
+        refresh_campaign_status(application_id)
+    return failed + requeued
+
+
+def retry_delay(attempts: int) -> float:
+    # Capped exponential backoff, jittered so failed messages do not retry in lockstep
+    ceiling = min(settings.OUTBOX_RETRY_MAX_DELAY, settings.OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def build_email(message: OutboxMessage, connection) -> EmailMultiAlternatives:
+    email = EmailMultiAlternatives(
+        message.subject, message.text_body, message.from_email, message.to, connection=connection
+    )
+    if message.html_body:
+        email.attach_alternative(message.html_body, "text/html")
+    for attachment in message.attachments:
+        email.attach(attachment_part(attachment["path"], attachment["name"], attachment["content_type"]))
+    return email
+
+
+def attachment_part(path: str, name: str, content_type: str) -> MIMEBase:
+    """
+    MIME part of a stored attachment, read and base64-encoded in chunks so the raw file is never held
+    whole. The encoded payload (4/3 of the file) still is: the email package and the SMTP send serialize
+    the message from memory, and joining the chunks briefly holds the encoded data twice.
+    """
+    maintype, _, subtype = (content_type or DEFAULT_ATTACHMENT_MIME_TYPE).partition("/")
+    with default_storage.open(path, "rb") as fh:
+        payload = "".join(
+            base64.encodebytes(chunk).decode("ascii") for chunk in iter(lambda: fh.read(ATTACHMENT_CHUNK_SIZE), b"")
+        )
+    part = MIMEBase(maintype, subtype)
+    part.set_payload(payload)
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=name)
+    return part
+
+
+def mark_sent(message: OutboxMessage) -> None:
+    with transaction.atomic():
+        OutboxMessage.objects.filter(pk=message.pk).update(
+            status="SENT", sent_at=timezone.now(), last_error=None, locked_by=None, updated_at=timezone.now()
+        )
+        Application.objects.filter(pk=message.application_id, application_status="DRAFT").update(
+            application_status="APPLIED", send_error=None, updated_at=timezone.now()
+        )
+    refresh_campaign_status(message.application_id)
+
+
+def mark_failed(message: OutboxMessage, error: Exception) -> None:
+    give_up = message.attempts >= message.max_attempts
+    with transaction.atomic():
+        OutboxMessage.objects.filter(pk=message.pk).update(
+            status="FAILED" if give_up else "PENDING",
+            next_attempt_at=timezone.now() + timedelta(seconds=retry_delay(message.attempts)),
+            last_error=str(error),
+            locked_by=None,
+            locked_at=None,
+            updated_at=timezone.now(),
+        )
+        if give_up:
+            # The application stays a DRAFT, the error shows in its review list
+            Application.objects.filter(pk=message.application_id).update(
+                send_error=str(error), updated_at=timezone.now()
+            )
+    if give_up:
+        refresh_campaign_status(message.application_id)
+
+
+def refresh_campaign_status(application_id: int) -> None:
+    """Moves a SENDING campaign on once none of its emails is waiting in the outbox any more."""
+    campaign_id = Application.objects.filter(pk=application_id).values_list("campaign_id", flat=True).first()
+    if campaign_id is None:
+        return
+    campaign = Campaign.objects.filter(pk=campaign_id, status="SENDING").first()
+    if campaign is None:
+        return
+    if OutboxMessage.objects.filter(application__campaign=campaign, status__in=["PENDING", "SENDING"]).exists():
+        return
+    remaining = campaign.applications.filter(application_status="DRAFT").exists()
+    Campaign.objects.filter(pk=campaign.pk, status="SENDING").update(
+        status="REVIEW" if remaining else "SENT", updated_at=timezone.now()
+    )
+
+
+def deliver(messages: List[OutboxMessage], connection) -> int:
+    """
+    Sends the messages over `connection`, a mail backend kept open for the whole batch (and across
+    batches by the worker), so only the first message pays the SMTP/TLS handshake.
+    Returns the number delivered.
+    """
+    delivered = 0
+    for message in messages:
+        # Renew the claim; if the lease expired and another worker took the message over, leave it to them
+        if not OutboxMessage.objects.filter(pk=message.pk, status="SENDING", locked_by=message.locked_by).update(
+            locked_at=timezone.now()
+        ):
+            continue
+        try:
+            # No-op while the session is open; a failed open counts as a failed attempt
+            connection.open()
+            build_email(message, connection).send()
+        except Exception as e:
+            logger.warning("Outbox message %s attempt %s failed: %s", message.pk, message.attempts, e)
+            mark_failed(message, e)
+            # The session may be dead after an error, the next message opens a fresh one
+            connection.close()
+            continue
+        mark_sent(message)
+        delivered += 1
+    return delivered
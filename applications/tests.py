@@ -1,3 +1,427 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import smtplib
+import os
+import tempfile
+from datetime import date, timedelta
+from typing import List
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from applications.models import Application, Attachment, OutboxMessage, season_year
+from applications.outbox import attachment_part, claim_batch, deliver, queue_application_email, requeue_stale
+from circus_agent_backend.serializers import ApplicationSerializer
+from festivals.models import Festival
+
+
+def query_plan(queryset) -> str:
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+
+
+class SeasonYearTests(TestCase):
+    def test_september_onwards_is_next_season(self):
+        self.assertEqual(season_year(date(2025, 8, 31)), 2025)
+        self.assertEqual(season_year(date(2025, 9, 1)), 2026)
+        self.assertIsNone(season_year(None))
+
+
+class ApplicationPerSeasonTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.festival = Festival.objects.create(festival_name="Festival", contact_email="info@example.com")
+        cls.application = Application.objects.create(festival=cls.festival, application_date=date(2025, 10, 1))
+
+    def test_save_sets_application_year(self):
+        self.assertEqual(self.application.application_year, 2026)
+        self.application.application_date = date(2026, 10, 1)
+        self.application.save(update_fields=["application_date"])
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.application_year, 2027)
+
+    def test_second_application_in_season_is_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Application.objects.create(festival=self.festival, application_date=date(2026, 3, 1))
+
+    def test_undated_drafts_do_not_conflict(self):
+        Application.objects.create(festival=self.festival)
+        Application.objects.create(festival=self.festival)
+        self.assertEqual(Application.objects.filter(application_year__isnull=True).count(), 2)
+
+    def test_festival_season_lookup_uses_unique_index(self):
+        # SQLite backs the unique constraint with an automatic index (sqlite_autoindex_...)
+        queryset = Application.objects.filter(festival=self.festival, application_year=2026)
+        self.assertIn("USING INDEX sqlite_autoindex_applications_application", query_plan(queryset))
+        self.assertIn("(festival_id=? AND application_year=?)", query_plan(queryset))
+
+    def test_status_filter_uses_index(self):
+        self.assertIn("application_status_idx", query_plan(Application.objects.filter(application_status="DRAFT")))
+
+
+class ApplicationApiUniquenessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.festival = Festival.objects.create(festival_name="Festival")
+        cls.application = Application.objects.create(festival=cls.festival, application_date=date(2025, 10, 1))
+        # A row left without a season, as older data can be
+        cls.legacy = Application.objects.create(festival=cls.festival)
+        Application.objects.filter(pk=cls.legacy.pk).update(application_date=date(2025, 9, 9))
+
+    def test_patch_without_date_change_keeps_year(self):
+        response = APIClient().patch(f"/api/applications/{self.legacy.pk}/", {"comments": "Called"}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.legacy.refresh_from_db()
+        self.assertIsNone(self.legacy.application_year)
+        self.assertEqual(self.legacy.comments, "Called")
+
+    def test_patch_into_taken_season_is_rejected(self):
+        response = APIClient().patch(
+            f"/api/applications/{self.legacy.pk}/", {"application_date": "2026-01-15"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("application_date", response.data)
+
+    def test_duplicate_post_is_rejected(self):
+        response = APIClient().post(
+            "/api/applications/", {"festival": self.festival.pk, "application_date": "2025-11-01"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = APIClient().post(
+            "/api/applications/", {"festival": self.festival.pk, "application_date": "2026-11-01"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["application_year"], 2027)
+
+
+class ApplicationFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        festival = Festival.objects.create(festival_name="Paris Rue", country="France")
+        other = Festival.objects.create(festival_name="Madrid Calle", country="Spain")
+        cls.due = Application.objects.create(
+            festival=festival, application_status="APPLIED", follow_up_date=today - timedelta(days=1)
+        )
+        cls.later = Application.objects.create(
+            festival=other, application_status="IN_DISCUSSION", follow_up_date=today + timedelta(days=7)
+        )
+        cls.paid = Application.objects.create(festival=other, application_status="ACCEPTED", payment_received=True)
+
+    def list_ids(self, **params):
+        response = APIClient().get("/api/applications/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [application["id"] for application in response.data["results"]]
+
+    def test_follow_up_due(self):
+        self.assertEqual(self.list_ids(follow_up_due="true"), [self.due.pk])
+        self.assertEqual(self.list_ids(follow_up_due="false"), [self.later.pk, self.paid.pk])
+
+    def test_status_payment_and_festival_country(self):
+        self.assertEqual(self.list_ids(status=["APPLIED", "IN_DISCUSSION"]), [self.due.pk, self.later.pk])
+        self.assertEqual(self.list_ids(payment_received="true"), [self.paid.pk])
+        self.assertEqual(self.list_ids(country="Spain", ordering="status"), [self.paid.pk, self.later.pk])
+
+    def test_follow_up_filter_uses_index(self):
+        plan = query_plan(Application.objects.filter(follow_up_date__lte=date(2026, 1, 1)))
+        self.assertIn("application_follow_up_date_idx", plan)
+
+
+class ApplicationListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        festival = Festival.objects.create(festival_name="Festival")
+        attachment = Attachment.objects.create(sha256="a" * 64, name="cv.pdf", size=10)
+        for i in range(5):
+            application = Application.objects.create(festival=festival, payment_amount="12.5" if i else None)
+            if i % 2:
+                application.attachments.add(attachment)
+
+    def test_pages_match_model_serializer(self):
+        client, url, results = APIClient(), "/api/applications/?page_size=2", []
+        while url:
+            page = client.get(url).json()
+            results += page["results"]
+            url = page["next"]
+        expected = ApplicationSerializer(Application.objects.order_by("id"), many=True).data
+        self.assertEqual(results, json.loads(json.dumps(expected)))
+
+
+def executor_leaf_nodes():
+    return MigrationExecutor(connection).loader.graph.leaf_nodes()
+
+
+class DuplicateSeasonMigrationTests(TransactionTestCase):
+    before = [("applications", "0005_attachment")]
+    after = [("applications", "0006_application_year_and_indexes")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(executor_leaf_nodes())
+
+    def test_duplicates_are_merged_into_the_most_advanced(self):
+        apps = self.migrate(self.before)
+        # The festivals app stays migrated, so its current model matches the table
+        festival = Festival.objects.create(festival_name="Festival")
+        Application = apps.get_model("applications", "Application")
+        OutboxMessage = apps.get_model("applications", "OutboxMessage")
+        draft = Application.objects.create(
+            festival_id=festival.id, application_date=date(2025, 9, 9), application_status="DRAFT", comments="Call back"
+        )
+        applied_early = Application.objects.create(
+            festival_id=festival.id, application_date=date(2025, 9, 9), application_status="APPLIED"
+        )
+        applied_late = Application.objects.create(
+            festival_id=festival.id, application_date=date(2025, 10, 1), application_status="APPLIED"
+        )
+        other_season = Application.objects.create(
+            festival_id=festival.id, application_date=date(2025, 3, 1), application_status="DRAFT"
+        )
+        OutboxMessage.objects.create(application=applied_early, subject="S", from_email="a@b.c", to=["x@y.z"])
+
+        apps = self.migrate(self.after)
+        Application = apps.get_model("applications", "Application")
+        rows = {a.id: a for a in Application.objects.all()}
+        self.assertEqual(set(rows), {applied_late.id, other_season.id})
+        kept = rows[applied_late.id]
+        self.assertEqual((kept.application_year, kept.comments), (2026, "Call back"))
+        self.assertEqual(rows[other_season.id].application_year, 2025)
+        self.assertEqual(
+            list(apps.get_model("applications", "OutboxMessage").objects.values_list("application_id", flat=True)),
+            [kept.id],
+        )
+        self.assertFalse(Application.objects.filter(id=draft.id).exists())
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """locmem backend that refuses messages to any address in `refused`, like an SMTP server would."""
+
+    refused: List[str] = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & set(self.refused):
+                raise smtplib.SMTPRecipientsRefused({address: (550, b"No such user") for address in message.to})
+        return super().send_messages(messages)
+
+
+class AttachmentStoreTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+
+    def upload(self, name: str, content: bytes):
+        upload = SimpleUploadedFile(name, content, content_type="application/pdf")
+        return self.client.post("/api/applications/attachments/", {"file": upload}, format="multipart")
+
+    def test_same_content_is_stored_once(self):
+        content = b"%PDF-1.4 dossier" * 10_000
+        first = self.upload("dossier.pdf", content)
+        second = self.upload("dossier-copy.pdf", content)
+        other = self.upload("rider.pdf", b"%PDF-1.4 rider")
+
+        self.assertEqual((first.status_code, second.status_code, other.status_code), (201, 200, 201))
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(
+            (first.data["sha256"], first.data["size"], first.data["name"]),
+            (hashlib.sha256(content).hexdigest(), len(content), "dossier.pdf"),
+        )
+        self.assertEqual(Attachment.objects.count(), 2)
+        with default_storage.open(Attachment.objects.get(pk=first.data["id"]).path, "rb") as fh:
+            self.assertEqual(fh.read(), content)
+        # No temporary file is left behind
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "attachments", "tmp")), [])
+
+    def test_missing_file_is_rejected(self):
+        response = self.client.post("/api/applications/attachments/", {}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(EMAIL_BACKEND="applications.tests.FlakyEmailBackend", OUTBOX_RETRY_BASE_DELAY=60)
+class OutboxTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        FlakyEmailBackend.refused = []
+
+        content = b"%PDF-1.4 dossier"
+        self.attachment = Attachment.objects.create(
+            sha256=hashlib.sha256(content).hexdigest(),
+            name="dossier.pdf",
+            content_type="application/pdf",
+            size=len(content),
+        )
+        default_storage.save(self.attachment.path, ContentFile(content))
+
+        self.messages = []
+        for index in range(3):
+            festival = Festival.objects.create(festival_name=f"Festival {index}")
+            application = Application.objects.create(
+                festival=festival,
+                application_status="DRAFT",
+                email_subject=f"Application {index}",
+                message="<p>Hello</p>",
+            )
+            self.messages.append(
+                queue_application_email(application, [self.attachment], to=[f"festival{index}@example.com"])
+            )
+
+    def refresh(self, message: OutboxMessage) -> OutboxMessage:
+        message.refresh_from_db()
+        return message
+
+    def make_due(self) -> None:
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+
+    def test_workers_never_claim_the_same_message(self):
+        later = self.messages[2]
+        OutboxMessage.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+        first = claim_batch("worker-a", limit=1)
+        second = claim_batch("worker-b", limit=10)
+        self.assertEqual([m.pk for m in first], [self.messages[0].pk])
+        self.assertEqual([m.pk for m in second], [self.messages[1].pk])
+        self.assertEqual(claim_batch("worker-c", limit=10), [])
+        self.assertEqual((first[0].status, first[0].locked_by, first[0].attempts), ("SENDING", "worker-a", 1))
+
+    def test_delivery_sends_body_and_attachments(self):
+        with mail.get_connection() as connection:
+            self.assertEqual(deliver(claim_batch("worker-a", limit=10), connection), 3)
+
+        self.assertEqual(len(mail.outbox), 3)
+        email = mail.outbox[0]
+        self.assertEqual((email.subject, email.to, email.body), ("Application 0", ["festival0@example.com"], "Hello"))
+        self.assertEqual(email.alternatives, [("<p>Hello</p>", "text/html")])
+        [attachment] = email.attachments
+        self.assertEqual(
+            (attachment.get_filename(), attachment.get_content_type(), attachment.get_payload(decode=True)),
+            ("dossier.pdf", "application/pdf", b"%PDF-1.4 dossier"),
+        )
+        message = self.refresh(self.messages[0])
+        self.assertEqual(message.status, "SENT")
+        self.assertEqual(message.application.application_status, "APPLIED")
+
+    def test_attachments_are_encoded_in_chunks(self):
+        content = bytes(range(256)) * 3
+        default_storage.save("attachments/large", ContentFile(content))
+        with mock.patch("applications.outbox.ATTACHMENT_CHUNK_SIZE", 57):
+            part = attachment_part("attachments/large", "Programme été.bin", "")
+
+        self.assertEqual(part.get_content_type(), "application/octet-stream")
+        self.assertEqual(part.get_filename(), "Programme été.bin")
+        self.assertEqual(part.get_payload(decode=True), content)
+        # Chunks join into regular base64 lines, the message stays valid on the wire
+        lines = part.get_payload().splitlines()
+        self.assertTrue(all(len(line) == 76 for line in lines[:-1]))
+        self.assertIn(b"Content-Transfer-Encoding: base64", part.as_bytes())
+
+    def test_failed_attempt_is_retried_after_backoff(self):
+        FlakyEmailBackend.refused = ["festival1@example.com"]
+        with self.assertLogs("applications.outbox", "WARNING"), mail.get_connection() as connection:
+            self.assertEqual(deliver(claim_batch("worker-a", limit=10), connection), 2)
+
+        failed = self.refresh(self.messages[1])
+        self.assertEqual((failed.status, failed.attempts, failed.locked_by), ("PENDING", 1, None))
+        self.assertIn("No such user", failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=29))
+        self.assertEqual(failed.application.application_status, "DRAFT")
+        # Not due yet
+        self.assertEqual(claim_batch("worker-a", limit=10), [])
+
+        FlakyEmailBackend.refused = []
+        self.make_due()
+        with mail.get_connection() as connection:
+            self.assertEqual(deliver(claim_batch("worker-a", limit=10), connection), 1)
+        failed = self.refresh(failed)
+        self.assertEqual((failed.status, failed.attempts, failed.last_error), ("SENT", 2, None))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_gives_up_after_max_attempts(self):
+        FlakyEmailBackend.refused = ["festival0@example.com"]
+        OutboxMessage.objects.update(max_attempts=2)
+        with self.assertLogs("applications.outbox", "WARNING"):
+            for _ in range(2):
+                with mail.get_connection() as connection:
+                    deliver(claim_batch("worker-a", limit=10), connection)
+                self.make_due()
+
+        message = self.refresh(self.messages[0])
+        self.assertEqual((message.status, message.attempts), ("FAILED", 2))
+        self.assertIn("No such user", message.application.send_error)
+        self.assertEqual(message.application.application_status, "DRAFT")
+        self.assertEqual(claim_batch("worker-a", limit=10), [])
+
+    def test_delivering_a_claimed_batch_again_sends_nothing(self):
+        batch = claim_batch("worker-a", limit=10)
+        with mail.get_connection() as connection:
+            self.assertEqual(deliver(batch, connection), 3)
+            # Delivering the same claimed batch again sends nothing
+            self.assertEqual(deliver(batch, connection), 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_expired_claim_is_left_to_the_worker_that_took_it_over(self):
+        stale_batch = claim_batch("worker-a", limit=10)
+        OutboxMessage.objects.update(locked_at=timezone.now() - timedelta(seconds=600))
+        self.assertEqual(requeue_stale(300), 3)
+        current_batch = claim_batch("worker-b", limit=10)
+
+        with mail.get_connection() as connection:
+            self.assertEqual(deliver(stale_batch, connection), 0)
+            self.assertEqual(deliver(current_batch, connection), 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_stale_message_out_of_attempts_fails_instead_of_being_requeued(self):
+        OutboxMessage.objects.filter(pk=self.messages[0].pk).update(max_attempts=1)
+        claim_batch("worker-a", limit=10)
+        OutboxMessage.objects.update(locked_at=timezone.now() - timedelta(seconds=600))
+        self.assertEqual(requeue_stale(300), 3)
+
+        exhausted = self.refresh(self.messages[0])
+        self.assertEqual((exhausted.status, exhausted.locked_by), ("FAILED", None))
+        self.assertEqual(exhausted.application.send_error, "Worker lease expired")
+        self.assertEqual(exhausted.application.application_status, "DRAFT")
+        statuses = OutboxMessage.objects.order_by("id").values_list("status", flat=True)
+        self.assertEqual(list(statuses), ["FAILED", "PENDING", "PENDING"])
+        self.assertEqual(len(claim_batch("worker-b", limit=10)), 2)
+
+    def test_send_outbox_command(self):
+        FlakyEmailBackend.refused = ["festival2@example.com"]
+        output = io.StringIO()
+        with self.assertLogs("applications.outbox", "WARNING"):
+            call_command("send_outbox", once=True, worker_id="worker-a", stdout=output)
+        self.assertIn("Delivered 2/3 messages", output.getvalue())
+        self.assertEqual(
+            list(OutboxMessage.objects.order_by("id").values_list("status", flat=True)), ["SENT", "SENT", "PENDING"]
+        )
+
+        # The retry is not due yet: a second run finds nothing to send
+        output = io.StringIO()
+        call_command("send_outbox", once=True, worker_id="worker-a", stdout=output)
+        self.assertNotIn("Delivered", output.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
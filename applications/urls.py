@@ -1,9 +1,11 @@
 from django.urls import path, include, URLPattern
 from rest_framework.routers import DefaultRouter
-from applications.views import ApplicationViewSet
+from applications.views import ApplicationViewSet, AttachmentViewSet
 from typing import List
 
 router: DefaultRouter = DefaultRouter()
+# Registered first so "attachments" is not read as an application id
+router.register(r"attachments", AttachmentViewSet, basename="attachment")
 router.register(r"", ApplicationViewSet, basename="application")
 urlpatterns: List[URLPattern] = [
     path("", include(router.urls)),
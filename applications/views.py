@@ -1,9 +1,96 @@
-from rest_framework import viewsets
-from applications.models import Application
-from circus_agent_backend.serializers import ApplicationSerializer
+from django.db import IntegrityError, transaction
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from applications.attachments import store_upload
+from applications.models import Application, Attachment
+from festivals.models import Festival
+from circus_agent_backend.fieldsets import SparseFieldsetMixin
+from circus_agent_backend.filters import (
+    Filter,
+    QueryFilterBackend,
+    due_on_or_before,
+    parse_bool,
+    parse_int,
+    parse_iso_date,
+)
+from circus_agent_backend.pagination import KeysetPagination
+from circus_agent_backend.serializers import ApplicationSerializer, AttachmentSerializer
 
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+class ApplicationViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Application.objects.all()
     # Class used to convert JSON into Django Model objects and vice versa
     serializer_class = ApplicationSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [QueryFilterBackend]
+    # ?ordering= keys for the list endpoint, prefix with "-" for descending
+    cursor_orderings = {
+        "id": "id",
+        "name": "festival__festival_name",
+        "status": "application_status",
+        "application_date": "application_date",
+        "follow_up_date": "follow_up_date",
+        "updated": "updated_at",
+    }
+    # List filters, e.g. ?status=APPLIED&status=IN_DISCUSSION&follow_up_due=true
+    query_filters = {
+        "festival": Filter("festival_id", parse=parse_int, many=True),
+        "campaign": Filter("campaign_id", parse=parse_int),
+        "status": Filter("application_status", choices=Application.APPLICATION_STATUS, many=True),
+        "application_method": Filter("application_method", choices=Application.APPLICATION_TYPE, many=True),
+        "application_year": Filter("application_year", parse=parse_int),
+        "application_date_after": Filter("application_date__gte", parse=parse_iso_date),
+        "application_date_before": Filter("application_date__lte", parse=parse_iso_date),
+        "follow_up_due": Filter(
+            parse=parse_bool,
+            method=due_on_or_before("follow_up_date"),
+            help_text="true: follow-up date is today or past",
+        ),
+        "follow_up_before": Filter("follow_up_date__lte", parse=parse_iso_date),
+        "answer_received": Filter("answer_received", parse=parse_bool),
+        "payment_received": Filter("payment_received", parse=parse_bool),
+        "contract_signed": Filter("contract_signed", parse=parse_bool),
+        "approved": Filter("approved", parse=parse_bool),
+        "country": Filter("festival__country", many=True),
+        "festival_type": Filter("festival__festival_type", choices=Festival.FESTIVAL_TYPES, many=True),
+    }
+
+    # The serializer checks the one-per-season constraint; a concurrent write can still win the race
+    def perform_create(self, serializer):
+        self._save_unique(serializer)
+
+    def perform_update(self, serializer):
+        self._save_unique(serializer)
+
+    @staticmethod
+    def _save_unique(serializer):
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({"application_date": "An application already exists for this festival and year"})
+
+
+# Upload once, then reference by id from `apply`. Uploading the same content again returns the stored file.
+class AttachmentViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = Attachment.objects.all().order_by("-created_at")
+    serializer_class = AttachmentSerializer
+    parser_classes = [MultiPartParser]
+
+    def create(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+
+        attachment, created = store_upload(upload)
+        return Response(
+            self.get_serializer(attachment).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from campaigns.models import Campaign
+
+
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "send_rate_per_minute", "created_at")
+    list_filter = ("status",)
+
+
+admin.site.register(Campaign, CampaignAdmin)
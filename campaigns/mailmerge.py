@@ -0,0 +1,204 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from applications.models import Application, season_year
+from applications.outbox import queue_application_email
+from campaigns.models import Campaign
+from circus_agent_backend.serializers import FestivalLookupSerializer
+from festivals.helpers import generate_application_mail_prompt
+from festivals.models import Festival
+from services.errors import LLMError
+from services.mistral_service import MistralClient
+
+logger = logging.getLogger(__name__)
+
+# Fields a campaign's festival_filter may use as exact-match lookups, validated by the serializer
+CAMPAIGN_FILTER_FIELDS = tuple(FestivalLookupSerializer().fields)
+
+DRAFT_CREATE_BATCH_SIZE = 50
+
+# Outbox states meaning the draft's email is queued or delivered already
+ACTIVE_OUTBOX_STATUSES = ("PENDING", "SENDING", "SENT")
+
+
+def campaign_festivals(campaign: Campaign) -> QuerySet:
+    """Festivals matching the campaign filter that have a contact email and no application this season."""
+    lookups = {field: value for field, value in campaign.festival_filter.items() if field in CAMPAIGN_FILTER_FIELDS}
+    already_applied = Application.objects.filter(application_year=season_year(timezone.now().date()))
+    return (
+        Festival.objects.filter(**lookups)
+        .exclude(contact_email__isnull=True)
+        .exclude(contact_email="")
+        .exclude(id__in=already_applied.values("festival_id"))
+        .exclude(id__in=campaign.applications.values("festival_id"))
+        .order_by("id")
+    )
+
+
+def generate_drafts(
+    campaign: Campaign,
+    mistral_client: MistralClient,
+    concurrency: int = 8,
+    regenerate: bool = False,
+    report_progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Generates one personalised email per campaign festival, `concurrency` LLM calls at a time, and
+    stores them as unapproved DRAFT applications. Festivals that already have a draft are skipped,
+    so re-running only fills the gaps left by failures.
+    """
+    festivals: List[Festival] = list(campaign_festivals(campaign))
+    Campaign.objects.filter(pk=campaign.pk).update(status="GENERATING", updated_at=timezone.now())
+
+    def generate(festival: Festival) -> str:
+        return mistral_client.chat(
+            prompt=generate_application_mail_prompt(festival),
+            cache_policy="application_mail",
+            regenerate=regenerate,
+        )
+
+    pending: List[Application] = []
+    created = 0
+    failures: List[Dict[str, Any]] = []
+    finished = False
+    try:
+        # LLM calls run in the pool, DB writes stay on this thread
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {executor.submit(generate, festival): festival for festival in festivals}
+            for done, future in enumerate(as_completed(futures), start=1):
+                festival = futures[future]
+                try:
+                    message = future.result()
+                except LLMError as e:
+                    failures.append({"festival_id": festival.pk, "error": str(e), "error_type": type(e).__name__})
+                else:
+                    pending.append(
+                        Application(
+                            festival=festival,
+                            campaign=campaign,
+                            application_method="EMAIL",
+                            application_status="DRAFT",
+                            email_subject=campaign.email_subject,
+                            message=message[: Application._meta.get_field("message").max_length],
+                        )
+                    )
+
+                if len(pending) >= DRAFT_CREATE_BATCH_SIZE:
+                    created += len(Application.objects.bulk_create(pending))
+                    pending = []
+                if report_progress:
+                    report_progress(int(done * 100 / len(festivals)))
+
+        created += len(Application.objects.bulk_create(pending))
+        finished = True
+    finally:
+        # Never left GENERATING: after a crash the drafts created so far can be reviewed, a re-run fills the gaps
+        status = "REVIEW" if finished or campaign.applications.exists() else "DRAFT"
+        Campaign.objects.filter(pk=campaign.pk).update(status=status, updated_at=timezone.now())
+    return {"created": created, "failures": failures}
+
+
+# Address-like tokens in free-text contact fields ("Jane: jane@x.org / info@x.org")
+EMAIL_TOKEN = re.compile(r"[^\s,;/<>:()\[\]\"']+@[^\s,;/<>:()\[\]\"']+")
+
+
+def parse_recipients(value: Optional[str]) -> List[str]:
+    """Valid, de-duplicated addresses found in a festival's contact_email text."""
+    recipients: List[str] = []
+    for token in EMAIL_TOKEN.findall(value or ""):
+        token = token.rstrip(".")
+        try:
+            validate_email(token)
+        except ValidationError:
+            continue
+        if token.lower() not in (r.lower() for r in recipients):
+            recipients.append(token)
+    return recipients
+
+
+def campaign_recipients(application: Application) -> List[str]:
+    """
+    The festival's addresses when CAMPAIGN_SEND_TO_FESTIVALS is on, otherwise the test recipient.
+    Raises ValueError when the festival has no valid address, in either mode, so a test run
+    reports the same failures a real one would.
+    """
+    festival_recipients = parse_recipients(application.festival.contact_email)
+    if not festival_recipients:
+        raise ValueError(f"No valid contact email in {application.festival.contact_email!r}")
+    if settings.CAMPAIGN_SEND_TO_FESTIVALS:
+        return festival_recipients
+    return [settings.CAMPAIGN_TEST_RECIPIENT or settings.APPLICATION_TO_EMAIL]
+
+
+def send_campaign(
+    campaign: Campaign,
+    rate_per_minute: Optional[int] = None,
+    report_progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Queues the approved drafts in the application outbox, which delivers them with retries and
+    moves each draft to APPLIED once its email is actually sent (see applications.outbox).
+    Queueing reserves the festival's season and is skipped for drafts already queued or sent, so
+    sending twice never mails a festival twice. First attempts are spaced `rate_per_minute` apart.
+    """
+    rate = min(rate_per_minute or campaign.send_rate_per_minute, settings.CAMPAIGN_MAX_SEND_RATE_PER_MINUTE)
+    spacing = timedelta(minutes=1) / max(1, rate)
+    drafts = list(
+        campaign.applications.filter(approved=True, application_status="DRAFT")
+        .exclude(outbox_messages__status__in=ACTIVE_OUTBOX_STATUSES)
+        .select_related("festival")
+        .order_by("id")
+    )
+    Campaign.objects.filter(pk=campaign.pk).update(status="SENDING", updated_at=timezone.now())
+
+    queued: List[int] = []
+    failures: List[Dict[str, Any]] = []
+    start = timezone.now()
+    for done, application in enumerate(drafts, start=1):
+        try:
+            recipients = campaign_recipients(application)
+            today = timezone.now().date()
+            with transaction.atomic():
+                claimed = (
+                    Application.objects.filter(pk=application.pk, approved=True, application_status="DRAFT")
+                    .exclude(outbox_messages__status__in=ACTIVE_OUTBOX_STATUSES)
+                    .update(
+                        application_date=today,
+                        application_year=season_year(today),
+                        send_error=None,
+                        updated_at=timezone.now(),
+                    )
+                )
+                if claimed:
+                    queue_application_email(
+                        application, [], to=recipients, not_before=start + spacing * len(queued)
+                    )
+        except (ValueError, IntegrityError) as e:
+            error = "Already applied to this festival this season" if isinstance(e, IntegrityError) else str(e)
+            logger.warning("Campaign %s: application %s not queued: %s", campaign.pk, application.pk, error)
+            Application.objects.filter(pk=application.pk).update(send_error=error, updated_at=timezone.now())
+            failures.append({"application_id": application.pk, "error": error})
+        else:
+            if claimed:
+                queued.append(application.pk)
+
+        if report_progress:
+            report_progress(int(done * 100 / len(drafts)))
+
+    if not queued:
+        # Nothing waits in the outbox, settle the status now
+        remaining = campaign.applications.filter(application_status="DRAFT").exists()
+        Campaign.objects.filter(pk=campaign.pk, status="SENDING").update(
+            status="REVIEW" if remaining else "SENT", updated_at=timezone.now()
+        )
+    return {"queued": queued, "failures": failures}
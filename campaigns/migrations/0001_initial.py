@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('festival_filter', models.JSONField(blank=True, default=dict)),
+                ('email_subject', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('GENERATING', 'Generating'), ('REVIEW', 'Review'), ('SENDING', 'Sending'), ('SENT', 'Sent')], default='DRAFT', max_length=20)),
+                ('send_rate_per_minute', models.PositiveIntegerField(default=30)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
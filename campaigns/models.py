@@ -0,0 +1,26 @@
+from django.db import models
+from typing import List, Tuple
+
+
+class Campaign(models.Model):
+    STATUS: List[Tuple[str, str]] = [
+        ("DRAFT", "Draft"),
+        ("GENERATING", "Generating"),
+        ("REVIEW", "Review"),
+        ("SENDING", "Sending"),
+        ("SENT", "Sent"),
+    ]
+
+    name = models.CharField(max_length=100)
+    # Exact-match Festival lookups selecting the recipients, e.g. {"country": "France"}
+    festival_filter = models.JSONField(default=dict, blank=True)
+    email_subject = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS, default="DRAFT")
+    # Spacing of this campaign's first delivery attempts (send_campaign), capped by CAMPAIGN_MAX_SEND_RATE_PER_MINUTE.
+    # Retries and other campaigns' emails are not counted against it.
+    send_rate_per_minute = models.PositiveIntegerField(default=30)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
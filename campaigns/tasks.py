@@ -0,0 +1,29 @@
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+
+from campaigns.mailmerge import generate_drafts, send_campaign
+from campaigns.models import Campaign
+from services.registry import get_mistral_client
+
+# Background job handlers, see jobs.tasks.TASK_HANDLERS
+
+
+def generate_campaign_task(payload: Dict[str, Any], report_progress: Callable[[int], None]) -> Dict[str, Any]:
+    campaign = Campaign.objects.get(pk=payload["campaign_id"])
+    return generate_drafts(
+        campaign,
+        get_mistral_client(),
+        concurrency=payload.get("concurrency", settings.CAMPAIGN_GENERATE_CONCURRENCY),
+        regenerate=payload.get("regenerate", False),
+        report_progress=report_progress,
+    )
+
+
+def send_campaign_task(payload: Dict[str, Any], report_progress: Callable[[int], None]) -> Dict[str, Any]:
+    campaign = Campaign.objects.get(pk=payload["campaign_id"])
+    return send_campaign(
+        campaign,
+        rate_per_minute=payload.get("rate_per_minute"),
+        report_progress=report_progress,
+    )
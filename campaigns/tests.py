@@ -0,0 +1,204 @@
+from django.core import mail
+from django.core.mail import get_connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from applications.models import Application, OutboxMessage
+from applications.outbox import claim_batch, deliver
+from campaigns.mailmerge import generate_drafts, parse_recipients, send_campaign
+from campaigns.models import Campaign
+from festivals.models import Festival
+from jobs.models import Job
+from jobs.queue import claim_next, run_job
+from services.errors import LLMError
+from services.registry import registry
+
+
+class ParseRecipientsTests(TestCase):
+    def test_extracts_valid_addresses_from_free_text(self):
+        self.assertEqual(
+            parse_recipients("Diane Fleury: diane@belluard.ch Gionata: gionata@belluard.ch\nDIANE@belluard.ch"),
+            ["diane@belluard.ch", "gionata@belluard.ch"],
+        )
+        self.assertEqual(parse_recipients("info@a.eu / marta@a.eu."), ["info@a.eu", "marta@a.eu"])
+        self.assertEqual(parse_recipients("theater@ kulturkosmos.de"), [])
+        self.assertEqual(parse_recipients(None), [])
+
+
+@override_settings(CAMPAIGN_TEST_RECIPIENT="test@example.com", CAMPAIGN_SEND_TO_FESTIVALS=False)
+class SendCampaignTests(TestCase):
+    def setUp(self):
+        self.campaign = Campaign.objects.create(name="Spring", email_subject="Show", send_rate_per_minute=120)
+
+        def draft(contact_email, approved=True):
+            festival = Festival.objects.create(festival_name=contact_email, contact_email=contact_email)
+            return Application.objects.create(
+                festival=festival,
+                campaign=self.campaign,
+                application_status="DRAFT",
+                approved=approved,
+                email_subject="Show",
+                message="<p>Hello</p>",
+            )
+
+        self.good = draft("a@fest.org\nb@fest.org")
+        self.bad = draft("Zeitwanderer Application")
+        self.unapproved = draft("c@fest.org", approved=False)
+
+    def deliver_all(self):
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        with get_connection() as connection:
+            return deliver(claim_batch("worker", 10), connection)
+
+    def test_queues_through_outbox_and_marks_applied_after_delivery(self):
+        result = send_campaign(self.campaign)
+        self.assertEqual(result["queued"], [self.good.pk])
+        self.assertEqual([f["application_id"] for f in result["failures"]], [self.bad.pk])
+        self.bad.refresh_from_db()
+        self.assertIn("No valid contact email", self.bad.send_error)
+
+        # Nothing is APPLIED before the outbox delivered it
+        self.good.refresh_from_db()
+        self.assertEqual(self.good.application_status, "DRAFT")
+        self.assertIsNotNone(self.good.application_year)
+
+        self.assertEqual(self.deliver_all(), 1)
+        self.assertEqual(mail.outbox[0].to, ["test@example.com"])
+        self.good.refresh_from_db()
+        self.assertEqual(self.good.application_status, "APPLIED")
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "REVIEW")  # the bad and unapproved drafts remain
+
+    def test_sending_twice_queues_once(self):
+        send_campaign(self.campaign)
+        self.assertEqual(send_campaign(self.campaign)["queued"], [])
+        self.deliver_all()
+        self.assertEqual(send_campaign(self.campaign)["queued"], [])
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(CAMPAIGN_SEND_TO_FESTIVALS=True)
+    def test_real_run_sends_to_parsed_festival_addresses(self):
+        send_campaign(self.campaign)
+        self.deliver_all()
+        self.assertEqual(mail.outbox[0].to, ["a@fest.org", "b@fest.org"])
+
+    def test_first_attempts_are_spaced_by_rate(self):
+        self.bad.festival.contact_email = "d@fest.org"
+        self.bad.festival.save()
+        send_campaign(self.campaign, rate_per_minute=60)
+        first, second = OutboxMessage.objects.order_by("next_attempt_at").values_list("next_attempt_at", flat=True)
+        self.assertAlmostEqual((second - first).total_seconds(), 1, places=2)
+
+    def test_season_already_taken_is_reported(self):
+        Application.objects.create(festival=self.good.festival, application_date=timezone.now().date())
+        result = send_campaign(self.campaign)
+        self.assertEqual(result["queued"], [])
+        self.assertIn(self.good.pk, [f["application_id"] for f in result["failures"]])
+
+
+class FakeMistral:
+    def __init__(self, fail_for=()):
+        self.fail_for = fail_for
+
+    def chat(self, prompt, **kwargs):
+        for name in self.fail_for:
+            if name in prompt:
+                raise LLMError("mistral", "provider down")
+        return "<p>Dear festival</p>"
+
+
+class CrashingMistral:
+    def chat(self, prompt, **kwargs):
+        raise RuntimeError("unexpected")
+
+
+class CampaignApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lyon = Festival.objects.create(festival_name="Lyon Rue", country="France", contact_email="l@lyon.fr")
+        self.nice = Festival.objects.create(festival_name="Nice Cirque", country="France", contact_email="n@nice.fr")
+        Festival.objects.create(festival_name="Madrid Calle", country="Spain", contact_email="m@madrid.es")
+        Festival.objects.create(festival_name="Paris Sans Email", country="France")
+        response = self.client.post(
+            "/api/campaigns/",
+            {"name": "France", "email_subject": "Show", "festival_filter": {"country": "France"}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.campaign_id = response.data["id"]
+        registry._instances["mistral"] = FakeMistral(fail_for=["Nice"])
+
+    def tearDown(self):
+        registry.reset()
+
+    def url(self, action=""):
+        return f"/api/campaigns/{self.campaign_id}/{action + '/' if action else ''}"
+
+    def run_jobs(self):
+        while (job := claim_next("test")) is not None:
+            run_job(job)
+        return job
+
+    def generate(self):
+        response = self.client.post(self.url("generate"), {}, format="json")
+        self.assertEqual(response.status_code, 202)
+        self.run_jobs()
+        return Job.objects.get(pk=response.data["job_id"])
+
+    def test_festival_filter_is_validated(self):
+        for festival_filter in ({"contact_email": "x"}, {"applied": "maybe"}, {"festival_type": "RODEO"}, ["France"]):
+            response = self.client.patch(self.url(), {"festival_filter": festival_filter}, format="json")
+            self.assertEqual(response.status_code, 400, festival_filter)
+        response = self.client.patch(self.url(), {"festival_filter": {"applied": "false"}}, format="json")
+        self.assertEqual(response.data["festival_filter"], {"applied": False})
+
+    def test_preview_lists_matching_festivals_with_email(self):
+        response = self.client.get(self.url("preview"))
+        self.assertEqual(response.data, {"count": 2, "festival_ids": [self.lyon.pk, self.nice.pk]})
+
+    def test_generate_creates_drafts_and_reports_failures(self):
+        job = self.generate()
+        self.assertEqual(job.status, "SUCCEEDED", job.error)
+        self.assertEqual(job.result["created"], 1)
+        self.assertEqual([f["festival_id"] for f in job.result["failures"]], [self.nice.pk])
+        draft = Application.objects.get(campaign_id=self.campaign_id)
+        self.assertEqual((draft.festival, draft.application_status, draft.approved), (self.lyon, "DRAFT", False))
+        self.assertEqual(str(draft), "Lyon Rue draft")
+        self.assertEqual(Campaign.objects.get(pk=self.campaign_id).status, "REVIEW")
+        # Generated festivals drop out of the preview, a re-run only fills the gaps
+        self.assertEqual(self.client.get(self.url("preview")).data["festival_ids"], [self.nice.pk])
+
+    def test_a_crash_never_leaves_the_campaign_generating(self):
+        campaign = Campaign.objects.get(pk=self.campaign_id)
+        with self.assertRaises(RuntimeError):
+            generate_drafts(campaign, CrashingMistral())
+        self.assertEqual(Campaign.objects.get(pk=self.campaign_id).status, "DRAFT")
+
+        # Once drafts exist, a crashed re-run leaves them to review
+        generate_drafts(campaign, FakeMistral(fail_for=["Nice"]))
+        with self.assertRaises(RuntimeError):
+            generate_drafts(campaign, CrashingMistral())
+        self.assertEqual(Campaign.objects.get(pk=self.campaign_id).status, "REVIEW")
+
+    def test_approve_and_send(self):
+        self.generate()
+        self.assertEqual(self.client.post(self.url("send"), {}, format="json").status_code, 400)
+
+        response = self.client.post(self.url("approve"), {}, format="json")
+        self.assertEqual(response.data, {"updated": 1, "approved": True})
+
+        response = self.client.post(self.url("send"), {}, format="json")
+        self.assertEqual(response.status_code, 202)
+        self.run_jobs()
+        self.assertEqual(Job.objects.get(pk=response.data["job_id"]).result["queued"], [
+            Application.objects.get(campaign_id=self.campaign_id).pk
+        ])
+        self.assertEqual(Campaign.objects.get(pk=self.campaign_id).status, "SENDING")
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        with get_connection() as connection:
+            deliver(claim_batch("worker", 10), connection)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Application.objects.get(campaign_id=self.campaign_id).application_status, "APPLIED")
+        self.assertEqual(Campaign.objects.get(pk=self.campaign_id).status, "SENT")
@@ -0,0 +1,10 @@
+from django.urls import path, include, URLPattern
+from rest_framework.routers import DefaultRouter
+from campaigns.views import CampaignViewSet
+from typing import List
+
+router: DefaultRouter = DefaultRouter()
+router.register(r"", CampaignViewSet, basename="campaign")
+urlpatterns: List[URLPattern] = [
+    path("", include(router.urls)),
+]
@@ -0,0 +1,119 @@
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpRequest
+from django.utils import timezone
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from applications.models import Application
+from campaigns.mailmerge import campaign_festivals
+from campaigns.models import Campaign
+from circus_agent_backend.serializers import ApplicationSerializer, CampaignSerializer, DraftUpdateSerializer
+from festivals.helpers import parse_flag
+from festivals.views import job_accepted_response
+from jobs.queue import enqueue
+
+
+# Mail-merge campaigns: create with a festival filter, generate drafts, review/approve them, send
+class CampaignViewSet(viewsets.ModelViewSet):
+    queryset = Campaign.objects.all().order_by("-created_at")
+    serializer_class = CampaignSerializer
+
+    @action(detail=True, methods=["get"])
+    def preview(self, request: HttpRequest, pk: int) -> Response:
+        festival_ids: List[int] = list(campaign_festivals(self.get_object()).values_list("id", flat=True))
+        return Response({"count": len(festival_ids), "festival_ids": festival_ids})
+
+    @action(detail=True, methods=["post"])
+    def generate(self, request: HttpRequest, pk: int) -> Response:
+        campaign: Campaign = self.get_object()
+        try:
+            concurrency = int(request.data.get("concurrency", settings.CAMPAIGN_GENERATE_CONCURRENCY))
+        except (TypeError, ValueError):
+            return Response({"error": "concurrency must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = enqueue(
+            "GENERATE_CAMPAIGN",
+            {
+                "campaign_id": campaign.pk,
+                "concurrency": max(1, min(concurrency, settings.ENRICH_BATCH_MAX_CONCURRENCY)),
+                "regenerate": parse_flag(request.data.get("regenerate")),
+            },
+            dedupe_key=f"campaign_generate:{campaign.pk}",
+        )
+        return job_accepted_response(job)
+
+    # GET lists the campaign's applications, PATCH edits drafts in bulk:
+    # {"drafts": [{"id": 1, "message": "...", "email_subject": "...", "approved": true}, ...]}
+    @action(detail=True, methods=["get", "patch"])
+    def drafts(self, request: HttpRequest, pk: int) -> Response:
+        campaign: Campaign = self.get_object()
+        applications = campaign.applications.select_related("festival").order_by("id")
+
+        if request.method == "GET":
+            return Response(ApplicationSerializer(applications, many=True).data)
+
+        items = request.data.get("drafts")
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Provide a non-empty 'drafts' list"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = DraftUpdateSerializer(data=items, many=True, partial=True)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        updates: Dict[int, Dict[str, Any]] = {item.pop("id"): item for item in serializer.validated_data}
+        # Only unsent drafts can be edited
+        drafts = {a.pk: a for a in applications.filter(pk__in=updates, application_status="DRAFT")}
+        missing = sorted(set(updates) - set(drafts))
+        if missing:
+            return Response(
+                {"error": "Not editable drafts of this campaign", "ids": missing},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fields = sorted({field for values in updates.values() for field in values})
+        for draft_id, values in updates.items():
+            for field, value in values.items():
+                setattr(drafts[draft_id], field, value)
+            drafts[draft_id].updated_at = timezone.now()
+        with transaction.atomic():
+            Application.objects.bulk_update(drafts.values(), fields + ["updated_at"], batch_size=100)
+
+        return Response(ApplicationSerializer(drafts.values(), many=True).data)
+
+    @action(detail=True, methods=["post"])
+    def approve(self, request: HttpRequest, pk: int) -> Response:
+        """Approves (or with approved=false, un-approves) the given draft ids, or every draft when ids is omitted."""
+        campaign: Campaign = self.get_object()
+        drafts = campaign.applications.filter(application_status="DRAFT")
+        ids = request.data.get("ids")
+        if ids is not None:
+            if not isinstance(ids, list):
+                return Response({"error": "ids must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+            drafts = drafts.filter(pk__in=ids)
+
+        approved: bool = parse_flag(request.data.get("approved", True))
+        updated = drafts.update(approved=approved, updated_at=timezone.now())
+        return Response({"updated": updated, "approved": approved})
+
+    @action(detail=True, methods=["post"])
+    def send(self, request: HttpRequest, pk: int) -> Response:
+        campaign: Campaign = self.get_object()
+        if not campaign.applications.filter(approved=True, application_status="DRAFT").exists():
+            return Response({"error": "No approved drafts to send"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rate = request.data.get("rate_per_minute")
+        try:
+            rate = int(rate) if rate is not None else None
+        except (TypeError, ValueError):
+            return Response({"error": "rate_per_minute must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = enqueue(
+            "SEND_CAMPAIGN",
+            {"campaign_id": campaign.pk, "rate_per_minute": rate},
+            dedupe_key=f"campaign_send:{campaign.pk}",
+        )
+        return job_accepted_response(job)
@@ -0,0 +1,71 @@
+from typing import List, Optional
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from circus_agent_backend.pagination import CURSOR_KEY, KeysetPagination
+from circus_agent_backend.serializers import ValuesListSerializer
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+
+
+def _field_list(raw: Optional[str]) -> List[str]:
+    return [name.strip() for name in (raw or "").split(",") if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    ModelViewSet mixin for serializers using SparseFieldsMixin. GET requests take ?fields=id,town or
+    ?exclude=description,comments (id is always returned). Only the requested columns are selected:
+    retrieve narrows the query with .only(), list reads values_list() rows through ValuesListSerializer.
+    """
+
+    def get_fieldset(self) -> Optional[List[str]]:
+        if not hasattr(self, "_fieldset"):
+            self._fieldset = self._parse_fieldset()
+        return self._fieldset
+
+    def _parse_fieldset(self) -> Optional[List[str]]:
+        if self.request is None or self.request.method != "GET":
+            return None
+        fields = _field_list(self.request.query_params.get(FIELDS_PARAM))
+        exclude = _field_list(self.request.query_params.get(EXCLUDE_PARAM))
+        if not fields and not exclude:
+            return None
+
+        available = list(self.get_serializer_class()(context=self.get_serializer_context()).fields)
+        for param, names in ((FIELDS_PARAM, fields), (EXCLUDE_PARAM, exclude)):
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                raise ValidationError({param: f"Unknown fields: {', '.join(unknown)}"})
+        selected = set(fields or available) - set(exclude)
+        selected.add("id")
+        # Keep the serializer's field order
+        return [name for name in available if name in selected]
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault("fields", fieldset)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = self.get_fieldset()
+        if fieldset is None or self.action != "retrieve":
+            return queryset
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        return queryset.only(*(name for name in fieldset if name in model_fields))
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        fast = ValuesListSerializer(self.get_serializer())
+        if isinstance(self.paginator, KeysetPagination):
+            rows = fast.rows(self.paginator.annotate(queryset, request, self), extra=[CURSOR_KEY])
+        else:
+            rows = fast.rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(rows))
@@ -0,0 +1,120 @@
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from festivals.helpers import parse_flag
+
+
+def parse_iso_date(value: str) -> date:
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError("Expected a date as YYYY-MM-DD")
+    return parsed
+
+
+def parse_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("Expected an integer")
+
+
+def parse_bool(value: str) -> bool:
+    if value.strip().lower() not in ("1", "true", "yes", "on", "0", "false", "no", "off"):
+        raise ValueError("Expected true or false")
+    return parse_flag(value)
+
+
+class Filter:
+    """
+    One query parameter of a list endpoint. `lookup` is an ORM lookup the parsed value is passed to;
+    repeating the parameter (?country=France&country=Spain) ORs the values through `lookup__in`.
+    `method(value) -> Q` replaces `lookup` for predicates that are not a single lookup.
+    """
+
+    def __init__(
+        self,
+        lookup: Optional[str] = None,
+        parse: Callable[[str], Any] = str,
+        choices: Optional[Sequence[Tuple[str, str]]] = None,
+        many: bool = False,
+        method: Optional[Callable[[Any], Q]] = None,
+        help_text: str = "",
+    ):
+        self.lookup = lookup
+        self.parse = parse
+        self.choices = [value for value, _ in choices] if choices else None
+        self.many = many
+        self.method = method
+        self.help_text = help_text
+
+    def _parse(self, param: str, raw: str) -> Any:
+        if self.choices is not None and raw not in self.choices:
+            raise ValidationError({param: f"Choose from {', '.join(self.choices)}"})
+        try:
+            return self.parse(raw)
+        except ValueError as e:
+            raise ValidationError({param: str(e)})
+
+    def to_q(self, param: str, raw_values: List[str]) -> Q:
+        values = [self._parse(param, raw) for raw in raw_values]
+        if self.method is not None:
+            return self.method(values[-1])
+        if self.many and len(values) > 1:
+            return Q(**{f"{self.lookup}__in": values})
+        return Q(**{self.lookup: values[-1]})
+
+
+class QueryFilterBackend(BaseFilterBackend):
+    """
+    Applies the view's `query_filters` ({"param": Filter(...)}) for every parameter present in the
+    query string. Parameters combine with AND, so each request becomes a single WHERE clause the
+    indexes on the filtered columns can serve. Ordering stays with KeysetPagination (?ordering=).
+    """
+
+    def filter_queryset(self, request, queryset: QuerySet, view) -> QuerySet:
+        filters: Dict[str, Filter] = getattr(view, "query_filters", {})
+        predicate = Q()
+        for param, query_filter in filters.items():
+            raw_values = [value for value in request.query_params.getlist(param) if value != ""]
+            if raw_values:
+                predicate &= query_filter.to_q(param, raw_values)
+        return queryset.filter(predicate) if predicate else queryset
+
+    def get_schema_operation_parameters(self, view) -> List[Dict[str, Any]]:
+        filters: Dict[str, Filter] = getattr(view, "query_filters", {})
+        parameters = []
+        for param, query_filter in filters.items():
+            schema: Dict[str, Any] = {"type": "string"}
+            if query_filter.choices is not None:
+                schema["enum"] = query_filter.choices
+            parameters.append(
+                {
+                    "name": param,
+                    "required": False,
+                    "in": "query",
+                    "description": query_filter.help_text,
+                    "schema": {"type": "array", "items": schema} if query_filter.many else schema,
+                }
+            )
+        return parameters
+
+
+def due_on_or_before(field: str) -> Callable[[bool], Q]:
+    """?x_due=true: `field` is set and not after today; false: unset or in the future."""
+
+    def method(due: bool) -> Q:
+        today = timezone.now().date()
+        if due:
+            return Q(**{f"{field}__lte": today})
+        return Q(**{f"{field}__isnull": True}) | Q(**{f"{field}__gt": today})
+
+    return method
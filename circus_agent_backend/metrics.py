@@ -0,0 +1,22 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from services.telemetry import telemetry, to_prometheus
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return to_prometheus(data["series"])
+
+
+# LLM call metrics aggregated across worker processes. ?format=prometheus for a scrape target
+class LLMMetricsView(APIView):
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request, format=None) -> Response:
+        return Response({"series": telemetry.snapshot()})
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models import F, QuerySet, Value
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from festivals.helpers import parse_flag
+
+# Annotation the cursor position is read from, so related and nullable fields can be used as keys
+CURSOR_KEY = "cursor_key"
+
+# NULLs cannot be compared in a keyset WHERE clause, they sort as one of these (lowest, highest) values
+# instead: the highest for an ascending ordering and the lowest for a descending one, so NULLs come last
+NULL_SENTINELS: Dict[type, Tuple[object, object]] = {
+    # DateTimeField subclasses DateField, so it must be matched first
+    models.DateTimeField: (datetime.min.replace(tzinfo=timezone.utc), datetime.max.replace(tzinfo=timezone.utc)),
+    models.DateField: (date.min, date.max),
+    # The highest code point sorts after any other text under SQLite's binary collation. Descending,
+    # NULL shares the lowest value with the empty string, so blanks and NULLs end the list together
+    models.CharField: ("", "\U0010ffff"),
+    models.TextField: ("", "\U0010ffff"),
+}
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination whose ordering the client picks among the view's `cursor_orderings`
+    ({"name": "festival_name", ...}) with ?ordering=name or ?ordering=-name. Pages are fetched with
+    `WHERE key > position ORDER BY key, id LIMIT n`, so page 1000 costs the same as page 1.
+    The total count is an extra COUNT(*) and can be skipped with ?count=false.
+    """
+
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    ordering_param = "ordering"
+    count_param = "count"
+    count: Optional[int] = None
+
+    def _requested_ordering(self, request, view) -> Tuple[str, bool]:
+        """Returns (model lookup, descending) for the ?ordering= key."""
+        orderings: Dict[str, str] = getattr(view, "cursor_orderings", {"id": "id"})
+        requested = request.query_params.get(self.ordering_param) or getattr(view, "default_cursor_ordering", "id")
+        key = requested.lstrip("-")
+        if key not in orderings:
+            raise ValidationError({self.ordering_param: f"Choose one of {', '.join(sorted(orderings))}"})
+        return orderings[key], requested.startswith("-")
+
+    def get_ordering(self, request, queryset, view) -> Tuple[str, ...]:
+        prefix = "-" if self._requested_ordering(request, view)[1] else ""
+        # id breaks ties so rows sharing a key keep a stable order across pages
+        return (f"{prefix}{CURSOR_KEY}", f"{prefix}id")
+
+    def annotate(self, queryset: QuerySet, request, view) -> QuerySet:
+        """Adds the cursor key. Views paginating values_list() rows call this first and select CURSOR_KEY."""
+        if CURSOR_KEY in queryset.query.annotations:
+            return queryset
+        lookup, descending = self._requested_ordering(request, view)
+        field = queryset.model._meta.get_field(lookup.split("__")[0])
+        for part in lookup.split("__")[1:]:
+            field = field.related_model._meta.get_field(part)
+
+        expression = F(lookup)
+        if field.null:
+            sentinels = next((v for t, v in NULL_SENTINELS.items() if isinstance(field, t)), None)
+            if sentinels is None:
+                raise ImproperlyConfigured(f"No NULL sentinel for cursor ordering on {lookup}")
+            lowest, highest = sentinels
+            expression = Coalesce(F(lookup), Value(lowest if descending else highest), output_field=field.__class__())
+        return queryset.annotate(**{CURSOR_KEY: expression})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.annotate(queryset, request, view)
+        include_count = request.query_params.get(self.count_param)
+        include_count = settings.API_PAGINATION_COUNT if include_count is None else parse_flag(include_count)
+        self.count = queryset.count() if include_count else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data) -> Response:
+        body = OrderedDict([("next", self.get_next_link()), ("previous", self.get_previous_link())])
+        if self.count is not None:
+            body["count"] = self.count
+        body["results"] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        response["properties"]["count"] = {"type": "integer", "example": 123}
+        return response
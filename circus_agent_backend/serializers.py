@@ -1,7 +1,121 @@
 from rest_framework import serializers
-from applications.models import Application
+from applications.models import Application, Attachment, season_year
+from campaigns.models import Campaign
 from festivals.models import Festival
-from typing import Type
+from jobs.models import Job
+from datetime import datetime
+from django.db.models import QuerySet
+from rest_framework.settings import ISO_8601, api_settings
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Type
+
+
+class SparseFieldsMixin:
+    """ModelSerializer that outputs only `fields` when given, e.g. FestivalSerializer(fields=["id", "town"])."""
+
+    def __init__(self, *args, fields: Optional[Sequence[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _iso_datetime(value: datetime) -> str:
+    # Same output as serializers.DateTimeField with the ISO 8601 format
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+# Fields whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.ReadOnlyField,
+)
+
+
+class ValuesListSerializer:
+    """
+    Read-only list serializer over values_list() rows. Columns and per-field converters are derived
+    once from a ModelSerializer, so the output matches it while skipping model instantiation and the
+    per-field dispatch of ModelSerializer.to_representation. Many-to-many fields cost one query per page.
+    """
+
+    def __init__(self, serializer: serializers.ModelSerializer):
+        model = serializer.Meta.model
+        self.model = model
+        self.names: List[str] = []
+        self.columns: List[str] = []
+        self.converters: List[Callable[[Any], Any]] = []
+        self.many_to_many: List[str] = []
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ManyRelatedField):
+                self.many_to_many.append(name)
+                continue
+            self.names.append(name)
+            self.columns.append(field.source)
+            self.converters.append(self._converter(field))
+        # Many-to-many values are looked up by row id
+        if self.many_to_many and "id" not in self.columns:
+            self.columns.append("id")
+
+    @staticmethod
+    def _converter(field: serializers.Field) -> Callable[[Any], Any]:
+        if isinstance(field, serializers.DateField) and getattr(field, "format", api_settings.DATE_FORMAT) == ISO_8601:
+            # Dates carry no time zone, isoformat() is exactly DRF's ISO 8601 output
+            return lambda value: value.isoformat()
+        if (
+            isinstance(field, serializers.DateTimeField)
+            and getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601
+        ):
+            # DRF looks up the current time zone for every value, resolve it once per list instead
+            time_zone = getattr(field, "timezone", None) or field.default_timezone()
+            if time_zone is not None:
+                return lambda value: _iso_datetime(value.astimezone(time_zone))
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return _identity
+        return field.to_representation
+
+    def rows(self, queryset: QuerySet, extra: Sequence[str] = ()) -> QuerySet:
+        # Named rows so the pagination can read `extra` columns (its cursor key) by attribute
+        return queryset.values_list(*self.columns, *extra, named=True)
+
+    def _many_to_many_ids(self, ids: List[int]) -> Dict[str, Dict[int, List[int]]]:
+        result: Dict[str, Dict[int, List[int]]] = {}
+        for name in self.many_to_many:
+            model_field = self.model._meta.get_field(name)
+            through = model_field.remote_field.through
+            source, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+            by_row: Dict[int, List[int]] = {row_id: [] for row_id in ids}
+            pairs = through.objects.filter(**{f"{source}__in": ids}).order_by("id").values_list(
+                f"{source}_id", f"{target}_id"
+            )
+            for row_id, related_id in pairs:
+                by_row[row_id].append(related_id)
+            result[name] = by_row
+        return result
+
+    def serialize(self, rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+        rows = list(rows)
+        fields = list(zip(self.names, self.converters))
+        data = [
+            {name: None if value is None else convert(value) for (name, convert), value in zip(fields, row)}
+            for row in rows
+        ]
+        if self.many_to_many:
+            id_index = self.columns.index("id")
+            related = self._many_to_many_ids([row[id_index] for row in rows])
+            for item, row in zip(data, rows):
+                for name in self.many_to_many:
+                    item[name] = related[name][row[id_index]]
+        return data
 
 
 class BlankToNullDateField(serializers.DateField):
@@ -11,17 +125,104 @@ class BlankToNullDateField(serializers.DateField):
         return super().to_internal_value(data)
 
 
-class FestivalSerializer(serializers.ModelSerializer):
+class FestivalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     start_date = BlankToNullDateField(required=False, allow_null=True)
     end_date = BlankToNullDateField(required=False, allow_null=True)
 
     class Meta:
         model: Type[Festival] = Festival
         fields: str = "__all__"
-        read_only_fields = ("id",)
+        read_only_fields = ("id", "last_enriched_at", "last_enrichment_status", "last_enrichment_error")
 
 
-class ApplicationSerializer(serializers.ModelSerializer):
+class ApplicationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model: Type[Application] = Application
         fields: str = "__all__"
+
+    def validate(self, attrs):
+        # application_year is read-only here, so DRF does not generate a validator for the
+        # (festival, application_year) constraint; check it the way save() will compute the year
+        instance = self.instance
+        festival = attrs.get("festival", instance.festival if instance else None)
+        if instance is not None and attrs.get("application_date", instance.application_date) == instance.application_date:
+            year = instance.application_year
+        else:
+            year = season_year(attrs.get("application_date"))
+        if festival is not None and year is not None:
+            existing = Application.objects.filter(festival=festival, application_year=year)
+            if instance is not None:
+                existing = existing.exclude(pk=instance.pk)
+            conflict = existing.values_list("pk", flat=True).first()
+            if conflict is not None:
+                raise serializers.ValidationError(
+                    {"application_date": f"Application {conflict} already exists for this festival and year"}
+                )
+        return attrs
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model: Type[Attachment] = Attachment
+        fields: str = "__all__"
+        read_only_fields = ("id", "sha256", "name", "content_type", "size", "created_at")
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model: Type[Job] = Job
+        fields: str = "__all__"
+
+
+class FestivalLookupSerializer(serializers.Serializer):
+    """
+    Exact-match Festival lookups accepted in request bodies (campaign festival_filter, enrich_batch
+    filters), with their value types. Unknown keys are rejected rather than ignored.
+    """
+
+    country = serializers.CharField(max_length=100, required=False)
+    town = serializers.CharField(max_length=100, required=False)
+    festival_type = serializers.ChoiceField(choices=Festival.FESTIVAL_TYPES, required=False)
+    application_type = serializers.ChoiceField(choices=Festival.APPLICATION_TYPE, required=False)
+    applied = serializers.BooleanField(required=False)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, dict):
+            raise serializers.ValidationError("Must be an object of festival lookups")
+        unknown = sorted(set(data) - set(self.fields))
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unsupported filters: {', '.join(unknown)}. Use {', '.join(self.fields)}"
+            )
+        return super().to_internal_value(data)
+
+
+class EnrichBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    filters = FestivalLookupSerializer(required=False)
+    concurrency = serializers.IntegerField(required=False)
+    bypass_cache = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        if not attrs.get("ids") and not attrs.get("filters"):
+            raise serializers.ValidationError("Provide ids or filters")
+        return attrs
+
+
+class CampaignSerializer(serializers.ModelSerializer):
+    class Meta:
+        model: Type[Campaign] = Campaign
+        fields: str = "__all__"
+        read_only_fields = ("id", "status")
+
+    def validate_festival_filter(self, value):
+        return dict(FestivalLookupSerializer().run_validation(value))
+
+
+class DraftUpdateSerializer(serializers.ModelSerializer):
+    # Bulk review: the only draft fields editable from a campaign
+    id = serializers.IntegerField()
+
+    class Meta:
+        model: Type[Application] = Application
+        fields = ("id", "email_subject", "message", "approved")
@@ -46,6 +46,8 @@ INSTALLED_APPS = [
     "corsheaders",
     "festivals",
     "applications",
+    "jobs",
+    "campaigns",
 ]
 
 MIDDLEWARE = [
@@ -157,6 +159,20 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files (email attachments waiting in the outbox)
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", str(BASE_DIR / "media"))
+
+# List endpoints: keyset pagination (circus_agent_backend.pagination.KeysetPagination)
+
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "50"))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "500"))
+# Include the total row count in list responses unless the client passes ?count=false
+API_PAGINATION_COUNT = os.getenv("API_PAGINATION_COUNT", "true").lower() in ("1", "true", "yes")
+
+# Festival full-text search (festivals.search), results per request
+FESTIVAL_SEARCH_DEFAULT_LIMIT = int(os.getenv("FESTIVAL_SEARCH_DEFAULT_LIMIT", "20"))
+FESTIVAL_SEARCH_MAX_LIMIT = int(os.getenv("FESTIVAL_SEARCH_MAX_LIMIT", "100"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -170,3 +186,39 @@ EMAIL_PORT = os.getenv("EMAIL_PORT")
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS")
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+
+APPLICATION_FROM_EMAIL = os.getenv("APPLICATION_FROM_EMAIL", "ducassephi@hotmail.fr")
+APPLICATION_TO_EMAIL = os.getenv("APPLICATION_TO_EMAIL", "info@philippeducasse.com")
+# Outbox sender: attempts per email and retry backoff bounds in seconds
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_DELAY = int(os.getenv("OUTBOX_RETRY_BASE_DELAY", "30"))
+OUTBOX_RETRY_MAX_DELAY = int(os.getenv("OUTBOX_RETRY_MAX_DELAY", "3600"))
+
+# Background jobs: retry backoff bounds in seconds for a failed attempt
+JOB_RETRY_BASE_DELAY = int(os.getenv("JOB_RETRY_BASE_DELAY", "30"))
+JOB_RETRY_MAX_DELAY = int(os.getenv("JOB_RETRY_MAX_DELAY", "1800"))
+
+# Festival enrichment
+
+ENRICH_BATCH_MAX_SIZE = int(os.getenv("ENRICH_BATCH_MAX_SIZE", "200"))
+ENRICH_BATCH_MAX_CONCURRENCY = int(os.getenv("ENRICH_BATCH_MAX_CONCURRENCY", "16"))
+ENRICH_BATCH_DEFAULT_CONCURRENCY = int(os.getenv("ENRICH_BATCH_DEFAULT_CONCURRENCY", "8"))
+# Search snippets sent to the enrichment prompt are trimmed to this many estimated tokens
+ENRICH_SNIPPET_TOKEN_BUDGET = int(os.getenv("ENRICH_SNIPPET_TOKEN_BUDGET", "1500"))
+# Re-enrichment scheduler: festivals enriched per day, and how long a successful enrichment stays fresh
+ENRICH_DAILY_BUDGET = int(os.getenv("ENRICH_DAILY_BUDGET", "200"))
+ENRICH_MIN_AGE_DAYS = int(os.getenv("ENRICH_MIN_AGE_DAYS", "30"))
+# Rows per UPDATE statement when a batch enrichment run is persisted
+ENRICH_BULK_UPDATE_BATCH_SIZE = int(os.getenv("ENRICH_BULK_UPDATE_BATCH_SIZE", "100"))
+# Race the other provider once the primary is slower than its p95 (search is cheap, chat is not)
+ENRICH_HEDGE_SEARCH = os.getenv("ENRICH_HEDGE_SEARCH", "true").lower() in ("1", "true", "yes")
+ENRICH_HEDGE_CHAT = os.getenv("ENRICH_HEDGE_CHAT", "false").lower() in ("1", "true", "yes")
+
+# Mail-merge campaigns
+
+# Campaign emails only reach festival contacts when this is on. Otherwise they all go to
+# CAMPAIGN_TEST_RECIPIENT (or APPLICATION_TO_EMAIL when that is empty), as a dry run.
+CAMPAIGN_SEND_TO_FESTIVALS = os.getenv("CAMPAIGN_SEND_TO_FESTIVALS", "false").lower() in ("1", "true", "yes")
+CAMPAIGN_TEST_RECIPIENT = os.getenv("CAMPAIGN_TEST_RECIPIENT", "")
+CAMPAIGN_GENERATE_CONCURRENCY = int(os.getenv("CAMPAIGN_GENERATE_CONCURRENCY", "8"))
+CAMPAIGN_MAX_SEND_RATE_PER_MINUTE = int(os.getenv("CAMPAIGN_MAX_SEND_RATE_PER_MINUTE", "120"))
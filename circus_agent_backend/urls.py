@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include, URLPattern
 from typing import List
+from circus_agent_backend.metrics import LLMMetricsView
 
 urlpatterns: List[URLPattern] = [
     path("admin/", admin.site.urls),
@@ -10,6 +11,9 @@ urlpatterns: List[URLPattern] = [
             [
                 path("festivals/", include("festivals.urls")),
                 path("applications/", include("applications.urls")),
+                path("jobs/", include("jobs.urls")),
+                path("campaigns/", include("campaigns.urls")),
+                path("metrics/llm/", LLMMetricsView.as_view(), name="llm-metrics"),
             ]
         ),
     ),
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FestivalsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "festivals"
+
+    def ready(self):
+        from festivals.search import ensure_search_index
+
+        post_migrate.connect(ensure_search_index, sender=self)
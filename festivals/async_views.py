@@ -0,0 +1,102 @@
+import functools
+import json
+from typing import Any, Callable, Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponseNotAllowed, JsonResponse
+
+from circus_agent_backend.serializers import FestivalSerializer
+from festivals.models import Festival
+from services.errors import LLMError, LLMRateLimitError
+from services.registry import get_gemini_client, get_mistral_client
+from .enrichment import aenrich_festival, asave_enrichment, record_enrichment_failure
+from .helpers import generate_application_mail_prompt, parse_flag
+
+# Native async counterparts of FestivalViewSet.enrich / generate_email.
+# Under ASGI they free the worker while waiting on the providers, so slow LLM calls
+# do not starve the CRUD endpoints. They are meant for the ASGI deployment: under WSGI
+# Django runs each async view in its own event loop and the pooled async connections
+# cannot be reused between requests.
+
+
+def async_post_endpoint(view: Callable) -> Callable:
+    # Django 4.2's require_POST / csrf_exempt wrap views synchronously, which breaks coroutine views
+    @functools.wraps(view)
+    async def wrapper(request: HttpRequest, *args, **kwargs):
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+        return await view(request, *args, **kwargs)
+
+    # Same as DRF's APIView: token-less API called from the Next.js frontend
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def llm_error_json(error: LLMError) -> JsonResponse:
+    return JsonResponse(
+        {"error": "LLM provider call failed", "details": str(error), "error_type": type(error).__name__},
+        status=429 if isinstance(error, LLMRateLimitError) else 502,
+    )
+
+
+def _request_flags(request: HttpRequest) -> Optional[Dict[str, Any]]:
+    # None when the body is JSON but not an object; unparsable bodies are ignored as before
+    try:
+        body = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        body = {}
+    if not isinstance(body, dict):
+        return None
+    return {**body, **request.GET.dict()}
+
+
+def invalid_body_json() -> JsonResponse:
+    return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+
+
+@async_post_endpoint
+async def enrich_async(request: HttpRequest, pk: int) -> JsonResponse:
+    try:
+        festival = await Festival.objects.aget(pk=pk)
+    except Festival.DoesNotExist:
+        return JsonResponse({"error": "Festival not found"}, status=404)
+
+    flags = _request_flags(request)
+    if flags is None:
+        return invalid_body_json()
+    bypass_cache: bool = parse_flag(flags.get("bypass_cache"))
+
+    try:
+        changed_fields = await aenrich_festival(
+            festival, get_gemini_client(), get_mistral_client(), use_cache=not bypass_cache
+        )
+    except LLMError as e:
+        await sync_to_async(record_enrichment_failure)(festival.pk, str(e))
+        return llm_error_json(e)
+
+    await asave_enrichment(festival, changed_fields)
+
+    return JsonResponse(FestivalSerializer(festival).data)
+
+
+@async_post_endpoint
+async def generate_email_async(request: HttpRequest, pk: int) -> JsonResponse:
+    try:
+        festival = await Festival.objects.aget(pk=pk)
+    except Festival.DoesNotExist:
+        return JsonResponse({"error": "Festival not found"}, status=404)
+
+    flags = _request_flags(request)
+    if flags is None:
+        return invalid_body_json()
+    regenerate: bool = parse_flag(flags.get("regenerate"))
+
+    prompt: str = generate_application_mail_prompt(festival)
+    try:
+        message: str = await get_mistral_client().achat(
+            prompt=prompt, cache_policy="application_mail", regenerate=regenerate
+        )
+    except LLMError as e:
+        return llm_error_json(e)
+
+    return JsonResponse({"message": message}, status=200)
@@ -0,0 +1,112 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from festivals.enrichment import apply_enrichment_fields, save_enrichments, search_festival
+from festivals.helpers import EnrichPrompt, build_enrich_prompt, extract_fields_from_llm
+from festivals.models import Festival
+from services.errors import LLMResponseError
+from services.gemini_service import GeminiClient
+from services.mistral_service import MistralClient
+
+logger = logging.getLogger(__name__)
+
+# Offline enrichment through a provider batch API: search and render prompts into a JSONL file,
+# let the provider run the chat completions, then stream the result file into bulk DB writes.
+
+
+def batch_request(festival: Festival, prompt: EnrichPrompt) -> Dict[str, Any]:
+    # custom_id carries the festival id, so results can be applied without the submitting process
+    return {
+        "custom_id": str(festival.pk),
+        "body": {"messages": MistralClient._messages(prompt.user, prompt.system)},
+    }
+
+
+def render_batch_file(
+    festivals: List[Festival],
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    fh,
+    concurrency: int,
+    use_cache: bool = True,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Runs the (cached) searches `concurrency` at a time and writes one batch request per festival to
+    `fh` as they complete. Returns the number of requests written and the search failures.
+    """
+    written = 0
+    failures: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(search_festival, festival, gemini_client, mistral_client, use_cache, hedge=False): festival
+            for festival in festivals
+        }
+        for future in as_completed(futures):
+            festival = futures[future]
+            try:
+                prompt = build_enrich_prompt(festival, future.result())
+            except Exception as e:
+                failures.append({"id": festival.id, "error": str(e), "error_type": type(e).__name__})
+                continue
+            fh.write(json.dumps(batch_request(festival, prompt), ensure_ascii=False) + "\n")
+            written += 1
+    return written, failures
+
+
+def batch_result_content(result: Dict[str, Any]) -> str:
+    response = result.get("response") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        raise LLMResponseError("mistral", f"Batch request failed: {result.get('error') or response}")
+    try:
+        return response["body"]["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise LLMResponseError("mistral", "Batch response has no message content")
+
+
+def apply_batch_results(
+    results: Iterable[Dict[str, Any]], batch_size: Optional[int] = None
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Consumes result lines in chunks of `batch_size`: each chunk loads its festivals with one query,
+    goes through extract_fields_from_llm / clean_festival_data and is written with save_enrichments.
+    Returns the number of enriched festivals and the failures.
+    """
+    if batch_size is None:
+        batch_size = settings.ENRICH_BULK_UPDATE_BATCH_SIZE
+
+    enriched_count = 0
+    all_failures: List[Dict[str, Any]] = []
+
+    def flush(chunk: List[Dict[str, Any]]) -> None:
+        nonlocal enriched_count
+        festivals = Festival.objects.in_bulk([int(result["custom_id"]) for result in chunk])
+        enriched: List[Tuple[Festival, List[str]]] = []
+        failures: List[Dict[str, Any]] = []
+        for result in chunk:
+            festival_id = int(result["custom_id"])
+            festival = festivals.get(festival_id)
+            if festival is None:
+                logger.warning("Batch result for unknown festival %s", festival_id)
+                continue
+            try:
+                fields = extract_fields_from_llm(batch_result_content(result))
+                enriched.append((festival, apply_enrichment_fields(festival, fields)))
+            except Exception as e:
+                failures.append({"id": festival_id, "error": str(e), "error_type": type(e).__name__})
+        save_enrichments(enriched, failures, batch_size=batch_size)
+        enriched_count += len(enriched)
+        all_failures.extend(failures)
+
+    chunk: List[Dict[str, Any]] = []
+    for result in results:
+        chunk.append(result)
+        if len(chunk) >= batch_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return enriched_count, all_failures
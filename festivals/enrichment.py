@@ -0,0 +1,353 @@
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from festivals.models import EnrichmentUsage, Festival
+from festivals.helpers import (
+    ENRICH_RECORD_FIELDS,
+    extract_fields_from_llm,
+    extract_search_results,
+    clean_festival_data,
+    build_enrich_prompt,
+    validated_fields,
+    EnrichPrompt,
+)
+from festivals.llm_json import IncrementalJSONParser
+from services.errors import LLMError
+from services.gemini_service import GeminiClient
+from services.mistral_service import MistralClient
+from services.router import Route, router
+from services.singleflight import SingleFlight, SingleFlightError
+
+logger = logging.getLogger(__name__)
+
+ENRICHMENT_TRACKING_FIELDS: Tuple[str, ...] = (
+    "last_enriched_at",
+    "last_enrichment_status",
+    "last_enrichment_error",
+    # auto_now is not applied by bulk_update(), so it is set along with the bookkeeping
+    "updated_at",
+)
+
+
+def build_search_query(festival: Festival) -> str:
+    return f"{festival.website_url} {festival.festival_name} {festival.country} {datetime.now().year}"
+
+
+# Concurrent enrichments of the same festival state share one set of provider calls
+enrich_flight = SingleFlight(namespace="enrich", lease_seconds=300, result_ttl=30)
+
+
+def enrichment_key(festival: Festival, use_cache: bool) -> str:
+    # The record fields are what the prompt is built from, so they stand in for the prompt hash
+    record = {field: str(getattr(festival, field)) for field in ENRICH_RECORD_FIELDS}
+    digest = hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return f"{festival.pk}:{digest}:{int(use_cache)}"
+
+
+def search_festival(
+    festival: Festival,
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    use_cache: bool = True,
+    hedge: bool = True,
+) -> str:
+    """
+    Gemini grounded search, hedged with / falling back to the Mistral search agent. Batch callers pass
+    hedge=False: they favour throughput, and hedges would hold router workers for every festival.
+    """
+    query = build_search_query(festival)
+    return router.run(
+        Route("gemini", "search", lambda: gemini_client.search(query=query, use_cache=use_cache)),
+        Route("mistral", "agent_search", lambda: extract_search_results(mistral_client.search(query))),
+        hedge=hedge and settings.ENRICH_HEDGE_SEARCH,
+    )
+
+
+async def asearch_festival(
+    festival: Festival,
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    use_cache: bool = True,
+) -> str:
+    query = build_search_query(festival)
+
+    async def agent_search() -> str:
+        return extract_search_results(await mistral_client.asearch(query))
+
+    return await router.arun(
+        ("gemini", "search", lambda: gemini_client.asearch(query=query, use_cache=use_cache)),
+        ("mistral", "agent_search", agent_search),
+        hedge=settings.ENRICH_HEDGE_SEARCH,
+    )
+
+
+def fetch_enrichment(
+    festival: Festival,
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    use_cache: bool = True,
+    listener: Optional[Callable[[str, Any], None]] = None,
+    hedge: bool = True,
+) -> Dict[str, Any]:
+    """
+    search -> prompt -> chat -> extract. Returns the fields proposed by the LLM, leaves the festival untouched.
+    With a `listener`, the Mistral reply is streamed and listener(event, data) receives a `generate` event
+    with the prompt size, then a `field` event with each validated (field, value) as soon as it is parsed.
+    """
+    search_results = search_festival(festival, gemini_client, mistral_client, use_cache, hedge=hedge)
+    prompt: EnrichPrompt = build_enrich_prompt(festival, search_results)
+    logger.info("Enrich prompt for festival %s: ~%s tokens", festival.pk, prompt.estimated_tokens)
+
+    def mistral_chat() -> Dict[str, Any]:
+        if listener is None:
+            return extract_fields_from_llm(
+                mistral_client.chat(
+                    prompt=prompt.user, system=prompt.system, cache_policy="enrich", regenerate=not use_cache
+                )
+            )
+        parser = IncrementalJSONParser()
+        fields: Dict[str, Any] = {}
+        chunks = mistral_client.stream_chat(
+            prompt=prompt.user, system=prompt.system, cache_policy="enrich", regenerate=not use_cache
+        )
+        for chunk in chunks:
+            for field, value in validated_fields(parser.feed(chunk)):
+                fields[field] = value
+                listener("field", (field, value))
+        # Salvage what a truncated response still holds
+        for field, value in validated_fields(parser.finish()):
+            fields[field] = value
+            listener("field", (field, value))
+        return fields
+
+    if listener is not None:
+        listener("generate", {"estimated_tokens": prompt.estimated_tokens})
+
+    # A reply without a single usable field counts as a failure, so the other provider gets a go
+    return router.run(
+        Route("mistral", "chat", mistral_chat),
+        Route(
+            "gemini",
+            "chat",
+            lambda: extract_fields_from_llm(gemini_client.chat(prompt=prompt.user, system=prompt.system)),
+        ),
+        hedge=hedge and settings.ENRICH_HEDGE_CHAT,
+    )
+
+
+async def afetch_enrichment(
+    festival: Festival,
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    search_results = await asearch_festival(festival, gemini_client, mistral_client, use_cache)
+    prompt: EnrichPrompt = build_enrich_prompt(festival, search_results)
+    logger.info("Enrich prompt for festival %s: ~%s tokens", festival.pk, prompt.estimated_tokens)
+
+    async def mistral_chat() -> Dict[str, Any]:
+        return extract_fields_from_llm(
+            await mistral_client.achat(
+                prompt=prompt.user, system=prompt.system, cache_policy="enrich", regenerate=not use_cache
+            )
+        )
+
+    async def gemini_chat() -> Dict[str, Any]:
+        return extract_fields_from_llm(await gemini_client.achat(prompt=prompt.user, system=prompt.system))
+
+    return await router.arun(
+        ("mistral", "chat", mistral_chat),
+        ("gemini", "chat", gemini_chat),
+        hedge=settings.ENRICH_HEDGE_CHAT,
+    )
+
+
+class AppliedFields(NamedTuple):
+    changed: List[str]
+    # Field -> validation messages, for proposed values that were reverted
+    rejected: Dict[str, List[str]]
+
+
+def apply_enrichment(festival: Festival, updated_fields: Dict[str, Any]) -> AppliedFields:
+    """
+    Applies LLM fields plus clean_festival_data to the instance and reports the model fields whose
+    value actually changed. Values failing model validation (e.g. a malformed URL) are reverted.
+    """
+    before = {field: getattr(festival, field) for field in ENRICH_RECORD_FIELDS}
+
+    for field, value in updated_fields.items():
+        setattr(festival, field, Festival._meta.get_field(field).to_python(value))
+    clean_festival_data(festival)
+
+    changed = [field for field in ENRICH_RECORD_FIELDS if getattr(festival, field) != before[field]]
+    rejected: Dict[str, List[str]] = {}
+    try:
+        festival.clean_fields(exclude=[f.name for f in Festival._meta.fields if f.name not in changed])
+    except ValidationError as e:
+        for field, errors in e.message_dict.items():
+            setattr(festival, field, before[field])
+            rejected[field] = errors
+        changed = [field for field in changed if field not in rejected]
+    return AppliedFields(changed, rejected)
+
+
+def apply_enrichment_fields(festival: Festival, updated_fields: Dict[str, Any]) -> List[str]:
+    """apply_enrichment() for callers that only need the changed fields."""
+    return apply_enrichment(festival, updated_fields).changed
+
+
+def enrich_festival(
+    festival: Festival,
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    use_cache: bool = True,
+    hedge: bool = True,
+) -> List[str]:
+    """
+    Runs search -> prompt -> chat -> extract -> clean on an in-memory festival and returns the changed
+    fields. Does not touch the DB, see save_enrichment. Provider failures raise services.errors.LLMError.
+    """
+    try:
+        updated_fields = enrich_flight.do(
+            enrichment_key(festival, use_cache),
+            lambda: fetch_enrichment(festival, gemini_client, mistral_client, use_cache, hedge=hedge),
+        )
+    except SingleFlightError as e:
+        # We were a follower and the leader's provider call failed
+        raise LLMError("enrich", str(e))
+    return apply_enrichment_fields(festival, updated_fields)
+
+
+async def aenrich_festival(
+    festival: Festival,
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    use_cache: bool = True,
+) -> List[str]:
+    """Async version of enrich_festival for the ASGI views."""
+    try:
+        updated_fields = await enrich_flight.ado(
+            enrichment_key(festival, use_cache),
+            lambda: afetch_enrichment(festival, gemini_client, mistral_client, use_cache),
+        )
+    except SingleFlightError as e:
+        raise LLMError("enrich", str(e))
+    return apply_enrichment_fields(festival, updated_fields)
+
+
+def enrich_many(
+    festivals: Iterable[Festival],
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    concurrency: int,
+    use_cache: bool = True,
+) -> Tuple[List[Tuple[Festival, List[str]]], List[Dict[str, Any]]]:
+    """
+    Enriches festivals concurrently, at most `concurrency` in flight and without hedging (see
+    search_festival). Returns (festival, changed fields) pairs and failures. The festivals must already
+    be loaded: worker threads never run ORM queries.
+    """
+    enriched: List[Tuple[Festival, List[str]]] = []
+    failures: List[Dict[str, Any]] = []
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(enrich_festival, festival, gemini_client, mistral_client, use_cache, hedge=False): festival
+            for festival in festivals
+        }
+        for future in as_completed(futures):
+            festival = futures[future]
+            try:
+                enriched.append((festival, future.result()))
+            except Exception as e:
+                failures.append({"id": festival.id, "error": str(e), "error_type": type(e).__name__})
+
+    enriched.sort(key=lambda item: item[0].id)
+    failures.sort(key=lambda f: f["id"])
+    return enriched, failures
+
+
+def _mark_succeeded(festival: Festival) -> List[str]:
+    festival.last_enriched_at = timezone.now()
+    festival.last_enrichment_status = "SUCCEEDED"
+    festival.last_enrichment_error = None
+    festival.updated_at = festival.last_enriched_at
+    return list(ENRICHMENT_TRACKING_FIELDS)
+
+
+def save_enrichment(festival: Festival, changed_fields: List[str]) -> None:
+    # Only the changed columns (plus the enrichment bookkeeping) are written
+    festival.save(update_fields=changed_fields + _mark_succeeded(festival))
+    record_enrichment_attempts(1)
+
+
+async def asave_enrichment(festival: Festival, changed_fields: List[str]) -> None:
+    await festival.asave(update_fields=changed_fields + _mark_succeeded(festival))
+    await sync_to_async(record_enrichment_attempts)(1)
+
+
+def save_enrichments(
+    enriched: List[Tuple[Festival, List[str]]],
+    failures: List[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+) -> None:
+    """
+    Persists a multi-festival run in one transaction. Festivals with the same set of changed fields
+    go through one chunked bulk_update, so each UPDATE only touches columns that changed.
+    """
+    if batch_size is None:
+        batch_size = settings.ENRICH_BULK_UPDATE_BATCH_SIZE
+
+    groups: Dict[Tuple[str, ...], List[Festival]] = defaultdict(list)
+    for festival, changed_fields in enriched:
+        _mark_succeeded(festival)
+        groups[tuple(sorted(changed_fields))].append(festival)
+
+    with transaction.atomic():
+        for fields, festivals in groups.items():
+            Festival.objects.bulk_update(
+                festivals, list(fields) + list(ENRICHMENT_TRACKING_FIELDS), batch_size=batch_size
+            )
+        for failure in failures:
+            _mark_failed(failure["id"], failure["error"])
+        record_enrichment_attempts(len(enriched) + len(failures), failures=len(failures))
+
+
+def _mark_failed(festival_id: int, error: str) -> None:
+    # update() rather than save(): the in-memory instance may hold a half-applied result
+    Festival.objects.filter(pk=festival_id).update(
+        last_enriched_at=timezone.now(),
+        last_enrichment_status="FAILED",
+        last_enrichment_error=error,
+        updated_at=timezone.now(),
+    )
+
+
+def record_enrichment_failure(festival_id: int, error: str) -> None:
+    _mark_failed(festival_id, error)
+    record_enrichment_attempts(1, failures=1)
+
+
+def record_enrichment_attempts(attempts: int, failures: int = 0) -> None:
+    """
+    Counts attempts against today's ENRICH_DAILY_BUDGET. Failed attempts count too, since they spent
+    provider calls, but separately so the scheduler can report what they took.
+    """
+    if not attempts:
+        return
+    usage, _ = EnrichmentUsage.objects.get_or_create(day=timezone.now().date())
+    EnrichmentUsage.objects.filter(pk=usage.pk).update(
+        attempts=F("attempts") + attempts, failures=F("failures") + failures
+    )
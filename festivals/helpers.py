@@ -1,124 +1,184 @@
-from typing import Dict, Any, Optional
+from datetime import date
+from typing import TYPE_CHECKING, Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Set, Tuple
+from django.conf import settings
+from django.db import models
 from festivals.models import Festival
-import json
+from festivals.llm_json import parse_llm_json
+import logging
 import re
-from mistralai import ConversationResponse, TextChunk
-
+from services.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from mistralai import ConversationResponse
+
+logger = logging.getLogger(__name__)
+
+
+def parse_flag(value: Any) -> bool:
+    # Query params and form data send booleans as strings
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+FESTIVAL_TYPE_VALUES: str = ", ".join(value for (value, _) in Festival.FESTIVAL_TYPES)
+APPLICATION_TYPE_VALUES: str = ", ".join(value for (value, _) in Festival.APPLICATION_TYPE)
+
+# Record fields shown to the model, in prompt order
+ENRICH_RECORD_FIELDS: Tuple[str, ...] = (
+    "festival_name",
+    "country",
+    "town",
+    "approximate_date",
+    "start_date",
+    "end_date",
+    "website_url",
+    "festival_type",
+    "description",
+    "contact_person",
+    "contact_email",
+    "application_date_start",
+    "application_date_end",
+    "application_type",
+    "comments",
+)
+
+# Fields the LLM may update
+ENRICH_OUTPUT_FIELDS: Tuple[str, ...] = tuple(f for f in ENRICH_RECORD_FIELDS if f != "festival_name")
+
+# Static instructions, built once and sent as the system message so they are identical across calls
+ENRICH_SYSTEM_PROMPT: str = f"""You enrich festival data for a cultural booking app.
+
+TASK
+- Read the current record and the web search snippets.
+- If the snippets provide better or newer information for a field, you must update it.
+- If a field is missing in the snippets, keep the existing value.
+- Translate non-English data to English.
+- Dates are ISO 8601 strings "YYYY-MM-DD".
+- A date range (e.g. "12–15 July 2026") sets start_date to the first day, end_date to the last day and updates approximate_date.
+- If only month/year is known, leave start_date/end_date empty strings and set a clear approximate_date.
+- approximate_date: day 1–10 "early <Month>", 11–20 "mid <Month>", 21–31 "late <Month>"; spanning months e.g. "late June–early July".
+- festival_type, one of: {FESTIVAL_TYPE_VALUES} (look for street festival, circus, music, theatre, dance, film terms).
+- application_type, one of: {APPLICATION_TYPE_VALUES}. Apply the first rule that matches:
+  1) FORM: an application portal or form (Google Form, Typeform, Jotform, "apply/inscription/anmeldung/postuler/solicitar" page).
+  2) INVITATION_ONLY: the event is curated / by invitation only.
+  3) EMAIL: proposals are sent by email, or no rule above matches but a contact email exists on the page or in the record.
+  4) OTHER: a specific method that is none of the above; describe it in comments.
+  5) UNKNOWN: no form, no invitation-only statement and no email at all.
+- Treat hints as concepts, not exact strings (any language).
+
+SOURCES & CONFLICTS
+- Prefer official festival website > reputable cultural listings > news > blogs.
+- If sources conflict, pick the most recent official source.
+
+OUTPUT
+Return only one valid JSON object, no prose, no comments, no trailing commas, with exactly these string keys:
+country, town, approximate_date, start_date, end_date, website_url, festival_type, description, contact_person,
+contact_email, application_date_start, application_date_end, application_type, comments, sources, updated_fields
+Example: {{"country": "Belgium", "town": "Brussels", "approximate_date": "mid October", "start_date": "2026-10-15",
+"end_date": "2026-10-20", "website_url": "https://examplefest.be", "festival_type": "STREET",
+"description": "Annual festival showcasing contemporary circus arts.", "contact_person": "Jane Doe",
+"contact_email": "info@examplefest.be", "application_date_start": "2026-05-01", "application_date_end": "2026-06-15",
+"application_type": "FORM", "comments": "", "sources": ["https://examplefest.be"], "updated_fields": ["start_date"]}}"""
+
+# Words that make a snippet worth its tokens for this task
+SNIPPET_KEYWORDS: Tuple[str, ...] = (
+    "apply", "application", "applications", "call", "deadline", "submission", "submit", "form",
+    "contact", "email", "programme", "program", "dates", "edition", "festival", "invitation",
+    "inscription", "candidature", "bewerbung", "anmeldung", "convocatoria",
+)
+SNIPPET_PATTERNS: Tuple[Pattern, ...] = (
+    re.compile(r"https?://\S+"),
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"),
+    re.compile(r"\b20\d\d\b"),
+    re.compile(r"\b\d{1,2}(?:st|nd|rd|th)?\s*(?:[-–]\s*\d{1,2})?\s+[A-Z][a-z]{2,}"),
+)
+
+
+class EnrichPrompt(NamedTuple):
+    system: str
+    user: str
+    estimated_tokens: int
+
+
+def _snippet_score(snippet: str, record_terms: Set[str]) -> float:
+    words = set(re.findall(r"\w+", snippet.lower()))
+    score = 2.0 * len(words & record_terms)
+    score += sum(1 for keyword in SNIPPET_KEYWORDS if keyword in words)
+    score += sum(1.5 for pattern in SNIPPET_PATTERNS if pattern.search(snippet))
+    return score
+
+
+def select_snippets(search_results: Optional[str], record_terms: Set[str], token_budget: int) -> str:
+    """
+    Splits the search text into snippets, keeps the most relevant ones that fit token_budget
+    and returns them in their original order.
+    """
+    if not search_results:
+        return "No search results provided."
 
-def generate_enrich_prompt(festival: Festival, search_results: Optional[str]) -> str:
-    festival_types = Festival.FESTIVAL_TYPES
-    application_types = Festival.APPLICATION_TYPE
+    snippets = [s.strip() for s in re.split(r"\n\s*\n|\n(?=\s*[-*•]|\s*\d+\.)", search_results) if s.strip()]
+    ranked = sorted(
+        enumerate(snippets), key=lambda item: _snippet_score(item[1], record_terms), reverse=True
+    )
 
-    sr = search_results or "No search results provided."
+    kept: List[Tuple[int, str]] = []
+    remaining = token_budget
+    for index, snippet in ranked:
+        cost = estimate_tokens(snippet)
+        if cost > remaining:
+            # Cut an oversized snippet rather than dropping it when it is still the best we have
+            if not kept and remaining > 0:
+                kept.append((index, snippet[: remaining * 4]))
+                remaining = 0
+            continue
+        kept.append((index, snippet))
+        remaining -= cost
+
+    return "\n\n".join(snippet for _, snippet in sorted(kept))
+
+
+def build_enrich_prompt(
+    festival: Festival,
+    search_results: Optional[str],
+    snippet_token_budget: Optional[int] = None,
+) -> EnrichPrompt:
+    if snippet_token_budget is None:
+        snippet_token_budget = settings.ENRICH_SNIPPET_TOKEN_BUDGET
+
+    # Only non-empty fields: the model keeps missing ones empty anyway
+    record_lines = []
+    for field in ENRICH_RECORD_FIELDS:
+        value = getattr(festival, field)
+        if value not in (None, ""):
+            record_lines.append(f"{field}: {value}")
+
+    record_terms = {
+        word
+        for field in ("festival_name", "town", "country")
+        for word in re.findall(r"\w+", str(getattr(festival, field) or "").lower())
+        if len(word) > 2
+    }
+    snippets = select_snippets(search_results, record_terms, snippet_token_budget)
+
+    user = "CURRENT RECORD\n" + "\n".join(record_lines) + "\n\nWEB SEARCH SNIPPETS\n" + snippets
+    return EnrichPrompt(
+        system=ENRICH_SYSTEM_PROMPT,
+        user=user,
+        estimated_tokens=estimate_tokens(ENRICH_SYSTEM_PROMPT) + estimate_tokens(user),
+    )
 
-    # Small helpers to avoid 'None' textual noise in the prompt
-    def nv(x):
-        return "" if x is None else str(x)
 
-    fest_types_str = ", ".join([value for (value, _) in festival_types])
-    app_types_str = ", ".join([value for (value, _) in application_types])
+def generate_enrich_prompt(festival: Festival, search_results: Optional[str]) -> str:
+    # Single-message form of build_enrich_prompt, for callers that cannot send a system message
+    prompt = build_enrich_prompt(festival, search_results)
+    return f"{prompt.system}\n\n{prompt.user}"
 
-    prompt = f"""
-    You are enriching festival data for a cultural booking app.
-
-    TASK
-    - Read the current record and the web search snippets.
-    - If the web snippets provide better or newer information for a field, **you must update it**.
-    - If a field is missing in the snippets, keep the existing value.
-    - Translate non-English data to English.
-    - Normalize dates to ISO 8601 as strings: "YYYY-MM-DD".
-    - If a single text gives a **date range** (e.g., "12–15 July 2026"), set:
-      - start_date = first day in ISO
-      - end_date   = last day in ISO
-      - also update approximate_date (e.g., "mid July" or "late June–early July" if it spans months)
-    - If only month/year is known, leave start_date/end_date empty strings and set a clear approximate_date.
-    - Choose festival_type from: {fest_types_str}
-    - Choose application_type from: {app_types_str}
-
-    SOURCES & CONFLICTS
-    - Prefer official festival website > reputable cultural listings > news > blogs.
-    - If sources conflict, pick the **most recent official source**.
-
-    OUTPUT FORMAT
-    - Return **only** a single JSON object, no prose.
-    - Valid JSON. No comments. No trailing commas.
-    - Exactly these keys (strings):
-      country, town, approximate_date, start_date, end_date, website_url,
-      festival_type, description, contact_person, contact_email,
-      application_date_start, application_date_end, application_type,
-      sources, updated_fields
-
-    CURRENT RECORD
-    country: {nv(festival.country)}
-    town: {nv(festival.town)}
-    approximate_date: {nv(festival.approximate_date)}
-    start_date: {nv(festival.start_date)}
-    end_date: {nv(festival.end_date)}
-    website_url: {nv(festival.website_url)}
-    festival_type: {nv(festival.festival_type)}
-    description: {nv(festival.description)}
-    contact_person: {nv(festival.contact_person)}
-    contact_email: {nv(festival.contact_email)}
-    application_date_start: {nv(festival.application_date_start)}
-    application_date_end: {nv(festival.application_date_end)}
-    application_type: {nv(festival.application_type)}
-    comments: {nv(festival.comments)}
-
-    WEB SEARCH SNIPPETS (include URLs if you have them)
-    {sr}
-
-    APPROXIMATE DATE RULES
-    - Day 1–10 → "early <Month>"
-    - Day 11–20 → "mid <Month>"
-    - Day 21–31 → "late <Month>"
-    - If the range spans two months, combine, e.g., "late June–early July".
-
-    RECOGNITION HINTS
-    festival_type (choose one: from {fest_types_str} )
-    application_type  (choose one: EMAIL, FORM, INVITATION_ONLY, UNKNOWN, OTHER)
-
-    Decision order (apply the first rule that matches; do not skip ahead):
-    1) FORM — there is an application portal or form (any language; may be Google Form, Typeform, Jotform; or an obvious
-     “apply/inscription/anmeldung/postuler/solicitar” button or dedicated application page).
-    2) INVITATION_ONLY — the event is curated/by invitation only (any language).
-    3) EMAIL — the page asks to send proposals/submissions by email OR mentions applying via email.
-    4) FALLBACK to EMAIL — if none of the above are present BUT a contact email is present on the page or the current
-     record has a non-empty contact_email, classify as EMAIL.
-    5) OTHER - if the application method is specifically mentioned and is neither FORM, INVITATION_ONLY, nor EMAIL. 
-     Add details about the application process in the comments field.
-    6) UNKNOWN — only if there is no form, no invitation-only statement, and **no** email available at all.
-
-    Notes:
-    - Treat hints as concepts, not exact strings (any language).
-    - festival_type:
-      - look for domain terms: street festival, circus, music, theatre, dance, film, circus.
-
-    REQUIRED JSON SHAPE (example, syntactically correct — values are illustrative):
-    {{
-      "country": "Belgium",
-      "town": "Brussels",
-      "approximate_date": "mid October",
-      "start_date": "2026-10-15",
-      "end_date": "2026-10-20",
-      "website_url": "https://examplefest.be",
-      "festival_type": "STREET",
-      "description": "Annual festival showcasing contemporary circus arts.",
-      "contact_person": "Jane Doe",
-      "contact_email": "info@examplefest.be",
-      "application_date_start": "2026-05-01",
-      "application_date_end": "2026-06-15",
-      "application_type": "FORM",
-      "comments": "this is a comment."
-    }}
-    """
-    return prompt
 
+def extract_search_results(search_results: "ConversationResponse"):
+    from mistralai import TextChunk
 
-def extract_search_results(search_results: ConversationResponse):
     content = next(
         (o for o in search_results.outputs if o.type == "message.output"), None
     )
-    # print("content", content)
 
     chunks = getattr(content, "content", [])
 
@@ -129,20 +189,50 @@ def extract_search_results(search_results: ConversationResponse):
     return parsed_text
 
 
+def validate_enrichment_field(field: str, value: Any) -> Tuple[bool, Any]:
+    """
+    Checks one LLM-proposed value against the Festival model: unknown fields, values outside the
+    choice lists and unparseable dates are rejected. Returns (is_valid, normalised_value).
+    Empty values are rejected too: the prompt asks for empty strings when a field is unknown (e.g. a
+    date known only to the month), which means "no change", not "clear the stored value".
+    """
+    if field not in ENRICH_OUTPUT_FIELDS or value is None or value == "":
+        return False, None
+
+    model_field = Festival._meta.get_field(field)
+
+    if isinstance(model_field, models.DateField):
+        # Kept as an ISO string so results stay JSON-serialisable (single-flight, job results)
+        try:
+            return True, date.fromisoformat(str(value)).isoformat()
+        except ValueError:
+            return False, None
+
+    if not isinstance(value, str):
+        return False, None
+
+    if model_field.choices:
+        value = value.strip().upper()
+        return value in {choice for (choice, _) in model_field.choices}, value
+
+    if model_field.max_length:
+        value = value[: model_field.max_length]
+    return True, value
+
+
+def validated_fields(members: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+    for field, value in members:
+        is_valid, value = validate_enrichment_field(field, value)
+        if is_valid:
+            yield field, value
+
+
 def extract_fields_from_llm(llm_response: str) -> Dict[str, Any]:
-    json_str: str = re.sub(r"```json\s*|\s*```", "", llm_response).strip()
-    try:
-        # Parse the JSON response from the Mistral API
-        response_data: Dict[str, Any] = json.loads(json_str)
-        return response_data
-
-    except json.JSONDecodeError as e:
-        print(f"An error occurred while parsing the JSON response: {e}")
-        return {}
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return {}
+    # Tolerates code fences, surrounding prose and a truncated tail: every complete member is kept
+    fields: Dict[str, Any] = dict(validated_fields(parse_llm_json(llm_response)))
+    if not fields:
+        logger.warning("No usable fields in the LLM response: %r", llm_response[:200])
+    return fields
 
 
 def clean_festival_data(festival: Festival) -> None:
@@ -0,0 +1,152 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object while it is being streamed and hands back each top-level member
+    as soon as it is complete. Text before the object (code fences, prose) is ignored, including
+    braces in that prose: a "{" that does not open a valid object is dropped and scanning resumes
+    right after it.
+    """
+
+    def __init__(self):
+        self.finished = False
+        self.members: List[Tuple[str, Any]] = []
+        self._restart()
+
+    def _restart(self) -> None:
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.member: List[str] = []
+        # Text after the opening brace, kept until a member parses so a false start can be rescanned
+        self.candidate: Optional[List[str]] = None
+        self.awaiting_key = False
+
+    def _open(self) -> None:
+        self.started = True
+        self.depth = 1
+        self.candidate = []
+        self.awaiting_key = True
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        completed = self._scan(chunk)
+        self.members.extend(completed)
+        return completed
+
+    def _scan(self, text: str) -> List[Tuple[str, Any]]:
+        completed: List[Tuple[str, Any]] = []
+        for char in text:
+            if self.finished:
+                break
+
+            if not self.started:
+                if char == "{":
+                    self._open()
+                continue
+
+            if self.awaiting_key and not char.isspace():
+                self.awaiting_key = False
+                # An object opens with a key or closes at once, so "{name}" or "{ see below" is prose
+                if char not in '"}':
+                    self._restart()
+                    if char == "{":
+                        self._open()
+                    continue
+
+            if self.candidate is not None:
+                self.candidate.append(char)
+
+            if self.in_string:
+                self.member.append(char)
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+
+            # A comma or the closing brace at the top level ends a member
+            if self.depth == 0 or (self.depth == 1 and char == ","):
+                member = self._parse_member("".join(self.member))
+                if member is None and self.candidate is not None:
+                    # Nothing parsed since the opening brace: it was not the object, look inside it
+                    replay = "".join(self.candidate)
+                    self._restart()
+                    completed += self._scan(replay)
+                    continue
+                if member:
+                    completed.append(member)
+                    self.candidate = None
+                if self.depth == 0:
+                    self.finished = True
+                self.member = []
+                continue
+
+            self.member.append(char)
+
+        return completed
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        """
+        Call when the stream ends. A truncated trailing member is repaired when its value is a
+        number, boolean or list; a cut-off string is dropped rather than stored half-written.
+        """
+        if self.finished or not self.member:
+            return []
+
+        text = "".join(self.member)
+        closing = ('"' if self.in_string else "") + "]" * max(0, self._open_lists(text))
+        member = self._parse_member(text + closing)
+        self.member = []
+        if member is None or isinstance(member[1], str):
+            return []
+        self.members.append(member)
+        return [member]
+
+    @staticmethod
+    def _open_lists(text: str) -> int:
+        depth, in_string, escaped = 0, False, False
+        for char in text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "[":
+                depth += 1
+            elif char == "]":
+                depth -= 1
+        return depth
+
+    @staticmethod
+    def _parse_member(text: str) -> Optional[Tuple[str, Any]]:
+        text = text.strip()
+        if not text:
+            return None
+        try:
+            parsed = json.loads("{" + text + "}")
+        except json.JSONDecodeError:
+            return None
+        return next(iter(parsed.items()), None)
+
+
+def parse_llm_json(text: str) -> List[Tuple[str, Any]]:
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    parser.finish()
+    return parser.members
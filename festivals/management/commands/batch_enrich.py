@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from festivals.batch import apply_batch_results, render_batch_file
+from festivals.enrichment import save_enrichments
+from festivals.models import Festival
+from festivals.scheduling import pick_festivals_to_enrich
+from services.batch import TERMINAL_STATUSES, LocalBatchBackend, MistralBatchBackend, interactive_responder
+from services.registry import get_gemini_client, get_mistral_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-enriches festivals through the provider batch API: renders the enrich prompts to JSONL, "
+        "submits them, polls until the batch is done and bulk-writes the results. "
+        "Cheaper than schedule_enrichment when nobody waits for the answer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=int, nargs="+", help="Festivals to enrich (default: the most urgent ones)")
+        parser.add_argument("--limit", type=int, default=200, help="Festivals to pick when --ids is not given")
+        parser.add_argument("--daily-budget", type=int, default=settings.ENRICH_DAILY_BUDGET)
+        parser.add_argument("--min-age-days", type=int, default=settings.ENRICH_MIN_AGE_DAYS)
+        parser.add_argument("--concurrency", type=int, default=settings.ENRICH_BATCH_DEFAULT_CONCURRENCY, help="Parallel searches while rendering")
+        parser.add_argument("--backend", choices=["mistral", "local"], default="mistral", help="'local' answers through the interactive endpoint")
+        parser.add_argument("--output", help="Keep the rendered JSONL at this path")
+        parser.add_argument("--resume", metavar="JOB_ID", help="Poll and apply an already submitted batch job")
+        parser.add_argument("--poll-interval", type=float, default=60.0)
+        parser.add_argument("--timeout-hours", type=int, default=24)
+
+    def handle(self, *args, **options):
+        mistral = get_mistral_client()
+        backend = (
+            LocalBatchBackend(interactive_responder(mistral))
+            if options["backend"] == "local"
+            else MistralBatchBackend(mistral)
+        )
+
+        if options["resume"]:
+            job = backend.get(options["resume"])
+        else:
+            job = self.submit(backend, mistral, options)
+            if job is None:
+                return
+            self.stdout.write(f"Submitted batch job {job.id} ({job.total_requests} requests)")
+
+        while job.status not in TERMINAL_STATUSES:
+            time.sleep(options["poll_interval"])
+            job = backend.get(job.id)
+            self.stdout.write(f"Batch job {job.id}: {job.status} {job.completed_requests}/{job.total_requests}")
+
+        if not job.output_file:
+            raise CommandError(f"Batch job {job.id} ended with status {job.status} and no output file")
+
+        enriched, failures = apply_batch_results(backend.results(job))
+        self.stdout.write(
+            self.style.SUCCESS(f"Batch job {job.id} ({job.status}): enriched {enriched} festivals, {len(failures)} failed")
+        )
+
+    def submit(self, backend, mistral, options):
+        if options["ids"]:
+            festivals = list(Festival.objects.filter(pk__in=options["ids"]).order_by("id"))
+        else:
+            festivals = pick_festivals_to_enrich(
+                limit=options["limit"],
+                daily_budget=options["daily_budget"],
+                min_age_days=options["min_age_days"],
+            )
+        if not festivals:
+            self.stdout.write("Nothing to enrich")
+            return None
+
+        path = options["output"] or os.path.join(tempfile.mkdtemp(prefix="batch_enrich_"), "enrich.jsonl")
+        concurrency = min(options["concurrency"], settings.ENRICH_BATCH_MAX_CONCURRENCY)
+        with open(path, "w", encoding="utf-8") as fh:
+            written, failures = render_batch_file(festivals, get_gemini_client(), mistral, fh, concurrency)
+        # Search failures never reach the batch, record them now
+        save_enrichments([], failures)
+        self.stdout.write(f"Rendered {written} requests to {path}, {len(failures)} searches failed")
+        if not written:
+            return None
+
+        return backend.submit(
+            path,
+            metadata={"purpose": "festival_enrichment", "festivals": str(written)},
+            timeout_hours=options["timeout_hours"],
+        )
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from festivals.enrichment import enrich_many, save_enrichments
+from festivals.scheduling import enrichment_priority, enrichment_usage_today, pick_festivals_to_enrich
+from services.registry import get_gemini_client, get_mistral_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-enriches the most urgent festivals (stale, season coming up, missing fields) "
+        "within the daily enrichment budget. Meant to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=50, help="Festivals to enrich in this run")
+        parser.add_argument("--daily-budget", type=int, default=settings.ENRICH_DAILY_BUDGET)
+        parser.add_argument("--min-age-days", type=int, default=settings.ENRICH_MIN_AGE_DAYS)
+        parser.add_argument("--concurrency", type=int, default=settings.ENRICH_BATCH_DEFAULT_CONCURRENCY)
+        parser.add_argument("--dry-run", action="store_true", help="Only list the festivals that would be enriched")
+
+    def handle(self, *args, **options):
+        festivals = pick_festivals_to_enrich(
+            limit=options["limit"],
+            daily_budget=options["daily_budget"],
+            min_age_days=options["min_age_days"],
+        )
+        usage = enrichment_usage_today()
+        self.report_usage(usage, options["daily_budget"])
+        if not festivals:
+            if usage.attempts >= options["daily_budget"]:
+                self.stdout.write("Nothing to enrich: daily budget used up")
+            else:
+                self.stdout.write("Nothing to enrich: no stale festivals")
+            return
+
+        today = timezone.now().date()
+        for festival in festivals:
+            self.stdout.write(f"{enrichment_priority(festival, today):8.1f}  #{festival.pk} {festival}")
+
+        if options["dry_run"]:
+            return
+
+        concurrency = min(options["concurrency"], settings.ENRICH_BATCH_MAX_CONCURRENCY)
+        enriched, failures = enrich_many(
+            festivals, get_gemini_client(), get_mistral_client(), concurrency=concurrency
+        )
+
+        save_enrichments(enriched, failures)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Enriched {len(enriched)} festivals, {len(failures)} failed")
+        )
+        self.report_usage(enrichment_usage_today(), options["daily_budget"])
+
+    def report_usage(self, usage, daily_budget):
+        self.stdout.write(f"Daily budget: {usage.attempts}/{daily_budget} attempts used today")
+        if usage.failures:
+            # Failed attempts spend the budget like successful ones, make it visible
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{usage.failures} of today's attempts failed, see last_enrichment_error on the festivals"
+                )
+            )
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('festivals', '0008_alter_festival_application_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='festival',
+            name='last_enriched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='festival',
+            name='last_enrichment_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='festival',
+            name='last_enrichment_status',
+            field=models.CharField(blank=True, choices=[('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('festivals', '0009_festival_enrichment_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='festival',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:23
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('festivals', '0010_festival_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(django.db.models.functions.text.Lower('festival_name'), name='festival_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(fields=['country'], name='festival_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(fields=['festival_type'], name='festival_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(fields=['application_type'], name='festival_application_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(fields=['start_date'], name='festival_start_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(fields=['updated_at'], name='festival_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# The index as it stood when this migration was written; festivals.search keeps the current definition
+# and repairs the triggers after every migrate (ensure_search_index), so later changes do not alter history.
+CREATE_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS festivals_festival_fts USING fts5("
+    "festival_name, town, country, contact_person, description, comments, "
+    "content='festivals_festival', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS festivals_festival_fts_ai AFTER INSERT ON festivals_festival BEGIN "
+    "INSERT INTO festivals_festival_fts(rowid, festival_name, town, country, contact_person, description, comments) "
+    "VALUES (new.id, new.festival_name, new.town, new.country, new.contact_person, new.description, new.comments); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS festivals_festival_fts_ad AFTER DELETE ON festivals_festival BEGIN "
+    "INSERT INTO festivals_festival_fts("
+    "festivals_festival_fts, rowid, festival_name, town, country, contact_person, description, comments) "
+    "VALUES ('delete', old.id, old.festival_name, old.town, old.country, old.contact_person, old.description, "
+    "old.comments); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS festivals_festival_fts_au "
+    "AFTER UPDATE OF festival_name, town, country, contact_person, description, comments "
+    "ON festivals_festival BEGIN "
+    "INSERT INTO festivals_festival_fts("
+    "festivals_festival_fts, rowid, festival_name, town, country, contact_person, description, comments) "
+    "VALUES ('delete', old.id, old.festival_name, old.town, old.country, old.contact_person, old.description, "
+    "old.comments); "
+    "INSERT INTO festivals_festival_fts(rowid, festival_name, town, country, contact_person, description, comments) "
+    "VALUES (new.id, new.festival_name, new.town, new.country, new.contact_person, new.description, new.comments); "
+    "END",
+    "INSERT INTO festivals_festival_fts(festivals_festival_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS festivals_festival_fts_ai",
+    "DROP TRIGGER IF EXISTS festivals_festival_fts_ad",
+    "DROP TRIGGER IF EXISTS festivals_festival_fts_au",
+    "DROP TABLE IF EXISTS festivals_festival_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            for sql in CREATE_SEARCH_INDEX:
+                cursor.execute(sql)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            for sql in DROP_SEARCH_INDEX:
+                cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('festivals', '0011_festival_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('festivals', '0012_festival_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(fields=['town'], name='festival_town_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(fields=['end_date'], name='festival_end_date_idx'),
+        ),
+    ]
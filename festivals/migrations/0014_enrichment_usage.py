@@ -0,0 +1,22 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('festivals', '0013_festival_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrichmentUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from typing import List, Tuple
 
 
@@ -14,6 +15,11 @@ class Festival(models.Model):
         ("OTHER", "Other"),
     ]
 
+    ENRICHMENT_STATUS: List[Tuple[str, str]] = [
+        ("SUCCEEDED", "Succeeded"),
+        ("FAILED", "Failed"),
+    ]
+
     APPLICATION_TYPE: List[Tuple[str, str]] = [
         ("EMAIL", "Email"),
         ("FORM", "Form"),
@@ -46,6 +52,36 @@ class Festival(models.Model):
     )
     applied = models.BooleanField(default=False)
     comments = models.TextField(max_length=500, blank=True, null=True)
+    last_enriched_at = models.DateTimeField(blank=True, null=True)
+    last_enrichment_status = models.CharField(
+        max_length=20, choices=ENRICHMENT_STATUS, blank=True, null=True
+    )
+    last_enrichment_error = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Case-insensitive name lookups (imports, dedup) filter on LOWER(festival_name)
+            models.Index(Lower("festival_name"), name="festival_name_lower_idx"),
+            models.Index(fields=["country"], name="festival_country_idx"),
+            models.Index(fields=["town"], name="festival_town_idx"),
+            models.Index(fields=["festival_type"], name="festival_type_idx"),
+            models.Index(fields=["application_type"], name="festival_application_type_idx"),
+            models.Index(fields=["start_date"], name="festival_start_date_idx"),
+            models.Index(fields=["end_date"], name="festival_end_date_idx"),
+            models.Index(fields=["updated_at"], name="festival_updated_at_idx"),
+        ]
+
+    def __str__(self):
+        return self.festival_name
+
+
+class EnrichmentUsage(models.Model):
+    """Enrichment attempts per day, failed ones included: what ENRICH_DAILY_BUDGET is spent on."""
+
+    day = models.DateField(unique=True)
+    attempts = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return self.festival_name
\ No newline at end of file
+        return f"{self.day}: {self.attempts} attempts, {self.failures} failed"
@@ -0,0 +1,102 @@
+import calendar
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from festivals.models import EnrichmentUsage, Festival
+
+# Fields whose absence makes a record worth enriching sooner
+KEY_FIELDS: Tuple[str, ...] = (
+    "country",
+    "town",
+    "website_url",
+    "contact_email",
+    "description",
+    "start_date",
+    "application_date_end",
+)
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+
+NEVER_ENRICHED_AGE_DAYS = 365
+
+
+def next_occurrence(festival: Festival, today: date) -> Optional[date]:
+    """Best guess of the next edition: start_date, else the first month named in approximate_date."""
+    if festival.start_date:
+        return festival.start_date
+
+    text = (festival.approximate_date or "").lower()
+    for word in text.replace("–", " ").replace("-", " ").split():
+        month = MONTHS.get(word)
+        if month:
+            guess = date(today.year, month, 15)
+            return guess if guess >= today else date(today.year + 1, month, 15)
+    return None
+
+
+def enrichment_priority(festival: Festival, today: date) -> float:
+    """Higher means enrich sooner. Combines staleness, the upcoming season and missing fields."""
+    if festival.last_enriched_at:
+        age_days = (today - festival.last_enriched_at.date()).days
+    else:
+        age_days = NEVER_ENRICHED_AGE_DAYS
+    score = float(age_days)
+
+    # Festivals coming up in the next months open applications now: refresh them first
+    upcoming = next_occurrence(festival, today)
+    if upcoming:
+        days_until = (upcoming - today).days
+        if 0 <= days_until <= 270:
+            score += 120 * (1 - days_until / 270)
+        elif days_until < 0:
+            # Past edition with no newer date: the dates are what needs fixing
+            score += 60
+
+    missing = sum(1 for field in KEY_FIELDS if not getattr(festival, field))
+    if festival.application_type in (None, "", "UNKNOWN"):
+        missing += 1
+    score += 15 * missing
+
+    return score
+
+
+def enrichment_usage_today() -> EnrichmentUsage:
+    today = timezone.now().date()
+    return EnrichmentUsage.objects.filter(day=today).first() or EnrichmentUsage(day=today)
+
+
+def remaining_daily_budget(daily_budget: int) -> int:
+    # Attempts, not festivals: a festival retried twice today spent two runs of provider calls
+    return max(0, daily_budget - enrichment_usage_today().attempts)
+
+
+def pick_festivals_to_enrich(
+    limit: int,
+    daily_budget: Optional[int] = None,
+    min_age_days: Optional[int] = None,
+    retry_failed_after_days: int = 1,
+) -> List[Festival]:
+    """The next festivals to enrich, most urgent first, capped by limit and what is left of today's budget."""
+    if daily_budget is None:
+        daily_budget = settings.ENRICH_DAILY_BUDGET
+    if min_age_days is None:
+        min_age_days = settings.ENRICH_MIN_AGE_DAYS
+
+    count = min(limit, remaining_daily_budget(daily_budget))
+    if count <= 0:
+        return []
+
+    now = timezone.now()
+    today = now.date()
+    candidates = Festival.objects.filter(
+        Q(last_enriched_at__isnull=True)
+        | Q(last_enrichment_status="SUCCEEDED", last_enriched_at__lt=now - timedelta(days=min_age_days))
+        | Q(last_enrichment_status="FAILED", last_enriched_at__lt=now - timedelta(days=retry_failed_after_days))
+    )
+
+    ranked = sorted(candidates, key=lambda f: enrichment_priority(f, today), reverse=True)
+    return ranked[:count]
@@ -0,0 +1,115 @@
+import re
+from typing import List, Optional, Tuple
+
+from django.db import connection, connections
+
+from festivals.models import Festival
+
+FTS_TABLE = "festivals_festival_fts"
+
+# Indexed columns and their bm25 weight: a hit in the name counts ten times a hit in the description
+SEARCH_FIELDS: Tuple[Tuple[str, float], ...] = (
+    ("festival_name", 10.0),
+    ("town", 5.0),
+    ("country", 3.0),
+    ("contact_person", 2.0),
+    ("description", 1.0),
+    ("comments", 1.0),
+)
+
+_COLUMNS = ", ".join(field for field, _ in SEARCH_FIELDS)
+_NEW_VALUES = ", ".join(f"new.{field}" for field, _ in SEARCH_FIELDS)
+_OLD_VALUES = ", ".join(f"old.{field}" for field, _ in SEARCH_FIELDS)
+
+# External content table: the index stores only tokens and reads the text from festivals_festival.
+# remove_diacritics 2 folds accents in both documents and queries, so "fete" finds "Fête".
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({_COLUMNS}, "
+    f"content='festivals_festival', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+)
+
+# Triggers rather than signals, so queryset.update() and bulk_update() keep the index in sync too.
+# Updates that do not touch an indexed column (enrichment status, updated_at) do not reindex.
+TRIGGERS = {
+    f"{FTS_TABLE}_ai": (
+        f"AFTER INSERT ON festivals_festival BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES}); END"
+    ),
+    f"{FTS_TABLE}_ad": (
+        f"AFTER DELETE ON festivals_festival BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES}); END"
+    ),
+    f"{FTS_TABLE}_au": (
+        f"AFTER UPDATE OF {_COLUMNS} ON festivals_festival BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES}); END"
+    ),
+}
+
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def install_search_index(cursor) -> bool:
+    """
+    Creates the FTS table and its triggers where missing and rebuilds the index if any trigger was.
+    Migrations that remake festivals_festival (SQLite ALTER TABLE) drop its triggers, so this also
+    runs after every migrate. Returns True when the index was rebuilt.
+    """
+    cursor.execute(CREATE_TABLE_SQL)
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'festivals_festival'"
+    )
+    existing = {name for (name,) in cursor.fetchall()}
+    missing = [name for name in TRIGGERS if name not in existing]
+    for name in missing:
+        cursor.execute(f"CREATE TRIGGER {name} {TRIGGERS[name]}")
+    if missing:
+        cursor.execute(REBUILD_SQL)
+    return bool(missing)
+
+
+def drop_search_index(cursor) -> None:
+    for name in TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for free text typed by a user: every word must match, the words are quoted
+    so FTS syntax (AND, NEAR, *, quotes) in the input is taken literally, and each one matches as a
+    prefix for search-as-you-type ("chal rue" finds "Chalon dans la rue").
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_festivals(query: str, limit: int) -> List[Tuple[Festival, float]]:
+    """Festivals matching `query`, best first, with their bm25 rank (lower is better)."""
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    weights = ", ".join(str(weight) for _, weight in SEARCH_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [expression, limit],
+        )
+        ranked = cursor.fetchall()
+    festivals = Festival.objects.in_bulk([festival_id for festival_id, _ in ranked])
+    return [(festivals[festival_id], rank) for festival_id, rank in ranked if festival_id in festivals]
+
+
+def ensure_search_index(using: str = "default", **kwargs) -> None:
+    """post_migrate receiver restoring triggers lost to a table remake, see install_search_index."""
+    db = connections[using]
+    # Only repairs an index that migration 0012 created
+    if db.vendor != "sqlite" or FTS_TABLE not in db.introspection.table_names():
+        return
+    with db.cursor() as cursor:
+        install_search_index(cursor)
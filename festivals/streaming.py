@@ -0,0 +1,184 @@
+import json
+import queue
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from circus_agent_backend.serializers import FestivalSerializer
+from festivals.enrichment import (
+    AppliedFields,
+    apply_enrichment,
+    enrich_flight,
+    enrichment_key,
+    fetch_enrichment,
+    record_enrichment_failure,
+    save_enrichment,
+)
+from festivals.helpers import ENRICH_RECORD_FIELDS
+from festivals.models import Festival
+from services.errors import LLMError
+from services.gemini_service import GeminiClient
+from services.mistral_service import MistralClient
+from services.singleflight import SingleFlightError
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF content negotiation accept `Accept: text/event-stream` on streaming actions."""
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error responses raised before the stream starts
+        return sse_event("error", data)
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def is_asgi(request: HttpRequest) -> bool:
+    # DRF wraps the Django request
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def event_stream_response(events: Union[Iterable[str], AsyncIterable[str]]) -> StreamingHttpResponse:
+    """
+    Under ASGI, pass an async iterator: Django 4.2 consumes a sync one there with sync_to_async(list),
+    which holds back every event until the stream has ended. WSGI serves sync iterators as they go.
+    """
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def stream_text(chunks: Iterable[str]) -> Iterator[str]:
+    """Relays text chunks as `token` events, then a `done` event carrying the whole text."""
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event("token", {"delta": chunk})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return
+    yield sse_event("done", {"message": "".join(parts)})
+
+
+async def iterate_in_thread(events: Iterator[str]) -> AsyncIterator[str]:
+    """
+    Relays a blocking iterator to an ASGI response one event at a time. Each step runs in the request's
+    sync thread (thread-sensitive), so ORM calls inside the iterator keep one connection.
+    """
+    done = object()
+    step = sync_to_async(next)
+    try:
+        while True:
+            event = await step(events, done)
+            if event is done:
+                return
+            yield event
+    finally:
+        close = getattr(events, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+async def astream_text(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Async counterpart of stream_text for the ASGI deployment."""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event("token", {"delta": chunk})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return
+    yield sse_event("done", {"message": "".join(parts)})
+
+
+def stream_enrichment(
+    festival: Festival,
+    gemini_client: GeminiClient,
+    mistral_client: MistralClient,
+    use_cache: bool = True,
+) -> Iterator[str]:
+    """
+    Streams an enrichment: a `field` event with the applied value of each validated field as soon as the
+    model has written it (`rejected` when model validation reverts it), a `retract` event with the restored
+    value of a field the winning answer does not contain, then `done` with the whole cleaned record once
+    the winning answer's changed fields are saved.
+
+    The provider calls run in a worker thread through enrich_flight and the router, like enrich_festival:
+    a concurrent enrichment of the same festival state shares them, the Mistral stream is hedged with and
+    falls back to a Gemini chat, and a disconnecting client does not abort the call other requests wait on.
+    """
+    events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+
+    def listener(event: str, data: Any) -> None:
+        events.put((event, data))
+
+    def run() -> None:
+        try:
+            fields = enrich_flight.do(
+                enrichment_key(festival, use_cache),
+                lambda: fetch_enrichment(festival, gemini_client, mistral_client, use_cache, listener=listener),
+            )
+        except SingleFlightError as e:
+            # We were a follower and the leader's provider call failed
+            events.put(("error", LLMError("enrich", str(e))))
+        except Exception as e:
+            events.put(("error", e))
+        else:
+            events.put(("result", fields))
+
+    original = {field: getattr(festival, field) for field in ENRICH_RECORD_FIELDS}
+    relayed: Dict[str, Any] = {}
+
+    def field_event(field: str, value: Any, applied: AppliedFields) -> str:
+        if field in applied.rejected:
+            return sse_event("rejected", {"field": field, "value": value, "errors": applied.rejected[field]})
+        return sse_event("field", {"field": field, "value": getattr(festival, field)})
+
+    def relay(field: str, value: Any) -> str:
+        relayed[field] = value
+        return field_event(field, value, apply_enrichment(festival, {field: value}))
+
+    threading.Thread(target=run, name=f"enrich-stream-{festival.pk}", daemon=True).start()
+    yield sse_event("status", {"stage": "search"})
+    while True:
+        event, data = events.get()
+        if event == "generate":
+            yield sse_event("status", {"stage": "generate", **data})
+        elif event == "field":
+            yield relay(*data)
+        elif event == "error":
+            record_enrichment_failure(festival.pk, str(data))
+            yield sse_event("error", {"error": str(data), "error_type": type(data).__name__})
+            return
+        else:
+            break
+
+    # The winning result is authoritative: it covers a hedged Gemini win and a follower that streamed
+    # nothing itself. The record is rebuilt from it alone, so a field only a failed or losing stream
+    # wrote is retracted rather than saved.
+    for field, value in original.items():
+        setattr(festival, field, value)
+    applied = apply_enrichment(festival, data)
+    for field in relayed:
+        if field not in data:
+            yield sse_event("retract", {"field": field, "value": getattr(festival, field)})
+    for field, value in data.items():
+        if field not in relayed or relayed[field] != value:
+            yield field_event(field, value, applied)
+
+    save_enrichment(festival, applied.changed)
+    yield sse_event("done", FestivalSerializer(festival).data)
@@ -0,0 +1,40 @@
+from typing import Any, Callable, Dict
+
+from circus_agent_backend.serializers import FestivalSerializer
+from festivals.models import Festival
+from services.registry import get_gemini_client, get_mistral_client
+from services.errors import LLMError
+from .enrichment import enrich_festival, record_enrichment_failure, save_enrichment
+from .helpers import generate_application_mail_prompt
+
+# Background job handlers, see jobs.tasks.TASK_HANDLERS
+
+
+def enrich_festival_task(payload: Dict[str, Any], report_progress: Callable[[int], None]) -> Dict[str, Any]:
+    festival = Festival.objects.get(pk=payload["festival_id"])
+    report_progress(10)
+    try:
+        changed_fields = enrich_festival(
+            festival,
+            get_gemini_client(),
+            get_mistral_client(),
+            use_cache=not payload.get("bypass_cache", False),
+        )
+    except LLMError as e:
+        record_enrichment_failure(festival.pk, str(e))
+        raise
+    report_progress(90)
+    save_enrichment(festival, changed_fields)
+    return {"festival": FestivalSerializer(festival).data, "updated_fields": changed_fields}
+
+
+def generate_email_task(payload: Dict[str, Any], report_progress: Callable[[int], None]) -> Dict[str, Any]:
+    festival = Festival.objects.get(pk=payload["festival_id"])
+    report_progress(10)
+    prompt: str = generate_application_mail_prompt(festival)
+    message: str = get_mistral_client().chat(
+        prompt=prompt,
+        cache_policy="application_mail",
+        regenerate=payload.get("regenerate", False),
+    )
+    return {"message": message}
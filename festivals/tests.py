@@ -1,3 +1,781 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.functions import Lower
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from circus_agent_backend.serializers import FestivalSerializer
+from festivals.batch import apply_batch_results, batch_result_content, render_batch_file
+from festivals.enrichment import (
+    apply_enrichment,
+    enrich_many,
+    enrichment_key,
+    record_enrichment_failure,
+    save_enrichment,
+    save_enrichments,
+)
+from festivals.helpers import extract_fields_from_llm, generate_application_mail_prompt
+from festivals.llm_json import IncrementalJSONParser, parse_llm_json
+from festivals.models import EnrichmentUsage, Festival
+from festivals.scheduling import pick_festivals_to_enrich, remaining_daily_budget
+from festivals.search import match_expression, search_festivals
+from festivals.streaming import stream_enrichment
+from services.batch import LocalBatchBackend, interactive_responder, write_jsonl
+from services.errors import LLMError, LLMResponseError
+from services.mistral_service import MistralClient
+from services.registry import registry
+from services.router import router
+from services.singleflight import SingleFlight
+
+
+def query_plan(queryset) -> str:
+    """SQLite's EXPLAIN QUERY PLAN for `queryset`, one step per line."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+
+
+class FestivalIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Festival.objects.bulk_create(
+            Festival(festival_name=f"Festival {i}", country="France" if i % 2 else "Spain") for i in range(50)
+        )
+
+    def test_case_insensitive_name_lookup_uses_lower_index(self):
+        queryset = Festival.objects.alias(name_lower=Lower("festival_name")).filter(name_lower="festival 7")
+        self.assertIn("festival_name_lower_idx", query_plan(queryset))
+        self.assertEqual(queryset.get().festival_name, "Festival 7")
+
+    def test_country_filter_uses_index(self):
+        self.assertIn("festival_country_idx", query_plan(Festival.objects.filter(country="France")))
+
+    def test_festival_type_filter_uses_index(self):
+        self.assertIn("festival_type_idx", query_plan(Festival.objects.filter(festival_type="CIRCUS")))
+
+
+class FestivalSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chalon = Festival.objects.create(festival_name="Chalon dans la rue", town="Chalon-sur-Saône", country="France")
+        cls.fete = Festival.objects.create(festival_name="Fête des Lumières", town="Lyon", country="France")
+        Festival.objects.create(festival_name="Lyon Juggling", description="Held near Chalon", country="France")
+
+    def test_prefix_and_accent_insensitive(self):
+        self.assertEqual([f for f, _ in search_festivals("chal rue", 10)], [self.chalon])
+        self.assertEqual([f for f, _ in search_festivals("fete lumiere", 10)], [self.fete])
+        self.assertEqual([f for f, _ in search_festivals("saone", 10)], [self.chalon])
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(search_festivals("chalon", 10)[0][0], self.chalon)
+
+    def test_fts_syntax_is_taken_literally(self):
+        self.assertEqual(match_expression('NEAR("x" OR *'), '"NEAR"* "x"* "OR"*')
+        self.assertIsNone(match_expression("  *  "))
+
+    def test_index_follows_updates_and_deletes(self):
+        Festival.objects.filter(pk=self.fete.pk).update(town="Grenoble")
+        self.assertEqual([f for f, _ in search_festivals("grenoble", 10)], [self.fete])
+        self.assertEqual([f for f, _ in search_festivals("lyon", 10)][0].festival_name, "Lyon Juggling")
+        self.chalon.delete()
+        self.assertEqual(search_festivals("rue", 10), [])
+
+    def test_search_endpoint(self):
+        response = APIClient().get("/api/festivals/search/", {"q": "lumi"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["id"] for r in response.data["results"]], [self.fete.pk])
+        self.assertIn("rank", response.data["results"][0])
+        self.assertEqual(APIClient().get("/api/festivals/search/").status_code, 400)
+
+
+class FestivalFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.paris = Festival.objects.create(
+            festival_name="Paris Rue", country="France", town="Paris", festival_type="STREET", start_date="2026-07-10"
+        )
+        cls.lyon = Festival.objects.create(
+            festival_name="Lyon Cirque", country="France", town="Lyon", festival_type="CIRCUS", start_date="2026-05-01"
+        )
+        cls.madrid = Festival.objects.create(
+            festival_name="Madrid Calle", country="Spain", town="Madrid", festival_type="STREET", applied=True
+        )
+
+    def list_ids(self, **params):
+        response = APIClient().get("/api/festivals/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [festival["id"] for festival in response.data["results"]]
+
+    def test_combined_filters(self):
+        self.assertEqual(
+            self.list_ids(country="France", festival_type="STREET", start_date_after="2026-06-01"), [self.paris.pk]
+        )
+        self.assertEqual(self.list_ids(applied="true"), [self.madrid.pk])
+        self.assertEqual(self.list_ids(start_date_before="2026-06-30"), [self.lyon.pk])
+
+    def test_repeated_parameter_matches_any_value(self):
+        self.assertEqual(self.list_ids(town=["Paris", "Madrid"]), [self.paris.pk, self.madrid.pk])
+
+    def test_filters_combine_with_ordering(self):
+        self.assertEqual(self.list_ids(country="France", ordering="-start_date"), [self.paris.pk, self.lyon.pk])
+
+    def test_invalid_values_are_rejected(self):
+        client = APIClient()
+        self.assertEqual(client.get("/api/festivals/", {"festival_type": "RODEO"}).status_code, 400)
+        self.assertEqual(client.get("/api/festivals/", {"start_date_after": "July"}).status_code, 400)
+        self.assertEqual(client.get("/api/festivals/", {"applied": "maybe"}).status_code, 400)
+
+    def test_town_filter_uses_index(self):
+        self.assertIn("festival_town_idx", query_plan(Festival.objects.filter(town__in=["Paris", "Lyon"])))
+
+
+class EnrichBatchValidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.paris = Festival.objects.create(festival_name="Paris Rue", country="France", town="Paris")
+        cls.madrid = Festival.objects.create(festival_name="Madrid Calle", country="Spain", applied=True)
+
+    def setUp(self):
+        # enrich_many is patched out, the clients are only passed through
+        registry._instances["gemini"] = object()
+        registry._instances["mistral"] = object()
+
+    def tearDown(self):
+        registry.reset()
+
+    def post(self, body):
+        return APIClient().post("/api/festivals/enrich_batch/", body, format="json")
+
+    def test_invalid_bodies_are_rejected(self):
+        with mock.patch("festivals.views.enrich_many") as enrich_many:
+            for body in (
+                {},
+                {"ids": 5},
+                {"ids": ["one"]},
+                {"ids": []},
+                {"filters": {"applied": "maybe"}},
+                {"filters": {"festival_name__startswith": "P"}},
+                {"filters": ["country"]},
+                {"filters": {"festival_type": "RODEO"}},
+                {"ids": [self.paris.pk], "concurrency": "fast"},
+            ):
+                with self.subTest(body=body):
+                    response = self.post(body)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn("errors", response.data)
+            enrich_many.assert_not_called()
+
+    def test_valid_filters_select_festivals(self):
+        with mock.patch("festivals.views.enrich_many", return_value=([], [])) as enrich_many:
+            response = self.post({"filters": {"applied": "false", "country": "France"}, "concurrency": 1000})
+        self.assertEqual(response.status_code, 200, response.data)
+        festivals = enrich_many.call_args.args[0]
+        self.assertEqual(festivals, [self.paris])
+        self.assertEqual(enrich_many.call_args.kwargs["concurrency"], settings.ENRICH_BATCH_MAX_CONCURRENCY)
+
+        with mock.patch("festivals.views.enrich_many", return_value=([], [])) as enrich_many:
+            self.assertEqual(self.post({"ids": [self.madrid.pk]}).status_code, 200)
+        self.assertEqual(enrich_many.call_args.args[0], [self.madrid])
+
+
+class AsyncViewBodyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.festival = Festival.objects.create(festival_name="Paris Rue", country="France", town="Paris")
+
+    def setUp(self):
+        self.mistral = mock.Mock(achat=mock.AsyncMock(return_value="Bonjour"))
+        registry._instances["gemini"] = object()
+        registry._instances["mistral"] = self.mistral
+
+    def tearDown(self):
+        registry.reset()
+
+    def post(self, action, body):
+        return self.client.post(f"/api/festivals/{self.festival.pk}/{action}/", body, content_type="application/json")
+
+    def test_non_object_bodies_are_rejected(self):
+        with mock.patch("festivals.async_views.aenrich_festival") as aenrich_festival:
+            for action in ("enrich_async", "generate_email_async"):
+                for body in ("[1, 2]", '"x"', "3", "null"):
+                    with self.subTest(action=action, body=body):
+                        response = self.post(action, body)
+                        self.assertEqual(response.status_code, 400)
+                        self.assertEqual(response.json(), {"error": "Request body must be a JSON object"})
+        aenrich_festival.assert_not_called()
+        self.mistral.achat.assert_not_called()
+
+    def test_object_body_flags_are_read(self):
+        response = self.post("generate_email_async", {"regenerate": True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"message": "Bonjour"})
+        self.assertTrue(self.mistral.achat.call_args.kwargs["regenerate"])
+
+
+class EnrichmentPersistenceTests(TestCase):
+    def setUp(self):
+        self.festivals = [Festival.objects.create(festival_name=f"Festival {i}", description="Old") for i in range(3)]
+
+    def test_only_changed_columns_are_written(self):
+        first, second, third = self.festivals
+        # Edited elsewhere while the LLM calls ran
+        Festival.objects.update(description="Edited by hand")
+        first.town, second.town, third.country = "Lyon", "Nice", "Italy"
+
+        with CaptureQueriesContext(connection) as queries:
+            save_enrichments([(first, ["town"]), (second, ["town"]), (third, ["country"])], [])
+
+        updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "festivals_festival"')]
+        # One bulk UPDATE per set of changed fields
+        self.assertEqual(len(updates), 2)
+        self.assertFalse(any('"description"' in sql for sql in updates))
+        rows = Festival.objects.order_by("id").values_list("town", "country", "description", "last_enrichment_status")
+        self.assertEqual(
+            list(rows),
+            [
+                ("Lyon", None, "Edited by hand", "SUCCEEDED"),
+                ("Nice", None, "Edited by hand", "SUCCEEDED"),
+                (None, "Italy", "Edited by hand", "SUCCEEDED"),
+            ],
+        )
+
+
+class EnrichmentBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.festivals = [Festival.objects.create(festival_name=f"Festival {i}") for i in range(4)]
+
+    def usage(self):
+        usage = EnrichmentUsage.objects.get()
+        return usage.attempts, usage.failures
+
+    def test_every_attempt_counts_failures_included(self):
+        first, second = self.festivals[:2]
+        save_enrichments([(first, [])], [{"id": second.pk, "error": "provider down"}])
+        self.assertEqual(self.usage(), (2, 1))
+
+        # The same festival attempted again today spends the budget again
+        record_enrichment_failure(second.pk, "provider down")
+        save_enrichment(second, [])
+        self.assertEqual(self.usage(), (4, 2))
+        self.assertEqual(remaining_daily_budget(5), 1)
+        self.assertEqual(remaining_daily_budget(3), 0)
+
+    def test_picks_only_what_is_left_of_the_budget(self):
+        self.assertEqual(len(pick_festivals_to_enrich(limit=10, daily_budget=3)), 3)
+        save_enrichments([], [{"id": self.festivals[0].pk, "error": "provider down"}])
+        self.assertEqual(len(pick_festivals_to_enrich(limit=10, daily_budget=3)), 2)
+
+    def test_command_reports_failed_attempts(self):
+        for _ in range(3):
+            record_enrichment_failure(self.festivals[0].pk, "provider down")
+        out = io.StringIO()
+        call_command("schedule_enrichment", daily_budget=3, dry_run=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn("Daily budget: 3/3 attempts used today", output)
+        self.assertIn("3 of today's attempts failed", output)
+        self.assertIn("Nothing to enrich: daily budget used up", output)
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Festival.objects.create(
+                festival_name=f"Festival {i}",
+                description="Long text the list does not show",
+                country="France",
+                start_date=f"2026-07-0{i + 1}",
+                last_enriched_at="2026-01-02T03:04:05Z",
+            )
+
+    def test_list_matches_model_serializer(self):
+        response = APIClient().get("/api/festivals/", {"page_size": 2})
+        expected = FestivalSerializer(Festival.objects.order_by("id")[:2], many=True).data
+        self.assertEqual(response.json()["results"], json.loads(json.dumps(expected)))
+
+    def test_fields_and_exclude(self):
+        client = APIClient()
+        results = client.get("/api/festivals/", {"fields": "festival_name,start_date"}).json()["results"]
+        self.assertEqual(results[0], {"id": results[0]["id"], "festival_name": "Festival 0", "start_date": "2026-07-01"})
+        results = client.get("/api/festivals/", {"exclude": "description,comments"}).json()["results"]
+        self.assertNotIn("description", results[0])
+        self.assertIn("country", results[0])
+        detail = client.get(f"/api/festivals/{results[0]['id']}/", {"fields": "town"}).json()
+        self.assertEqual(set(detail), {"id", "town"})
+
+    def test_unknown_field_is_rejected(self):
+        self.assertEqual(APIClient().get("/api/festivals/", {"fields": "nope"}).status_code, 400)
+
+
+class IncrementalJSONParserTests(SimpleTestCase):
+    def test_braces_in_preamble_prose_are_skipped(self):
+        reply = 'Use the format {field: value}, e.g. {"town": ...}. Here it is: {"town": "Lyon", "country": "France"}'
+        self.assertEqual(parse_llm_json(reply), [("town", "Lyon"), ("country", "France")])
+        self.assertEqual(parse_llm_json('Nothing {} yet, {"town": "Lyon"}'), [("town", "Lyon")])
+
+    def test_code_fence(self):
+        reply = 'Sure:\n```json\n{"town": "Lyon {centre}", "dates": {"start": "2026-07-01"}}\n```\nDone.'
+        self.assertEqual(parse_llm_json(reply), [("town", "Lyon {centre}"), ("dates", {"start": "2026-07-01"})])
+
+    def test_members_are_returned_as_they_complete(self):
+        parser = IncrementalJSONParser()
+        members = [parser.feed(char) for char in 'see {below} {"town": "Lyon", "country": "France"}']
+        self.assertEqual([m for m in members if m], [[("town", "Lyon")], [("country", "France")]])
+
+    def test_truncated_object(self):
+        self.assertEqual(parse_llm_json('{"town": "Lyon", "tags": [1, 2'), [("town", "Lyon"), ("tags", [1, 2])])
+        # A cut-off string is dropped rather than stored half-written
+        self.assertEqual(parse_llm_json('{"town": "Lyon", "description": "A festi'), [("town", "Lyon")])
+
+
+class ExtractFieldsTests(SimpleTestCase):
+    def test_empty_values_keep_the_stored_ones(self):
+        festival = Festival(festival_name="Lyon Rue", town="Lyon", start_date=date(2026, 7, 10))
+        fields = extract_fields_from_llm(
+            '{"town": "", "start_date": "", "end_date": null, "approximate_date": "July", "festival_type": "circus"}'
+        )
+        self.assertEqual(fields, {"approximate_date": "July", "festival_type": "CIRCUS"})
+
+        self.assertEqual(apply_enrichment(festival, fields).changed, ["approximate_date", "festival_type"])
+        self.assertEqual((festival.town, festival.start_date), ("Lyon", date(2026, 7, 10)))
+
+
+class FakeSearchClient:
+    def __init__(self, chat_reply: str = "", fail: bool = False, chunks: Sequence[str] = ()):
+        self.chat_reply = chat_reply
+        self.fail = fail
+        self.chunks = chunks
+
+    def search(self, query: str, use_cache: bool = True) -> str:
+        return "Festival snippets"
+
+    def chat(self, prompt: str, system: Optional[str] = None, **kwargs) -> str:
+        return self.chat_reply
+
+    def stream_chat(self, prompt: str, system: Optional[str] = None, **kwargs) -> Iterator[str]:
+        for chunk in self.chunks:
+            yield chunk
+        if self.fail:
+            raise LLMError("mistral", "stream interrupted")
+
+
+class HeldStreamClient(FakeSearchClient):
+    """Streams the first chunk, then holds the rest until the test releases it."""
+
+    def __init__(self, chunks: Sequence[str]):
+        super().__init__(chunks=chunks)
+        self.release = threading.Event()
+        self.finished = False
+
+    def stream_chat(self, prompt: str, system: Optional[str] = None, **kwargs) -> Iterator[str]:
+        first, *rest = self.chunks
+        yield first
+        self.release.wait(5)
+        yield from rest
+        self.finished = True
+
+
+def sse_events(events: Iterable[str]) -> List[Tuple[str, Any]]:
+    parsed = []
+    for event in events:
+        name, data = event.strip().split("\n")
+        parsed.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+@override_settings(ENRICH_HEDGE_SEARCH=False, ENRICH_HEDGE_CHAT=False)
+class StreamEnrichmentTests(TestCase):
+    def setUp(self):
+        self.festival = Festival.objects.create(festival_name="Lyon Rue", website_url="https://lyon.example")
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        self.flight = SingleFlight("enrich", poll_interval=0.01, path=os.path.join(state.name, "state.sqlite3"))
+        patcher = mock.patch("festivals.streaming.enrich_flight", self.flight)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, mistral: FakeSearchClient, gemini: Optional[FakeSearchClient] = None):
+        return stream_enrichment(self.festival, gemini or FakeSearchClient(), mistral)
+
+    def test_field_events_carry_applied_values_or_rejections(self):
+        mistral = FakeSearchClient(chunks=['{"town": "lyon", "website', '_url": "not a url", "country": "France"}'])
+        events = sse_events(self.stream(mistral))
+
+        self.assertEqual(events[0], ("status", {"stage": "search"}))
+        self.assertEqual(events[1][1]["stage"], "generate")
+        self.assertEqual(events[2], ("field", {"field": "town", "value": "Lyon"}))
+        self.assertEqual(events[3][0], "rejected")
+        self.assertEqual(events[3][1]["field"], "website_url")
+        self.assertEqual(events[3][1]["value"], "not a url")
+        self.assertEqual(events[4], ("field", {"field": "country", "value": "France"}))
+        self.assertEqual(events[-1][0], "done")
+        self.assertEqual(len(events), 6)
+
+        self.festival.refresh_from_db()
+        self.assertEqual((self.festival.town, self.festival.country), ("Lyon", "France"))
+        self.assertEqual(self.festival.website_url, "https://lyon.example")
+
+    def test_failed_stream_falls_back_to_gemini(self):
+        mistral = FakeSearchClient(fail=True)
+        gemini = FakeSearchClient(chat_reply='{"town": "nice"}')
+        with self.assertLogs("services.router", "WARNING"):
+            events = sse_events(self.stream(mistral, gemini))
+
+        self.assertIn(("field", {"field": "town", "value": "Nice"}), events)
+        self.assertEqual(events[-1][0], "done")
+        self.festival.refresh_from_db()
+        self.assertEqual(self.festival.town, "Nice")
+
+    def test_fields_of_a_failed_stream_are_retracted_when_the_fallback_wins(self):
+        mistral = FakeSearchClient(chunks=['{"country": "Italy", "town": "lyo'], fail=True)
+        gemini = FakeSearchClient(chat_reply='{"town": "nice"}')
+        with self.assertLogs("services.router", "WARNING"):
+            events = sse_events(self.stream(mistral, gemini))
+
+        self.assertEqual(events[2], ("field", {"field": "country", "value": "Italy"}))
+        self.assertEqual(events[3:5], [
+            ("retract", {"field": "country", "value": None}),
+            ("field", {"field": "town", "value": "Nice"}),
+        ])
+        self.assertEqual(events[-1][0], "done")
+        self.assertIsNone(events[-1][1]["country"])
+
+        self.festival.refresh_from_db()
+        self.assertEqual((self.festival.town, self.festival.country), ("Nice", None))
+
+    async def test_asgi_sends_fields_before_the_model_finishes(self):
+        mistral = HeldStreamClient(chunks=['{"town": "lyon", ', '"country": "France"}'])
+        registry._instances["gemini"] = FakeSearchClient()
+        registry._instances["mistral"] = mistral
+        self.addCleanup(registry.reset)
+        path = f"/api/festivals/{self.festival.pk}/enrich_stream/"
+        request = AsyncRequestFactory().get(path, headers={"accept": "text/event-stream"})
+        response = await sync_to_async(resolve(path).func)(request, pk=self.festival.pk)
+        self.assertTrue(response.is_async)
+
+        parts = response.__aiter__()
+        first = [await anext(parts) for _ in range(3)]
+        self.assertEqual(sse_events(part.decode() for part in first)[2], ("field", {"field": "town", "value": "Lyon"}))
+        self.assertFalse(mistral.finished)
+
+        mistral.release.set()
+        events = sse_events([part.decode() async for part in parts])
+        self.assertEqual(events[0], ("field", {"field": "country", "value": "France"}))
+        self.assertEqual(events[-1][0], "done")
+
+    def test_follower_relays_the_leader_result(self):
+        # Another process holds the call: the stream must wait for its result instead of calling providers
+        key = enrichment_key(self.festival, True)
+        _, owner = self.flight._claim(key)
+        polling = threading.Event()
+        check = self.flight._check
+        self.flight._check = lambda *args: polling.set() or check(*args)
+        events = self.stream(FakeSearchClient(chunks=['{"town": "wrong"}']))
+
+        self.assertEqual(sse_events([next(events)]), [("status", {"stage": "search"})])
+        self.assertTrue(polling.wait(5))
+        self.flight._publish(key, owner, result={"town": "lille"})
+        events = sse_events(events)
+
+        self.assertEqual(events[0], ("field", {"field": "town", "value": "Lille"}))
+        self.assertEqual(events[-1][0], "done")
+
+    def test_leader_failure_is_reported(self):
+        key = enrichment_key(self.festival, True)
+        _, owner = self.flight._claim(key)
+        polling = threading.Event()
+        check = self.flight._check
+        self.flight._check = lambda *args: polling.set() or check(*args)
+        events = self.stream(FakeSearchClient(chunks=['{"town": "wrong"}']))
+
+        next(events)
+        self.assertTrue(polling.wait(5))
+        self.flight._publish(key, owner, error=LLMError("mistral", "quota exceeded"))
+        events = sse_events(events)
+
+        self.assertEqual(events[-1][0], "error")
+        self.assertIn("quota exceeded", events[-1][1]["error"])
+        self.festival.refresh_from_db()
+        self.assertEqual(self.festival.last_enrichment_status, "FAILED")
+
+
+class SlowMailClient:
+    """Streams a first chunk, then holds the rest of the completion until the test releases it."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.finished = False
+
+    def stream_chat(self, prompt: str, **kwargs) -> Iterator[str]:
+        yield "Bonjour"
+        self.release.wait(5)
+        yield " Lyon"
+        self.finished = True
+
+    async def astream_chat(self, prompt: str, **kwargs):
+        yield "Bonjour"
+        await asyncio.to_thread(self.release.wait, 5)
+        yield " Lyon"
+        self.finished = True
+
+
+class GenerateEmailStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.festival = Festival.objects.create(festival_name="Lyon Rue", town="Lyon")
+
+    def setUp(self):
+        self.mistral = SlowMailClient()
+        registry._instances["mistral"] = self.mistral
+        self.addCleanup(registry.reset)
+        self.path = f"/api/festivals/{self.festival.pk}/generate_email_stream/"
+        # The routed view, with the action's event-stream renderer
+        self.view = resolve(self.path).func
+
+    def assert_rest_of_stream(self, rest: List[bytes]) -> None:
+        self.assertEqual(
+            sse_events(part.decode() for part in rest),
+            [("token", {"delta": " Lyon"}), ("done", {"message": "Bonjour Lyon"})],
+        )
+
+    async def test_asgi_sends_the_first_token_before_the_model_finishes(self):
+        request = AsyncRequestFactory().get(self.path, headers={"accept": "text/event-stream"})
+        response = await sync_to_async(self.view)(request, pk=self.festival.pk)
+        self.assertTrue(response.is_async)
+
+        # Consumed the way ASGIHandler does
+        parts = response.__aiter__()
+        first = await anext(parts)
+        self.assertEqual(sse_events([first.decode()]), [("token", {"delta": "Bonjour"})])
+        self.assertFalse(self.mistral.finished)
+
+        self.mistral.release.set()
+        self.assert_rest_of_stream([part async for part in parts])
+
+    def test_wsgi_streams_the_sync_iterator(self):
+        request = RequestFactory().get(self.path, headers={"accept": "text/event-stream"})
+        response = self.view(request, pk=self.festival.pk)
+        self.assertFalse(response.is_async)
+
+        parts = iter(response)
+        self.assertEqual(sse_events([next(parts).decode()]), [("token", {"delta": "Bonjour"})])
+        self.assertFalse(self.mistral.finished)
+
+        self.mistral.release.set()
+        self.assert_rest_of_stream(list(parts))
+
+
+class ScriptedProvider:
+    """Answers search and chat by the festival named in the query or prompt; `failing` names raise."""
+
+    def __init__(self, replies: Dict[str, str], failing: Sequence[str] = ()):
+        self.replies = replies
+        self.failing = failing
+        self.prompts: List[str] = []
+
+    def _answer(self, text: str, default: str) -> str:
+        if any(name in text for name in self.failing):
+            raise LLMError("fake", "provider down")
+        return next((reply for name, reply in self.replies.items() if name in text), default)
+
+    def search(self, query: str, use_cache: bool = True) -> str:
+        return self._answer(query, "Festival snippets")
+
+    def chat(self, prompt: str, system: Optional[str] = None, **kwargs) -> str:
+        self.prompts.append(prompt)
+        return self._answer(prompt, "{}")
+
+
+def batch_result(custom_id: Any, content: Optional[str] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    if error is not None:
+        return {"custom_id": str(custom_id), "response": None, "error": {"message": error}}
+    body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+    return {"custom_id": str(custom_id), "response": {"status_code": 200, "body": body}, "error": None}
+
+
+@override_settings(ENRICH_HEDGE_SEARCH=False)
+class BatchEnrichmentTests(TestCase):
+    def setUp(self):
+        self.lyon = Festival.objects.create(festival_name="Lyon Rue", country="France")
+        self.nice = Festival.objects.create(festival_name="Nice Cirque", country="France")
+
+    def test_renders_one_request_per_searched_festival(self):
+        provider = ScriptedProvider({}, failing=["Nice Cirque"])
+        fh = io.StringIO()
+        with self.assertLogs("services.router", "WARNING"):
+            written, failures = render_batch_file([self.lyon, self.nice], provider, provider, fh, concurrency=2)
+
+        self.assertEqual(written, 1)
+        self.assertEqual([(f["id"], f["error_type"]) for f in failures], [(self.nice.pk, "LLMError")])
+        requests = [json.loads(line) for line in fh.getvalue().splitlines()]
+        self.assertEqual([r["custom_id"] for r in requests], [str(self.lyon.pk)])
+        messages = requests[0]["body"]["messages"]
+        self.assertEqual([m["role"] for m in messages], ["system", "user"])
+        self.assertIn("Lyon Rue", messages[1]["content"])
+        self.assertIn("Festival snippets", messages[1]["content"])
+
+    @override_settings(ENRICH_HEDGE_SEARCH=True, ENRICH_HEDGE_CHAT=True)
+    def test_batch_paths_never_hedge(self):
+        provider = ScriptedProvider({"Nice Cirque": '{"town": "nice"}'})
+        with mock.patch.object(router, "run", wraps=router.run) as run:
+            render_batch_file([self.lyon], provider, provider, io.StringIO(), concurrency=1)
+            enrich_many([self.nice], provider, provider, concurrency=1, use_cache=False)
+
+        self.assertEqual(run.call_count, 3)
+        self.assertEqual({call.kwargs["hedge"] for call in run.call_args_list}, {False})
+
+    def test_result_content(self):
+        self.assertEqual(batch_result_content(batch_result(1, '{"town": "Lyon"}')), '{"town": "Lyon"}')
+        for result in (
+            batch_result(1, error="timeout"),
+            {"custom_id": "1", "response": {"status_code": 500, "body": {}}, "error": None},
+            {"custom_id": "1", "response": {"status_code": 200, "body": {"choices": []}}, "error": None},
+        ):
+            with self.subTest(result=result), self.assertRaises(LLMResponseError):
+                batch_result_content(result)
+
+    def test_partial_failures_are_recorded_per_festival(self):
+        results = [
+            batch_result(self.lyon.pk, '```json\n{"town": "lyon", "website_url": "not a url"}\n```'),
+            batch_result(self.nice.pk, error="Request timed out"),
+            batch_result(999999, '{"town": "Nowhere"}'),
+        ]
+        with self.assertLogs("festivals.batch", "WARNING"):
+            enriched, failures = apply_batch_results(results, batch_size=1)
+
+        self.assertEqual(enriched, 1)
+        self.assertEqual([f["id"] for f in failures], [self.nice.pk])
+        self.lyon.refresh_from_db()
+        self.assertEqual((self.lyon.town, self.lyon.website_url), ("Lyon", None))
+        self.assertEqual(self.lyon.last_enrichment_status, "SUCCEEDED")
+        self.nice.refresh_from_db()
+        self.assertEqual(self.nice.last_enrichment_status, "FAILED")
+        self.assertIn("Request timed out", self.nice.last_enrichment_error)
+
+
+@override_settings(ENRICH_HEDGE_SEARCH=False)
+class LocalBatchBackendPathTests(TestCase):
+    """The enrich and generate_email call paths run end to end against the local batch stand-in."""
+
+    def setUp(self):
+        self.lyon = Festival.objects.create(festival_name="Lyon Rue", country="France")
+        self.nice = Festival.objects.create(festival_name="Nice Cirque", country="France")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = mock.patch.dict(os.environ, {"LLM_BATCH_LOCAL_DIR": self.directory})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(registry.reset)
+
+    def test_batch_enrich_command(self):
+        provider = ScriptedProvider(
+            {"Lyon Rue": '{"town": "lyon", "festival_type": "STREET"}'}, failing=["Nice Cirque"]
+        )
+        registry._instances["gemini"] = registry._instances["mistral"] = provider
+        output = io.StringIO()
+        with self.assertLogs("services.router", "WARNING"):
+            call_command(
+                "batch_enrich",
+                ids=[self.lyon.pk, self.nice.pk],
+                backend="local",
+                output=os.path.join(self.directory, "enrich.jsonl"),
+                stdout=output,
+            )
+
+        self.assertIn("Rendered 1 requests", output.getvalue())
+        self.assertIn("enriched 1 festivals, 0 failed", output.getvalue())
+        self.lyon.refresh_from_db()
+        self.assertEqual((self.lyon.town, self.lyon.festival_type), ("Lyon", "STREET"))
+        self.assertEqual(self.lyon.last_enrichment_status, "SUCCEEDED")
+        # The search failed, so the festival never reached the batch
+        self.nice.refresh_from_db()
+        self.assertEqual(self.nice.last_enrichment_status, "FAILED")
+
+        # A submitted job can be applied again from its id
+        job_id = next(name for name in os.listdir(self.directory) if name.endswith(".json")).split(".")[0]
+        output = io.StringIO()
+        call_command("batch_enrich", resume=job_id, backend="local", stdout=output)
+        self.assertIn(f"Batch job {job_id} (SUCCESS): enriched 1 festivals", output.getvalue())
+
+    def test_generate_email_request(self):
+        provider = ScriptedProvider({"Nice Cirque": "Dear Nice Cirque team, ..."})
+        provider.chat = mock.Mock(wraps=provider.chat)
+        backend = LocalBatchBackend(interactive_responder(provider, cache_policy="application_mail"), self.directory)
+        path = os.path.join(self.directory, "emails.jsonl")
+        with open(path, "w", encoding="utf-8") as fh:
+            messages = MistralClient._messages(generate_application_mail_prompt(self.nice))
+            write_jsonl([{"custom_id": str(self.nice.pk), "body": {"messages": messages}}], fh)
+
+        job = backend.submit(path)
+        [result] = backend.results(backend.get(job.id))
+
+        self.assertEqual(result["custom_id"], str(self.nice.pk))
+        self.assertEqual(batch_result_content(result), "Dear Nice Cirque team, ...")
+        self.assertEqual(provider.chat.call_args.kwargs["cache_policy"], "application_mail")
+        self.assertIn("Nice Cirque", provider.chat.call_args.kwargs["prompt"])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dates = ["2026-07-01", None, "2026-05-01", "2026-07-01", None, "2026-07-01", "2026-09-01", None]
+        countries = ["France", None, "Spain", "France", "", None, "Belgium", "France"]
+        cls.festivals = [
+            Festival.objects.create(festival_name=f"Festival {index}", start_date=start_date, country=country)
+            for index, (start_date, country) in enumerate(zip(dates, countries))
+        ]
+
+    def walk(self, ordering: str) -> List[List[int]]:
+        """Follows `next` links from the first page, then `previous` links back; returns both page sequences."""
+        client = APIClient()
+        pages: List[List[int]] = []
+        response = client.get("/api/festivals/", {"ordering": ordering, "page_size": 2})
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append([festival["id"] for festival in response.data["results"]])
+            if not response.data["next"]:
+                break
+            response = client.get(response.data["next"])
+
+        backwards: List[List[int]] = [pages[-1]]
+        while response.data["previous"]:
+            response = client.get(response.data["previous"])
+            backwards.insert(0, [festival["id"] for festival in response.data["results"]])
+        self.assertEqual(backwards, pages)
+        return pages
+
+    def expected(self, field: str, descending: bool) -> List[int]:
+        # Keys in the requested direction, ties broken by id in the same direction, NULLs last. Descending,
+        # NULL text shares the lowest sentinel with the empty string, so both end the list together.
+        blank = (None, "") if descending else (None,)
+        present = [f for f in self.festivals if getattr(f, field) not in blank]
+        missing = [f for f in self.festivals if getattr(f, field) in blank]
+        present.sort(key=lambda f: (getattr(f, field), f.pk), reverse=descending)
+        missing.sort(key=lambda f: f.pk, reverse=descending)
+        return [f.pk for f in present + missing]
+
+    def test_nulls_come_last_in_both_directions(self):
+        for ordering, field in (("start_date", "start_date"), ("country", "country")):
+            for descending in (False, True):
+                requested = f"{'-' if descending else ''}{ordering}"
+                with self.subTest(ordering=requested):
+                    pages = self.walk(requested)
+                    self.assertTrue(all(len(page) <= 2 for page in pages))
+                    self.assertEqual(sum(pages, []), self.expected(field, descending))
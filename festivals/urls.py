@@ -1,10 +1,13 @@
 from django.urls import path, include, URLPattern
 from rest_framework.routers import DefaultRouter
+from festivals.async_views import enrich_async, generate_email_async
 from festivals.views import FestivalViewSet
 from typing import List
 
 router: DefaultRouter = DefaultRouter()
 router.register(r"", FestivalViewSet, basename="festival")
 urlpatterns: List[URLPattern] = [
+    path("<int:pk>/enrich_async/", enrich_async, name="festival-enrich-async"),
+    path("<int:pk>/generate_email_async/", generate_email_async, name="festival-generate-email-async"),
     path("", include(router.urls)),
 ]
@@ -1,36 +1,103 @@
-from datetime import datetime
-from typing import Any, Dict
-
-from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.utils.html import strip_tags
+from rest_framework.renderers import JSONRenderer
 from festivals.models import Festival
-from circus_agent_backend.serializers import FestivalSerializer
-from applications.models import Application
+from circus_agent_backend.fieldsets import SparseFieldsetMixin
+from circus_agent_backend.filters import Filter, QueryFilterBackend, parse_bool, parse_iso_date
+from circus_agent_backend.pagination import KeysetPagination
+from circus_agent_backend.serializers import EnrichBatchSerializer, FestivalSerializer
+from applications.attachments import store_upload
+from applications.models import Application, Attachment, season_year
+from applications.outbox import queue_application_email
+from jobs.models import Job
+from jobs.queue import enqueue
+from services.errors import LLMError, LLMRateLimitError
 from services.gemini_service import GeminiClient
+from services.registry import get_gemini_client, get_mistral_client
+from .enrichment import (
+    enrich_festival,
+    enrich_many,
+    record_enrichment_failure,
+    save_enrichment,
+    save_enrichments,
+)
+from .search import search_festivals
+from .streaming import (
+    EventStreamRenderer,
+    astream_text,
+    event_stream_response,
+    is_asgi,
+    iterate_in_thread,
+    stream_enrichment,
+    stream_text,
+)
 from .helpers import (
     generate_application_mail_prompt,
-    extract_fields_from_llm,
-    clean_festival_data,
-    generate_enrich_prompt,
+    parse_flag,
 )
 from services.mistral_service import MistralClient
 from django.http import HttpRequest
 
 
+def job_accepted_response(job: Job) -> Response:
+    return Response(
+        {"job_id": job.pk, "status": job.status, "status_url": f"/api/jobs/{job.pk}/"},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+def llm_error_response(error: LLMError) -> Response:
+    # Provider quota exhausted even after retries -> 429 so the client backs off too
+    return Response(
+        {"error": "LLM provider call failed", "details": str(error), "error_type": type(error).__name__},
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+        if isinstance(error, LLMRateLimitError)
+        else status.HTTP_502_BAD_GATEWAY,
+    )
+
+
 # Provides CRUD operations for Festival
-class FestivalViewSet(viewsets.ModelViewSet):
+class FestivalViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Festival.objects.all()
     # Class used to convert JSON into Django Model objects and vice versa
     serializer_class = FestivalSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [QueryFilterBackend]
+    # ?ordering= keys for the list endpoint, prefix with "-" for descending
+    cursor_orderings = {
+        "id": "id",
+        "name": "festival_name",
+        "country": "country",
+        "start_date": "start_date",
+        "end_date": "end_date",
+        "updated": "updated_at",
+    }
+    # List filters, e.g. ?country=France&festival_type=STREET&start_date_after=2026-06-01
+    query_filters = {
+        "country": Filter("country", many=True),
+        "town": Filter("town", many=True),
+        "festival_type": Filter("festival_type", choices=Festival.FESTIVAL_TYPES, many=True),
+        "application_type": Filter("application_type", choices=Festival.APPLICATION_TYPE, many=True),
+        "applied": Filter("applied", parse=parse_bool),
+        "enrichment_status": Filter("last_enrichment_status", choices=Festival.ENRICHMENT_STATUS),
+        "start_date_after": Filter("start_date__gte", parse=parse_iso_date),
+        "start_date_before": Filter("start_date__lte", parse=parse_iso_date),
+        "end_date_after": Filter("end_date__gte", parse=parse_iso_date),
+        "end_date_before": Filter("end_date__lte", parse=parse_iso_date),
+    }
+
+    # LLM clients are process-wide singletons, only built the first time an LLM action runs
+    @property
+    def mistral_client(self) -> MistralClient:
+        return get_mistral_client()
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.mistral_client = MistralClient()
-        self.gemini_client = GeminiClient()
+    @property
+    def gemini_client(self) -> GeminiClient:
+        return get_gemini_client()
 
     # Adds an endpoint to default queryset. Detail means it affects only one entity
     @action(detail=True, methods=["post"])
@@ -38,24 +105,112 @@ class FestivalViewSet(viewsets.ModelViewSet):
         # Retrieves the Festival instance corresponding to the given pk (primary key) from the URL.
         festival: Festival = self.get_object()
 
-        query = f"{festival.website_url} {festival.festival_name} {festival.country} {datetime.now().year}"
+        # ?bypass_cache=true forces a fresh grounded search
+        bypass_cache: bool = parse_flag(
+            request.query_params.get("bypass_cache", request.data.get("bypass_cache"))
+        )
+
+        # ?background=true queues the work and returns a job to poll at /api/jobs/<id>/
+        if parse_flag(request.query_params.get("background", request.data.get("background"))):
+            job = enqueue(
+                "ENRICH_FESTIVAL",
+                {"festival_id": festival.pk, "bypass_cache": bypass_cache},
+                dedupe_key=f"enrich:{festival.pk}",
+            )
+            return job_accepted_response(job)
 
         # search_results: ConversationResponse = self.mistral_client.search(query=query)
         # parsed_results: str = extract_search_results(search_results)
         # prompt: str = generate_enrich_prompt(festival, parsed_results)
 
-        search_results = self.gemini_client.search(query=query)
-        prompt: str = generate_enrich_prompt(festival, search_results)
+        try:
+            changed_fields = enrich_festival(
+                festival, self.gemini_client, self.mistral_client, use_cache=not bypass_cache
+            )
+        except LLMError as e:
+            record_enrichment_failure(festival.pk, str(e))
+            return llm_error_response(e)
 
-        llm_response: str = self.mistral_client.chat(prompt=prompt)
+        save_enrichment(festival, changed_fields)
+        return Response(FestivalSerializer(festival).data)
 
-        updated_fields: Dict[str, Any] = extract_fields_from_llm(llm_response)
-        for field, value in updated_fields.items():
-            setattr(festival, field, value)
+    # Server-sent events: a `field` event per enriched field as the model writes it, then `done`
+    @action(
+        detail=True,
+        methods=["get", "post"],
+        renderer_classes=[EventStreamRenderer, JSONRenderer],
+    )
+    def enrich_stream(self, request: HttpRequest, pk: int = None):
+        festival: Festival = self.get_object()
+        bypass_cache: bool = parse_flag(
+            request.query_params.get("bypass_cache", request.data.get("bypass_cache"))
+        )
+        events = stream_enrichment(festival, self.gemini_client, self.mistral_client, use_cache=not bypass_cache)
+        # The provider calls run in a worker thread either way; under ASGI each event is relayed as it comes
+        return event_stream_response(iterate_in_thread(events) if is_asgi(request) else events)
 
-        clean_festival_data(festival)
+    # Detail=False: the endpoint works on a collection, e.g. /api/festivals/enrich_batch/
+    @action(detail=False, methods=["post"])
+    def enrich_batch(self, request: HttpRequest) -> Response:
+        serializer = EnrichBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        ids = serializer.validated_data.get("ids")
+        filters = serializer.validated_data.get("filters") or {}
 
-        return Response(FestivalSerializer(festival).data)
+        queryset = Festival.objects.filter(**filters).order_by("id")
+        if ids:
+            queryset = queryset.filter(pk__in=ids)
+
+        # Festivals are loaded here, the worker threads only perform the provider calls
+        festivals = list(queryset[: settings.ENRICH_BATCH_MAX_SIZE + 1])
+        if len(festivals) > settings.ENRICH_BATCH_MAX_SIZE:
+            return Response(
+                {"error": f"Batch is limited to {settings.ENRICH_BATCH_MAX_SIZE} festivals"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        concurrency = serializer.validated_data.get("concurrency", settings.ENRICH_BATCH_DEFAULT_CONCURRENCY)
+        concurrency = max(1, min(concurrency, settings.ENRICH_BATCH_MAX_CONCURRENCY))
+
+        bypass_cache: bool = serializer.validated_data["bypass_cache"]
+
+        enriched, failures = enrich_many(
+            festivals,
+            self.gemini_client,
+            self.mistral_client,
+            concurrency=concurrency,
+            use_cache=not bypass_cache,
+        )
+        save_enrichments(enriched, failures)
+
+        return Response(
+            {
+                "results": FestivalSerializer([festival for festival, _ in enriched], many=True).data,
+                "updated_fields": {festival.pk: changed for festival, changed in enriched},
+                "failures": failures,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    # /api/festivals/search/?q=chal rue: ranked full-text matches, each word matched as a prefix
+    @action(detail=False, methods=["get"])
+    def search(self, request: HttpRequest) -> Response:
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "Provide a search query with ?q="}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get("limit", settings.FESTIVAL_SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.FESTIVAL_SEARCH_MAX_LIMIT))
+
+        ranked = search_festivals(query, limit)
+        results = FestivalSerializer([festival for festival, _ in ranked], many=True).data
+        for result, (_, rank) in zip(results, ranked):
+            result["rank"] = rank
+        return Response({"results": results}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
     def apply(self, request: HttpRequest, pk: int) -> Response:
@@ -69,67 +224,64 @@ class FestivalViewSet(viewsets.ModelViewSet):
             message = request.data.get("message")
             subject = request.data.get("email_subject")
             attachments = request.FILES.getlist("attachments_sent")
+            # Files already in the attachment store (see /api/applications/attachments/) are referenced by id
+            attachment_ids = (
+                request.data.getlist("attachment_ids")
+                if hasattr(request.data, "getlist")
+                else request.data.get("attachment_ids") or []
+            )
 
 
             if not message or not subject:
                 return Response({"error": "Message and/or subject not found"}, status=status.HTTP_400_BAD_REQUEST)
-            
-             # Calculate the application year
-            current_date = timezone.now().date()
-            application_year = current_date.year
-            if current_date.month >= 9:
-                application_year += 1
-
-            # Check if an application already exists for the festival and year
-            existing_application = Application.objects.filter(
-                festival=festival,
-                application_date__year=application_year
-            ).first()
-            
-            if existing_application:
+
+            try:
+                ids = {int(attachment_id) for attachment_id in attachment_ids}
+            except (TypeError, ValueError):
+                return Response({"error": "attachment_ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+            stored = list(Attachment.objects.filter(pk__in=ids))
+            if len(stored) != len(ids):
+                return Response({"error": "Unknown attachment id"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Delivery is left to the `send_outbox` worker: the application and its email are recorded
+            # together, and the worker moves the application to APPLIED once the email is sent
+            # Uploads are streamed into the content-addressed store, a file sent before is not stored twice
+            uploaded = [store_upload(file)[0] for file in attachments]
+            names = [a.name for a in stored] + [file.name for file in attachments]
+            # One application per festival and season is a unique constraint: insert, and treat a
+            # conflict as "already applied" instead of checking first (which races)
+            try:
+                with transaction.atomic():
+                    application = Application.objects.create(
+                        festival=festival,
+                        application_date=timezone.now().date(),
+                        application_status="DRAFT",
+                        message=message,
+                        email_subject=subject,
+                        attachments_sent=names or None,
+                    )
+                    application.attachments.add(*stored, *uploaded)
+                    outbox_message = queue_application_email(application, stored + uploaded, names)
+            except IntegrityError:
+                existing_application = Application.objects.filter(
+                    festival=festival, application_year=season_year(timezone.now().date())
+                ).first()
                 return Response(
                     {
                         "message": "Application already exists for this festival and year",
-                        "application_id": existing_application.id,
+                        "application_id": existing_application.id if existing_application else None,
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            application = Application.objects.create(
-                festival=festival,
-                application_date=timezone.now().date(),
-                application_status="DRAFT",
-                message=message,
-                email_subject=subject,
+            return Response(
+                {
+                    "message": "Application queued for sending",
+                    "application_id": application.id,
+                    "outbox_id": outbox_message.id,
+                },
+                status=status.HTTP_202_ACCEPTED,
             )
- 
-            if attachments:
-                application.attachments_sent = [file.name for file in attachments]
-                application.save()
-
-
-            try:
-                text_content = strip_tags(application.message)  # plain text fallback
-                html_content = application.message  # Tiptap HTML
-
-                email = EmailMultiAlternatives(subject, text_content, "ducassephi@hotmail.fr", ["info@philippeducasse.com"])
-                email.attach_alternative(html_content, "text/html")
-
-                for file in attachments:
-                    email.attach(file.name, file.read(), file.content_type)
-
-                email.send(fail_silently=False)
-                application.application_status = (
-                    "APPLIED"
-                )
-                application.save()
-                return Response(
-                    {"message": "Application sent successfully"}, status=200
-                )
-            except Exception as e:
-                return Response(
-                    {"error": f"Email failed to send: {str(e)}"}, status=500
-                )
 
         except Exception as e:
             return Response(
@@ -150,9 +302,54 @@ class FestivalViewSet(viewsets.ModelViewSet):
         festival_name: str = festival.festival_name
 
         # Email content
+        # ?regenerate=true asks for a new draft instead of the cached one
+        regenerate: bool = parse_flag(
+            request.query_params.get("regenerate", request.data.get("regenerate"))
+        )
+
+        if parse_flag(request.query_params.get("background", request.data.get("background"))):
+            job = enqueue(
+                "GENERATE_EMAIL",
+                {"festival_id": festival.pk, "regenerate": regenerate},
+                dedupe_key=f"generate_email:{festival.pk}:{regenerate}",
+            )
+            return job_accepted_response(job)
+
         prompt: str = generate_application_mail_prompt(festival)
-        message: str = self.mistral_client.chat(prompt=prompt)
+        try:
+            message: str = self.mistral_client.chat(
+                prompt=prompt, cache_policy="application_mail", regenerate=regenerate
+            )
+        except LLMError as e:
+            return llm_error_response(e)
 
         return Response({"message": message}, status=status.HTTP_200_OK)
 
+    # Server-sent events: `token` events while Mistral generates, then a `done` event with the full message.
+    # GET is allowed so the frontend can use EventSource.
+    @action(
+        detail=True,
+        methods=["get", "post"],
+        renderer_classes=[EventStreamRenderer, JSONRenderer],
+    )
+    def generate_email_stream(self, request: HttpRequest, pk: int):
+        try:
+            festival = Festival.objects.get(pk=pk)
+        except Festival.DoesNotExist:
+            return Response({"error": "Festival not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        regenerate: bool = parse_flag(
+            request.query_params.get("regenerate", request.data.get("regenerate"))
+        )
+
+        prompt: str = generate_application_mail_prompt(festival)
+        if is_asgi(request):
+            # Relayed from the event loop as Mistral writes, see event_stream_response
+            async_chunks = self.mistral_client.astream_chat(
+                prompt=prompt, cache_policy="application_mail", regenerate=regenerate
+            )
+            return event_stream_response(astream_text(async_chunks))
+        chunks = self.mistral_client.stream_chat(
+            prompt=prompt, cache_policy="application_mail", regenerate=regenerate
+        )
+        return event_stream_response(stream_text(chunks))
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress", "attempts", "locked_by", "created_at")
+    list_filter = ("kind", "status")
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,37 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim_next, requeue_stale, run_job
+
+
+class Command(BaseCommand):
+    help = "Runs queued enrichment / email generation jobs. Start several to process jobs in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--lease", type=int, default=600, help="Seconds before a running job is considered abandoned")
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+
+    def handle(self, *args, **options):
+        worker_id: str = options["worker_id"]
+        self.stdout.write(f"Worker {worker_id} started")
+
+        while True:
+            # Long-lived process: drop connections the DB may have closed meanwhile
+            close_old_connections()
+            requeue_stale(options["lease"])
+            job = claim_next(worker_id)
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            job = run_job(job)
+            self.stdout.write(f"{job} attempt {job.attempts}")
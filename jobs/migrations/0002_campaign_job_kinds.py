@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ENRICH_FESTIVAL', 'Enrich festival'), ('GENERATE_EMAIL', 'Generate email'), ('GENERATE_CAMPAIGN', 'Generate campaign'), ('SEND_CAMPAIGN', 'Send campaign')], max_length=50),
+        ),
+    ]
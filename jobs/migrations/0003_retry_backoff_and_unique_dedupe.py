@@ -0,0 +1,44 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:51
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """
+    Before the constraint: when several active jobs share a dedupe_key, the oldest keeps running and
+    the others are marked FAILED, pointing at the job that does the work.
+    """
+    Job = apps.get_model("jobs", "Job")
+    kept = {}
+    active = Job.objects.filter(status__in=("PENDING", "RUNNING")).exclude(dedupe_key="")
+    for job in active.order_by("created_at", "id"):
+        if job.dedupe_key not in kept:
+            kept[job.dedupe_key] = job.pk
+            continue
+        job.status = "FAILED"
+        job.error = f"Duplicate of job {kept[job.dedupe_key]}"
+        job.locked_by = None
+        job.locked_at = None
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "locked_by", "locked_at", "finished_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_campaign_job_kinds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('PENDING', 'RUNNING')), models.Q(('dedupe_key', ''), _negated=True)), fields=('dedupe_key',), name='unique_active_job_dedupe_key'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import models
+from typing import List, Tuple
+
+
+class Job(models.Model):
+    KIND: List[Tuple[str, str]] = [
+        ("ENRICH_FESTIVAL", "Enrich festival"),
+        ("GENERATE_EMAIL", "Generate email"),
+        ("GENERATE_CAMPAIGN", "Generate campaign"),
+        ("SEND_CAMPAIGN", "Send campaign"),
+    ]
+    STATUS: List[Tuple[str, str]] = [
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("SUCCEEDED", "Succeeded"),
+        ("FAILED", "Failed"),
+    ]
+    ACTIVE_STATUSES: Tuple[str, ...] = ("PENDING", "RUNNING")
+
+    kind = models.CharField(max_length=50, choices=KIND)
+    status = models.CharField(max_length=20, choices=STATUS, default="PENDING")
+    payload = models.JSONField(default=dict, blank=True)
+    # Identical work enqueued while a job is still active reuses that job
+    dedupe_key = models.CharField(max_length=200, blank=True, default="")
+    progress = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    # A failed attempt is retried no earlier than this (exponential backoff)
+    run_after = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["dedupe_key", "status"]),
+        ]
+        constraints = [
+            # At most one active job per dedupe_key, so concurrent enqueues cannot both create one
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status__in=("PENDING", "RUNNING")) & ~models.Q(dedupe_key=""),
+                name="unique_active_job_dedupe_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
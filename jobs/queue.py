@@ -0,0 +1,118 @@
+import random
+import traceback
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.tasks import get_handler
+
+
+def enqueue(kind: str, payload: Dict[str, Any], dedupe_key: str = "") -> Job:
+    """
+    Creates a pending job, or returns the active one with the same dedupe_key. The unique constraint
+    on active dedupe keys settles concurrent enqueues: the loser gets the winner's job.
+    """
+    if not dedupe_key:
+        return Job.objects.create(kind=kind, payload=payload)
+
+    active = Job.objects.filter(dedupe_key=dedupe_key, status__in=Job.ACTIVE_STATUSES).order_by("created_at")
+    existing = active.first()
+    if existing:
+        return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(kind=kind, payload=payload, dedupe_key=dedupe_key)
+    except IntegrityError:
+        # Another enqueue created the job between our lookup and insert
+        existing = active.first()
+        if existing is None:
+            raise
+        return existing
+
+
+def claim_next(worker_id: str) -> Optional[Job]:
+    """
+    Atomically moves the oldest pending job that is due (see run_after) to RUNNING for this worker.
+    The conditional UPDATE is the lock: if another worker got there first it matches no row
+    and we try the next candidate.
+    """
+    while True:
+        candidate_id = (
+            Job.objects.filter(status="PENDING")
+            .filter(Q(run_after__isnull=True) | Q(run_after__lte=timezone.now()))
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if candidate_id is None:
+            return None
+
+        claimed = Job.objects.filter(id=candidate_id, status="PENDING").update(
+            status="RUNNING",
+            locked_by=worker_id,
+            locked_at=timezone.now(),
+            attempts=F("attempts") + 1,
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            return Job.objects.get(id=candidate_id)
+
+
+def requeue_stale(lease_seconds: int) -> int:
+    """Puts back jobs whose worker died mid-run (lease expired) so another worker picks them up."""
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds)
+    stale = Job.objects.filter(status="RUNNING", locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status="FAILED",
+        error="Worker lease expired",
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    requeued = stale.update(
+        status="PENDING", locked_by=None, locked_at=None, updated_at=timezone.now()
+    )
+    return failed + requeued
+
+
+def retry_delay(attempts: int) -> float:
+    # Capped exponential backoff, jittered so jobs failing together do not retry in lockstep
+    ceiling = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def run_job(job: Job) -> Job:
+    def report_progress(percent: int) -> None:
+        # Doubles as a heartbeat so long jobs (campaigns) keep their lease
+        Job.objects.filter(pk=job.pk).update(
+            progress=max(0, min(100, percent)), locked_at=timezone.now(), updated_at=timezone.now()
+        )
+
+    try:
+        result = get_handler(job.kind)(job.payload, report_progress)
+    except Exception as e:
+        job.error = f"{e}\n{traceback.format_exc()}"
+        # Retry with backoff until max_attempts, then give up
+        job.status = "PENDING" if job.attempts < job.max_attempts else "FAILED"
+        job.locked_by = None
+        job.locked_at = None
+        if job.status == "FAILED":
+            job.finished_at = timezone.now()
+        else:
+            job.run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        job.save(
+            update_fields=["status", "error", "locked_by", "locked_at", "run_after", "finished_at", "updated_at"]
+        )
+        return job
+
+    job.status = "SUCCEEDED"
+    job.result = result
+    job.progress = 100
+    job.error = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "progress", "error", "finished_at", "updated_at"])
+    return job
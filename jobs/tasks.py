@@ -0,0 +1,16 @@
+from typing import Any, Callable, Dict
+
+from django.utils.module_loading import import_string
+
+# Job kind -> handler(payload, report_progress) returning a JSON-serialisable result.
+# Dotted paths keep the jobs app free of imports from the apps that own the work.
+TASK_HANDLERS: Dict[str, str] = {
+    "ENRICH_FESTIVAL": "festivals.tasks.enrich_festival_task",
+    "GENERATE_EMAIL": "festivals.tasks.generate_email_task",
+    "GENERATE_CAMPAIGN": "campaigns.tasks.generate_campaign_task",
+    "SEND_CAMPAIGN": "campaigns.tasks.send_campaign_task",
+}
+
+
+def get_handler(kind: str) -> Callable[[Dict[str, Any], Callable[[int], None]], Any]:
+    return import_string(TASK_HANDLERS[kind])
@@ -0,0 +1,149 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim_next, enqueue, requeue_stale, run_job
+
+
+def failing_handler(payload, report_progress):
+    raise RuntimeError("provider down")
+
+
+def succeeding_handler(payload, report_progress):
+    report_progress(50)
+    return {"echo": payload}
+
+
+class ClaimTests(TestCase):
+    def test_claims_oldest_due_job_once(self):
+        first = enqueue("ENRICH_FESTIVAL", {"festival_id": 1})
+        second = enqueue("ENRICH_FESTIVAL", {"festival_id": 2})
+        Job.objects.filter(pk=first.pk).update(run_after=timezone.now() + timedelta(minutes=5))
+
+        claimed = claim_next("worker-a")
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), ("RUNNING", "worker-a", 1))
+        # The first job is not due yet and the second is taken
+        self.assertIsNone(claim_next("worker-b"))
+
+        Job.objects.filter(pk=first.pk).update(run_after=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_next("worker-b").pk, first.pk)
+
+    def test_lost_race_moves_on_to_the_next_candidate(self):
+        first = enqueue("ENRICH_FESTIVAL", {"festival_id": 1})
+        second = enqueue("ENRICH_FESTIVAL", {"festival_id": 2})
+        # Another worker claims the first job between our SELECT and UPDATE
+        original_update = QuerySet.update
+        raced = []
+
+        def update(queryset, **kwargs):
+            if kwargs.get("locked_by") == "worker-b" and not raced:
+                raced.append(first.pk)
+                original_update(Job.objects.filter(pk=first.pk), status="RUNNING", locked_by="worker-a")
+            return original_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", update):
+            claimed = claim_next("worker-b")
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual(Job.objects.get(pk=first.pk).locked_by, "worker-a")
+
+
+class RequeueStaleTests(TestCase):
+    def test_expired_leases_are_requeued_or_failed(self):
+        stale = enqueue("ENRICH_FESTIVAL", {})
+        exhausted = enqueue("GENERATE_EMAIL", {})
+        fresh = enqueue("SEND_CAMPAIGN", {})
+        for _ in range(3):
+            claim_next("worker-a")
+        long_ago = timezone.now() - timedelta(seconds=700)
+        Job.objects.filter(pk__in=[stale.pk, exhausted.pk]).update(locked_at=long_ago)
+        Job.objects.filter(pk=exhausted.pk).update(attempts=3)
+
+        self.assertEqual(requeue_stale(600), 2)
+
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by, stale.locked_at), ("PENDING", None, None))
+        exhausted.refresh_from_db()
+        self.assertEqual((exhausted.status, exhausted.error), ("FAILED", "Worker lease expired"))
+        self.assertEqual(Job.objects.get(pk=fresh.pk).status, "RUNNING")
+
+
+@override_settings(JOB_RETRY_BASE_DELAY=30, JOB_RETRY_MAX_DELAY=100)
+class RunJobTests(TestCase):
+    def run_next(self, handler):
+        job = claim_next("worker-a")
+        with mock.patch("jobs.queue.get_handler", return_value=handler):
+            return run_job(job)
+
+    def test_success(self):
+        job = enqueue("ENRICH_FESTIVAL", {"festival_id": 1})
+        job = self.run_next(succeeding_handler)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.result), ("SUCCEEDED", 100, {"echo": {"festival_id": 1}}))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_attempts_back_off_exponentially_then_fail(self):
+        job = enqueue("ENRICH_FESTIVAL", {}, dedupe_key="enrich:1")
+
+        for attempt, (low, high) in enumerate(((15, 30), (30, 60)), start=1):
+            before = timezone.now()
+            job = self.run_next(failing_handler)
+            self.assertEqual((job.status, job.attempts), ("PENDING", attempt))
+            self.assertIn("provider down", job.error)
+            delay = (job.run_after - before).total_seconds()
+            self.assertGreaterEqual(delay, low - 1)
+            self.assertLessEqual(delay, high + 1)
+            # Not claimable until the backoff has elapsed
+            self.assertIsNone(claim_next("worker-a"))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        job = self.run_next(failing_handler)
+        self.assertEqual((job.status, job.attempts), ("FAILED", 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(claim_next("worker-a"))
+
+    def test_backoff_is_capped(self):
+        enqueue("ENRICH_FESTIVAL", {})
+        Job.objects.update(attempts=5, max_attempts=10)
+        before = timezone.now()
+        job = self.run_next(failing_handler)
+        self.assertLessEqual((job.run_after - before).total_seconds(), 101)
+
+
+class EnqueueDedupeTests(TestCase):
+    def test_active_job_is_reused_until_it_finishes(self):
+        job = enqueue("ENRICH_FESTIVAL", {"festival_id": 1}, dedupe_key="enrich:1")
+        self.assertEqual(enqueue("ENRICH_FESTIVAL", {"festival_id": 1}, dedupe_key="enrich:1").pk, job.pk)
+        self.assertNotEqual(enqueue("ENRICH_FESTIVAL", {"festival_id": 2}, dedupe_key="enrich:2").pk, job.pk)
+
+        Job.objects.filter(pk=job.pk).update(status="SUCCEEDED")
+        self.assertNotEqual(enqueue("ENRICH_FESTIVAL", {"festival_id": 1}, dedupe_key="enrich:1").pk, job.pk)
+
+    def test_jobs_without_dedupe_key_are_never_merged(self):
+        self.assertNotEqual(enqueue("GENERATE_EMAIL", {}).pk, enqueue("GENERATE_EMAIL", {}).pk)
+
+    def test_constraint_allows_one_active_job_per_key(self):
+        enqueue("ENRICH_FESTIVAL", {}, dedupe_key="enrich:1")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(kind="ENRICH_FESTIVAL", dedupe_key="enrich:1")
+        Job.objects.create(kind="ENRICH_FESTIVAL", dedupe_key="enrich:1", status="FAILED")
+
+    def test_concurrent_enqueue_returns_the_winner(self):
+        winner = enqueue("ENRICH_FESTIVAL", {}, dedupe_key="enrich:1")
+        original_first = QuerySet.first
+        calls = []
+
+        def first(queryset):
+            # The lookup misses the winner once, as if it had been inserted right after it
+            calls.append(queryset)
+            return None if len(calls) == 1 else original_first(queryset)
+
+        with mock.patch.object(QuerySet, "first", first):
+            job = enqueue("ENRICH_FESTIVAL", {}, dedupe_key="enrich:1")
+        self.assertEqual(job.pk, winner.pk)
+        self.assertEqual(Job.objects.filter(dedupe_key="enrich:1").count(), 1)
@@ -0,0 +1,10 @@
+from django.urls import path, include, URLPattern
+from rest_framework.routers import DefaultRouter
+from jobs.views import JobViewSet
+from typing import List
+
+router: DefaultRouter = DefaultRouter()
+router.register(r"", JobViewSet, basename="job")
+urlpatterns: List[URLPattern] = [
+    path("", include(router.urls)),
+]
@@ -0,0 +1,9 @@
+from rest_framework import viewsets
+from jobs.models import Job
+from circus_agent_backend.serializers import JobSerializer
+
+
+# Read-only: jobs are created by the actions that enqueue them and updated by the workers
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all().order_by("-created_at")
+    serializer_class = JobSerializer
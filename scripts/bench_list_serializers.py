@@ -0,0 +1,85 @@
+"""
+List serialization benchmark: CPU time per row of the festival and application list payloads, built by
+ModelSerializer over model instances (the previous list path) and by ValuesListSerializer over
+values_list() rows, with all fields and with a sparse fieldset. Runs against a migrated database.
+
+    python scripts/bench_list_serializers.py [--runs 5] [--database path/to/db.sqlite3]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List, Optional, Sequence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What the list UIs show
+SPARSE_FIELDS = {
+    "festival": ["id", "festival_name", "country", "town", "festival_type", "start_date", "applied"],
+    "application": ["id", "festival", "application_date", "application_status", "follow_up_date"],
+}
+
+
+def cpu_time(build: Callable[[], List[dict]], runs: int) -> float:
+    # Best of `runs`: the least disturbed run is the closest to the real cost
+    best = float("inf")
+    for _ in range(runs):
+        start = time.process_time()
+        build()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database", help="SQLite file to read (default: the settings database)")
+    options = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "circus_agent_backend.settings")
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    if options.database:
+        connection.settings_dict["NAME"] = options.database
+
+    from applications.models import Application
+    from circus_agent_backend.serializers import ApplicationSerializer, FestivalSerializer, ValuesListSerializer
+    from festivals.models import Festival
+
+    for name, model, serializer_class in (
+        ("festival", Festival, FestivalSerializer),
+        ("application", Application, ApplicationSerializer),
+    ):
+        queryset = model.objects.order_by("id")
+        rows = queryset.count()
+        if not rows:
+            print(f"{name}: no rows, skipped")
+            continue
+
+        def model_serializer(fields: Optional[Sequence[str]] = None) -> List[dict]:
+            narrowed = queryset.only(*[f for f in fields if f != "attachments"]) if fields else queryset
+            return serializer_class(narrowed, many=True, fields=fields).data
+
+        def values_serializer(fields: Optional[Sequence[str]] = None) -> List[dict]:
+            fast = ValuesListSerializer(serializer_class(fields=fields))
+            return fast.serialize(fast.rows(queryset))
+
+        print(f"{name}: {rows} rows, CPU time per row (best of {options.runs})")
+        baseline = None
+        for label, build in (
+            ("ModelSerializer, all fields", lambda: model_serializer()),
+            ("ModelSerializer, sparse + only()", lambda: model_serializer(SPARSE_FIELDS[name])),
+            ("ValuesListSerializer, all fields", lambda: values_serializer()),
+            ("ValuesListSerializer, sparse", lambda: values_serializer(SPARSE_FIELDS[name])),
+        ):
+            per_row = cpu_time(build, options.runs) / rows
+            baseline = baseline or per_row
+            print(f"  {label:34} {per_row * 1e6:8.1f} us  {baseline / per_row:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Cold-start benchmark: times fresh interpreters running `manage.py check` and loading the WSGI / ASGI
+applications, and reports which heavy SDKs got imported on the way.
+
+    python scripts/bench_startup.py [--runs 5] [--importtime]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported once an LLM call or an import script actually runs
+HEAVY_MODULES = ("mistralai", "google.genai", "httpx", "pydantic", "pandas", "grpc")
+
+# Django resolves the URLconf (and so imports every view) on the first request, count it as startup
+LOAD_URLCONF = "from django.urls import get_resolver; get_resolver().url_patterns"
+
+TARGETS: Dict[str, List[str]] = {
+    "manage.py check": ["manage.py", "check"],
+    "wsgi application": ["-c", f"import circus_agent_backend.wsgi; {LOAD_URLCONF}"],
+    "asgi application": ["-c", f"import circus_agent_backend.asgi; {LOAD_URLCONF}"],
+}
+
+
+def time_run(args: List[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=REPO_ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def heavy_imports(module: str) -> List[str]:
+    code = (
+        f"import sys, {module}; {LOAD_URLCONF}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True, capture_output=True, text=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def top_imports(args: List[str], count: int = 15) -> List[str]:
+    # -X importtime writes "import time: self | cumulative | module" lines to stderr
+    out = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=REPO_ROOT, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return [f"{cumulative / 1000:8.1f} ms {name}" for cumulative, name in sorted(rows, reverse=True)[:count]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports per target")
+    options = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "circus_agent_backend.settings")
+    for name, args in TARGETS.items():
+        timings = [time_run(args) for _ in range(options.runs)]
+        print(
+            f"{name:18} min {min(timings) * 1000:7.1f} ms  median {statistics.median(timings) * 1000:7.1f} ms"
+            f"  ({options.runs} runs)"
+        )
+        if options.importtime:
+            print("\n".join(top_imports(args)))
+
+    for module in ("circus_agent_backend.wsgi", "circus_agent_backend.asgi"):
+        print(f"heavy modules after importing {module}: {', '.join(heavy_imports(module)) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+from services.mistral_service import MistralClient
+from services.tokens import estimate_tokens
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Mistral batch job statuses after which polling stops
+TERMINAL_STATUSES = ("SUCCESS", "FAILED", "TIMEOUT_EXCEEDED", "CANCELLED")
+
+
+class BatchJob(NamedTuple):
+    id: str
+    status: str
+    total_requests: int
+    completed_requests: int
+    output_file: Optional[str]
+
+
+def write_jsonl(requests: Iterable[Dict[str, Any]], fh) -> int:
+    count = 0
+    for request in requests:
+        fh.write(json.dumps(request, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+class MistralBatchBackend:
+    """
+    Mistral batch inference: the JSONL input is uploaded as a file, run as a batch job within 24h at a
+    lower price than the interactive endpoint, and the results are downloaded as another JSONL file.
+    """
+
+    def __init__(self, mistral_client: MistralClient):
+        self.mistral = mistral_client
+
+    def submit(self, input_path: str, metadata: Optional[Dict[str, str]] = None, timeout_hours: int = 24) -> BatchJob:
+        from mistralai import File
+
+        def upload():
+            # Opened per attempt: a failed upload leaves the previous handle at EOF
+            with open(input_path, "rb") as fh:
+                return self.mistral.client.files.upload(
+                    file=File(file_name=os.path.basename(input_path), content=fh), purpose="batch"
+                )
+
+        uploaded = self.mistral.policy.call(upload, operation="batch_upload")
+        job = self.mistral.policy.call(
+            lambda: self.mistral.client.batch.jobs.create(
+                input_files=[uploaded.id],
+                endpoint=BATCH_ENDPOINT,
+                model=self.mistral.model,
+                metadata=metadata,
+                timeout_hours=timeout_hours,
+            ),
+            operation="batch_create",
+        )
+        return self._job(job)
+
+    def get(self, job_id: str) -> BatchJob:
+        return self._job(
+            self.mistral.policy.call(lambda: self.mistral.client.batch.jobs.get(job_id=job_id), operation="batch_get")
+        )
+
+    def results(self, job: BatchJob) -> Iterator[Dict[str, Any]]:
+        """Streams the output file line by line instead of loading it whole."""
+        response = self.mistral.policy.call(
+            lambda: self.mistral.client.files.download(file_id=job.output_file), operation="batch_download"
+        )
+        try:
+            for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _job(job) -> BatchJob:
+        return BatchJob(
+            id=job.id,
+            status=job.status,
+            total_requests=job.total_requests,
+            completed_requests=job.completed_requests,
+            output_file=job.output_file,
+        )
+
+
+class LocalBatchBackend:
+    """
+    Stand-in for the provider batch API (tests, local runs, providers without batch support).
+    Answers every request at submit time with `respond(body) -> content` and writes the output file in
+    the provider's format, so the same polling and result parsing code runs against it.
+    """
+
+    def __init__(self, respond: Callable[[Dict[str, Any]], str], directory: Optional[str] = None):
+        self.respond = respond
+        self.directory = directory or os.getenv(
+            "LLM_BATCH_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "llm_batches")
+        )
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{suffix}")
+
+    def submit(self, input_path: str, metadata: Optional[Dict[str, str]] = None, timeout_hours: int = 24) -> BatchJob:
+        job_id = uuid.uuid4().hex
+        total = 0
+        with open(input_path, encoding="utf-8") as src, open(self._path(job_id, "output.jsonl"), "w", encoding="utf-8") as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                total += 1
+                try:
+                    content = self.respond(request["body"])
+                except Exception as e:
+                    result = {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+                else:
+                    body = {
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                        "usage": {"completion_tokens": estimate_tokens(content)},
+                    }
+                    result = {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+        job = BatchJob(id=job_id, status="SUCCESS", total_requests=total, completed_requests=total, output_file=job_id)
+        with open(self._path(job_id, "json"), "w", encoding="utf-8") as fh:
+            json.dump(job._asdict(), fh)
+        return job
+
+    def get(self, job_id: str) -> BatchJob:
+        with open(self._path(job_id, "json"), encoding="utf-8") as fh:
+            return BatchJob(**json.load(fh))
+
+    def results(self, job: BatchJob) -> Iterator[Dict[str, Any]]:
+        with open(self._path(job.output_file, "output.jsonl"), encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def interactive_responder(
+    mistral_client: MistralClient, cache_policy: str = "enrich"
+) -> Callable[[Dict[str, Any]], str]:
+    """
+    LocalBatchBackend responder answering batch bodies through the interactive chat endpoint, cached
+    under `cache_policy` (a CHAT_CACHE_TTLS key) like the interactive call site it stands in for.
+    """
+
+    def respond(body: Dict[str, Any]) -> str:
+        messages = body["messages"]
+        system = next((m["content"] for m in messages if m["role"] == "system"), None)
+        prompt = next(m["content"] for m in messages if m["role"] == "user")
+        completion_args = {k: v for k, v in body.items() if k != "messages"}
+        return mistral_client.chat(prompt=prompt, system=system, cache_policy=cache_policy, **completion_args)
+
+    return respond
@@ -0,0 +1,53 @@
+import sys
+from typing import Optional
+
+
+class LLMError(Exception):
+    """Base class for provider failures. `retryable` tells the retry layer whether to try again."""
+
+    retryable: bool = False
+
+    def __init__(self, provider: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"[{provider}] {message}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+class LLMRateLimitError(LLMError):
+    retryable = True
+
+
+class LLMServerError(LLMError):
+    retryable = True
+
+
+class LLMConnectionError(LLMError):
+    retryable = True
+
+
+class LLMRequestError(LLMError):
+    """4xx other than 429: retrying the same request will not help."""
+
+
+class LLMResponseError(LLMError):
+    """The provider answered, but not with something we can use."""
+
+
+def classify_error(provider: str, error: Exception) -> LLMError:
+    if isinstance(error, LLMError):
+        return error
+
+    # httpx is only imported by the SDKs: if it is not loaded, the error cannot come from it
+    httpx = sys.modules.get("httpx")
+    if httpx and isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return LLMConnectionError(provider, str(error))
+
+    # mistralai.models.SDKError exposes status_code, google.genai.errors.APIError exposes code
+    status_code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if not isinstance(status_code, int):
+        return LLMResponseError(provider, str(error))
+    if status_code == 429:
+        return LLMRateLimitError(provider, str(error), status_code)
+    if status_code >= 500:
+        return LLMServerError(provider, str(error), status_code)
+    return LLMRequestError(provider, str(error), status_code)
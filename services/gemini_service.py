@@ -1,32 +1,152 @@
+import asyncio
 import os
+import re
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
-# The client gets the API key from the environment variable `GEMINI_API_KEY`.
-client = genai.Client()
+from services.cache import DiskCache
+from services.errors import LLMResponseError
+from services.rate_limit import ProviderPolicy
+from services.telemetry import telemetry
+from services.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from google.genai import types
 
 
 class GeminiClient:
-    def __init__(self):
+    def __init__(
+        self,
+        http_client_args: Optional[Dict[str, Any]] = None,
+        async_http_client_args: Optional[Dict[str, Any]] = None,
+    ):
+        # google-genai (with pydantic and its generated types) is imported on first use, not on module import
+        from google import genai
+        from google.genai import types
+
         load_dotenv(".env")
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise RuntimeError("Missing GEMINI_API_KEY in .env")
 
-        self.client = genai.Client()
+        # Extra httpx client kwargs (e.g. connection limits) for the underlying keep-alive pools
+        http_options = types.HttpOptions(
+            client_args=http_client_args, async_client_args=async_http_client_args
+        )
+        self.client = genai.Client(http_options=http_options)
+        self.model = "gemini-2.5-flash"
         # Define the grounding tool
         self.grounding_tool = types.Tool(google_search=types.GoogleSearch())
         # Configure generation settings
         self.config = types.GenerateContentConfig(tools=[self.grounding_tool])
+        # Grounded search results barely change within a season, so they are cached on disk
+        self.search_cache = DiskCache(
+            namespace="gemini_search",
+            ttl=int(os.getenv("GEMINI_SEARCH_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("GEMINI_SEARCH_CACHE_MAX_ENTRIES", "5000")),
+        )
+        self.policy = ProviderPolicy.from_env("gemini", rpm=60, tpm=250_000)
+
+    def search_cache_key(self, query: str) -> str:
+        normalised = re.sub(r"\s+", " ", query).strip().lower()
+        return f"{self.model}:{normalised}"
+
+    def _cached_search(self, cache_key: str) -> Optional[str]:
+        cached = self.search_cache.get(cache_key)
+        telemetry.record_cache("gemini", "search", hit=cached is not None)
+        return cached
 
-    def search(self, query: str) -> str:
-        try:
-            resp = client.models.generate_content(
-                model="gemini-2.5-flash",
+    @staticmethod
+    def _record_usage(resp, operation: str = "search") -> None:
+        usage = getattr(resp, "usage_metadata", None)
+        if usage:
+            telemetry.record_usage(
+                "gemini", operation, usage.prompt_token_count or 0, usage.candidates_token_count or 0
+            )
+
+    @staticmethod
+    def _response_text(resp, operation: str = "search") -> str:
+        text = getattr(resp, "text", None)
+        if not text:
+            raise LLMResponseError("gemini", f"{operation.capitalize()} returned no text")
+        return text
+
+    def search(self, query: str, use_cache: bool = True) -> str:
+        """Grounded search. Raises LLMError once retries are exhausted."""
+        cache_key = self.search_cache_key(query)
+        if use_cache:
+            cached = self._cached_search(cache_key)
+            if cached is not None:
+                return cached
+
+        resp = self.policy.call(
+            lambda: self.client.models.generate_content(
+                model=self.model,
                 contents=query,
                 config=self.config,
-            )
-            return getattr(resp, "text", str(resp))
-        except Exception as e:
-            return f"[Gemini chat error] {e}"
+            ),
+            tokens=estimate_tokens(query),
+            operation="search",
+        )
+        self._record_usage(resp)
+        text = self._response_text(resp)
+
+        # Bypassing only skips the lookup, a fresh result still refreshes the entry
+        self.search_cache.set(cache_key, text)
+        return text
+
+    async def asearch(self, query: str, use_cache: bool = True) -> str:
+        # The cache is a local SQLite file, run it off the event loop
+        cache_key = self.search_cache_key(query)
+        if use_cache:
+            cached = await asyncio.to_thread(self._cached_search, cache_key)
+            if cached is not None:
+                return cached
+
+        resp = await self.policy.acall(
+            lambda: self.client.aio.models.generate_content(
+                model=self.model,
+                contents=query,
+                config=self.config,
+            ),
+            tokens=estimate_tokens(query),
+            operation="search",
+        )
+        self._record_usage(resp)
+        text = self._response_text(resp)
+
+        await asyncio.to_thread(self.search_cache.set, cache_key, text)
+        return text
+
+    def _chat_config(self, system: Optional[str]) -> "types.GenerateContentConfig":
+        from google.genai import types
+
+        return types.GenerateContentConfig(system_instruction=system)
+
+    def chat(self, prompt: str, system: Optional[str] = None) -> str:
+        """Ungrounded generation, the fallback for Mistral chat. Raises LLMError once retries are exhausted."""
+        resp = self.policy.call(
+            lambda: self.client.models.generate_content(
+                model=self.model,
+                contents=prompt,
+                config=self._chat_config(system),
+            ),
+            tokens=estimate_tokens(prompt) + estimate_tokens(system or ""),
+            operation="chat",
+        )
+        self._record_usage(resp, "chat")
+        return self._response_text(resp, "chat")
+
+    async def achat(self, prompt: str, system: Optional[str] = None) -> str:
+        resp = await self.policy.acall(
+            lambda: self.client.aio.models.generate_content(
+                model=self.model,
+                contents=prompt,
+                config=self._chat_config(system),
+            ),
+            tokens=estimate_tokens(prompt) + estimate_tokens(system or ""),
+            operation="chat",
+        )
+        self._record_usage(resp, "chat")
+        return self._response_text(resp, "chat")
@@ -1,41 +1,302 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, Optional
+
 from dotenv import load_dotenv
-from mistralai import Mistral, ConversationResponse
 import os
 
+from services.cache import DiskCache
+from services.errors import LLMResponseError, classify_error
+from services.rate_limit import ProviderPolicy
+from services.telemetry import telemetry
+from services.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    import httpx
+    from mistralai import ConversationResponse
+
+# Cache lifetime in seconds for each call site that opts into response caching
+CHAT_CACHE_TTLS: Dict[str, int] = {
+    "enrich": int(os.getenv("MISTRAL_ENRICH_CACHE_TTL", str(24 * 3600))),
+    "application_mail": int(os.getenv("MISTRAL_MAIL_CACHE_TTL", str(30 * 24 * 3600))),
+}
+
 
 class MistralClient:
-    def __init__(self):
+    def __init__(
+        self,
+        http_client: Optional["httpx.Client"] = None,
+        async_http_client: Optional["httpx.AsyncClient"] = None,
+    ):
+        # The SDK is imported on first use, so importing this module stays cheap
+        from mistralai import Mistral
+
         load_dotenv(".env")
-        self.client = Mistral(api_key=os.getenv("MISTRAL_API_KEY"))
+        self.client = Mistral(
+            api_key=os.getenv("MISTRAL_API_KEY"),
+            client=http_client,
+            async_client=async_http_client,
+        )
         self.model = os.getenv("MISTRAL_DEFAULT_MODEL")
-        self.search_agent = self.client.beta.agents.create(
-            model="mistral-medium-2505",
-            description="Agent able to search information regarding circus and street festivals over the web",
-            name="Websearch Agent",
-            instructions="You have the ability to perform web searches with `web_search` to find up-to-date information.",
-            tools=[{"type": "web_search"}],
-            completion_args={
-                "temperature": 0.3,
-                "top_p": 0.95,
-            },
-        )
-
-    def chat(self, prompt: str) -> str:
+        # Reuse an existing agent when its id is configured, otherwise create one on first search
+        self.search_agent_id: Optional[str] = os.getenv("MISTRAL_SEARCH_AGENT_ID")
+        self._agent_lock = threading.Lock()
+        self.chat_cache = DiskCache(
+            namespace="mistral_chat",
+            ttl=CHAT_CACHE_TTLS["enrich"],
+            max_entries=int(os.getenv("MISTRAL_CHAT_CACHE_MAX_ENTRIES", "10000")),
+        )
+        self.policy = ProviderPolicy.from_env("mistral", rpm=60, tpm=500_000)
+
+    def get_search_agent_id(self) -> str:
+        if self.search_agent_id:
+            return self.search_agent_id
+
+        with self._agent_lock:
+            if not self.search_agent_id:
+                search_agent = self.policy.call(lambda: self.client.beta.agents.create(
+                    model="mistral-medium-2505",
+                    description="Agent able to search information regarding circus and street festivals over the web",
+                    name="Websearch Agent",
+                    instructions="You have the ability to perform web searches with `web_search` to find up-to-date information.",
+                    tools=[{"type": "web_search"}],
+                    completion_args={
+                        "temperature": 0.3,
+                        "top_p": 0.95,
+                    },
+                ), operation="agent_create")
+                self.search_agent_id = search_agent.id
+        return self.search_agent_id
+
+    @staticmethod
+    def _messages(prompt: str, system: Optional[str] = None) -> list:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        return messages
+
+    def chat_cache_key(self, messages: list, completion_args: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"model": self.model, "messages": messages, "completion_args": completion_args},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def chat(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        cache_policy: Optional[str] = None,
+        regenerate: bool = False,
+        **completion_args: Any,
+    ) -> str:
+        """
+        Caching is opt-in: pass a cache_policy from CHAT_CACHE_TTLS to reuse identical responses.
+        regenerate=True skips the lookup but still stores the new response.
+        An optional system message carries static instructions shared across calls.
+        Raises LLMError once retries are exhausted.
+        """
+        messages = self._messages(prompt, system)
+        cache_key: Optional[str] = None
+        if cache_policy:
+            cache_key = self.chat_cache_key(messages, completion_args)
+            if not regenerate:
+                cached = self._cached_response(cache_key, "chat")
+                if cached is not None:
+                    return cached
+
+        # Call the Mistral API to get a chat response, within the rate limits
+        chat_response = self.policy.call(
+            lambda: self.client.chat.complete(model=self.model, messages=messages, **completion_args),
+            tokens=estimate_tokens(prompt) + estimate_tokens(system or ""),
+            operation="chat",
+        )
+        self._record_usage(chat_response, "chat")
+        # Extract and return the content of the response
+        content = self._response_content(chat_response)
+
+        if cache_key and content:
+            self.chat_cache.set(cache_key, content, ttl=CHAT_CACHE_TTLS[cache_policy])
+        return content
+
+    def stream_chat(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        cache_policy: Optional[str] = None,
+        regenerate: bool = False,
+        **completion_args: Any,
+    ) -> Iterator[str]:
+        """
+        Yields the response text as Mistral streams it. Same caching rules as chat():
+        a cached response is yielded as one chunk, a completed stream is stored.
+        Only opening the stream is retried; a failure after the first token raises LLMError.
+        """
+        messages = self._messages(prompt, system)
+        cache_key: Optional[str] = None
+        if cache_policy:
+            cache_key = self.chat_cache_key(messages, completion_args)
+            if not regenerate:
+                cached = self._cached_response(cache_key, "chat_stream")
+                if cached is not None:
+                    yield cached
+                    return
+
+        parts = []
+        # policy telemetry times the stream opening (time to first byte) under "chat_stream_open"
+        stream = self.policy.call(
+            lambda: self.client.chat.stream(model=self.model, messages=messages, **completion_args),
+            tokens=estimate_tokens(prompt) + estimate_tokens(system or ""),
+            operation="chat_stream_open",
+        )
+        started = time.perf_counter()
         try:
-            # Call the Mistral API to get a chat response
-            chat_response = self.client.chat.complete(
-                model=self.model, messages=[{"role": "user", "content": prompt}]
-            )
-            # Extract and return the content of the response
-            return chat_response.choices[0].message.content
+            with stream:
+                for event in stream:
+                    delta = self._stream_delta(event)
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            error = classify_error("mistral", e)
+            telemetry.record_call("mistral", "chat_stream", time.perf_counter() - started, error)
+            raise error from e
+        telemetry.record_call("mistral", "chat_stream", time.perf_counter() - started)
+
+        content = "".join(parts)
+        if cache_key and content:
+            self.chat_cache.set(cache_key, content, ttl=CHAT_CACHE_TTLS[cache_policy])
+
+    async def astream_chat(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        cache_policy: Optional[str] = None,
+        regenerate: bool = False,
+        **completion_args: Any,
+    ) -> AsyncIterator[str]:
+        """Async counterpart of stream_chat(), same caching and retry rules."""
+        messages = self._messages(prompt, system)
+        cache_key: Optional[str] = None
+        if cache_policy:
+            cache_key = self.chat_cache_key(messages, completion_args)
+            if not regenerate:
+                cached = await asyncio.to_thread(self._cached_response, cache_key, "chat_stream")
+                if cached is not None:
+                    yield cached
+                    return
 
+        parts = []
+        stream = await self.policy.acall(
+            lambda: self.client.chat.stream_async(model=self.model, messages=messages, **completion_args),
+            tokens=estimate_tokens(prompt) + estimate_tokens(system or ""),
+            operation="chat_stream_open",
+        )
+        started = time.perf_counter()
+        try:
+            async with stream:
+                async for event in stream:
+                    delta = self._stream_delta(event)
+                    if delta:
+                        parts.append(delta)
+                        yield delta
         except Exception as e:
-            # Handle any errors that occur during the API call
-            print(f"An error occurred: {e}")
-            return {"error": str(e)}
+            error = classify_error("mistral", e)
+            telemetry.record_call("mistral", "chat_stream", time.perf_counter() - started, error)
+            raise error from e
+        telemetry.record_call("mistral", "chat_stream", time.perf_counter() - started)
+
+        content = "".join(parts)
+        if cache_key and content:
+            await asyncio.to_thread(
+                self.chat_cache.set, cache_key, content, CHAT_CACHE_TTLS[cache_policy]
+            )
+
+    def _stream_delta(self, event) -> str:
+        # The last event carries the usage of the whole completion
+        if getattr(event.data, "usage", None):
+            self._record_usage(event.data, "chat_stream")
+        delta = event.data.choices[0].delta.content
+        # Content is either a plain string or a list of chunks
+        if isinstance(delta, list):
+            delta = "".join(getattr(chunk, "text", "") for chunk in delta)
+        return delta or ""
+
+    async def achat(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        cache_policy: Optional[str] = None,
+        regenerate: bool = False,
+        **completion_args: Any,
+    ) -> str:
+        """Async counterpart of chat(), same caching rules."""
+        messages = self._messages(prompt, system)
+        cache_key: Optional[str] = None
+        if cache_policy:
+            cache_key = self.chat_cache_key(messages, completion_args)
+            if not regenerate:
+                cached = await asyncio.to_thread(self._cached_response, cache_key, "chat")
+                if cached is not None:
+                    return cached
+
+        chat_response = await self.policy.acall(
+            lambda: self.client.chat.complete_async(model=self.model, messages=messages, **completion_args),
+            tokens=estimate_tokens(prompt) + estimate_tokens(system or ""),
+            operation="chat",
+        )
+        self._record_usage(chat_response, "chat")
+        content = self._response_content(chat_response)
+
+        if cache_key and content:
+            await asyncio.to_thread(
+                self.chat_cache.set, cache_key, content, CHAT_CACHE_TTLS[cache_policy]
+            )
+        return content
+
+    def _cached_response(self, cache_key: str, operation: str) -> Optional[str]:
+        cached = self.chat_cache.get(cache_key)
+        telemetry.record_cache("mistral", operation, hit=cached is not None)
+        return cached
+
+    @staticmethod
+    def _record_usage(response, operation: str) -> None:
+        usage = getattr(response, "usage", None)
+        if usage:
+            telemetry.record_usage(
+                "mistral", operation, usage.prompt_tokens or 0, usage.completion_tokens or 0
+            )
+
+    @staticmethod
+    def _response_content(chat_response) -> str:
+        try:
+            content = chat_response.choices[0].message.content
+        except (AttributeError, IndexError, TypeError) as e:
+            raise LLMResponseError("mistral", f"Unexpected chat response: {e}")
+        if not isinstance(content, str):
+            raise LLMResponseError("mistral", "Chat response has no text content")
+        return content
+
+    def search(self, query: str) -> "ConversationResponse":
+        agent_id = self.get_search_agent_id()
+        response = self.policy.call(
+            lambda: self.client.beta.conversations.start(agent_id=agent_id, inputs=query),
+            tokens=estimate_tokens(query),
+            operation="agent_search",
+        )
+        self._record_usage(response, "agent_search")
+        return response
 
-    def search(self, query: str):
-        response: ConversationResponse = self.client.beta.conversations.start(
-            agent_id=self.search_agent.id, inputs=query
+    async def asearch(self, query: str) -> "ConversationResponse":
+        # Creating the agent is a one-off blocking call, keep it off the event loop
+        agent_id = await asyncio.to_thread(self.get_search_agent_id)
+        response = await self.policy.acall(
+            lambda: self.client.beta.conversations.start_async(agent_id=agent_id, inputs=query),
+            tokens=estimate_tokens(query),
+            operation="agent_search",
         )
-        return response
\ No newline at end of file
+        self._record_usage(response, "agent_search")
+        return response
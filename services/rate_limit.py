@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from services.errors import LLMError, classify_error
+from services.sqlite_state import DEFAULT_STATE_PATH, get_connection
+from services.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Token bucket whose state lives in the shared SQLite file, so every thread and worker
+    process on the host draws from the same budget.
+    """
+
+    def __init__(self, name: str, capacity: float, per_seconds: float = 60.0, path: str = DEFAULT_STATE_PATH):
+        self.name = name
+        self.capacity = capacity
+        self.refill_rate = capacity / per_seconds
+        self.path = path
+        self._table_ready = False
+
+    def _connection(self):
+        conn = get_connection(self.path)
+        if not self._table_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._table_ready = True
+        return conn
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """Takes `amount` tokens if available and returns 0, otherwise returns the seconds to wait."""
+        # A request bigger than the bucket could never fit, let it through once the bucket is full
+        amount = min(amount, self.capacity)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens = self.capacity if row is None else min(
+                self.capacity, row[0] + (now - row[1]) * self.refill_rate
+            )
+
+            wait = 0.0
+            if tokens >= amount:
+                tokens -= amount
+            else:
+                wait = (amount - tokens) / self.refill_rate
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.name, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, amount: float = 1.0) -> None:
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1.0) -> None:
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class ProviderPolicy:
+    """Requests-per-minute and tokens-per-minute limits plus jittered exponential retry for one provider."""
+
+    def __init__(self, provider: str, rpm: int, tpm: int, max_attempts: int):
+        self.provider = provider
+        self.requests = TokenBucket(f"{provider}:rpm", rpm)
+        self.tokens = TokenBucket(f"{provider}:tpm", tpm)
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def from_env(cls, provider: str, rpm: int, tpm: int) -> "ProviderPolicy":
+        prefix = provider.upper()
+        return cls(
+            provider,
+            rpm=int(os.getenv(f"{prefix}_RPM", str(rpm))),
+            tpm=int(os.getenv(f"{prefix}_TPM", str(tpm))),
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "4")),
+        )
+
+    def _retry_kwargs(self):
+        return dict(
+            retry=retry_if_exception(lambda e: isinstance(e, LLMError) and e.retryable),
+            wait=wait_random_exponential(multiplier=1, max=30),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=lambda state: logger.warning(
+                "%s call failed (attempt %s): %s",
+                self.provider,
+                state.attempt_number,
+                state.outcome.exception(),
+            ),
+            reraise=True,
+        )
+
+    def acquire(self, tokens: int = 0) -> None:
+        self.requests.acquire(1)
+        if tokens:
+            self.tokens.acquire(tokens)
+
+    def call(self, fn: Callable[[], T], tokens: int = 0, operation: str = "call") -> T:
+        """
+        Runs fn under the rate limits, retrying rate-limit/5xx/connection errors. Raises LLMError.
+        Every attempt is timed for telemetry, excluding the time spent waiting on the rate limiter.
+        """
+        for attempt in Retrying(**self._retry_kwargs()):
+            with attempt:
+                self.acquire(tokens)
+                started = time.perf_counter()
+                try:
+                    result = fn()
+                except Exception as e:
+                    error = classify_error(self.provider, e)
+                    telemetry.record_call(self.provider, operation, time.perf_counter() - started, error)
+                    raise error from e
+                telemetry.record_call(self.provider, operation, time.perf_counter() - started)
+                return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: int = 0, operation: str = "call") -> T:
+        async for attempt in AsyncRetrying(**self._retry_kwargs()):
+            with attempt:
+                await self.requests.aacquire(1)
+                if tokens:
+                    await self.tokens.aacquire(tokens)
+                started = time.perf_counter()
+                try:
+                    result = await fn()
+                except Exception as e:
+                    error = classify_error(self.provider, e)
+                    telemetry.record_call(self.provider, operation, time.perf_counter() - started, error)
+                    raise error from e
+                telemetry.record_call(self.provider, operation, time.perf_counter() - started)
+                return result
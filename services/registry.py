@@ -0,0 +1,84 @@
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from services.gemini_service import GeminiClient
+from services.mistral_service import MistralClient
+
+
+def _http_limits():
+    # httpx comes with the SDKs, only import it once a client is actually built
+    import httpx
+
+    # Keep-alive pool shared by every client of a provider inside this worker process
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=30.0,
+    )
+
+
+def _http_timeout():
+    import httpx
+
+    return httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "120")), connect=10.0)
+
+
+class ProviderRegistry:
+    """Lazily builds one client per provider and hands the same instance to every caller."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            # Another thread may have built it while we were waiting for the lock
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._factories[name]()
+                self._instances[name] = instance
+            return instance
+
+    def reset(self) -> None:
+        with self._lock:
+            self._instances.clear()
+
+
+def _build_mistral_client() -> MistralClient:
+    import httpx
+
+    return MistralClient(
+        http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout()),
+        async_http_client=httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout()),
+    )
+
+
+def _build_gemini_client() -> GeminiClient:
+    return GeminiClient(
+        http_client_args={"limits": _http_limits()},
+        async_http_client_args={"limits": _http_limits()},
+    )
+
+
+registry: ProviderRegistry = ProviderRegistry()
+registry.register("mistral", _build_mistral_client)
+registry.register("gemini", _build_gemini_client)
+
+
+def get_mistral_client() -> MistralClient:
+    return registry.get("mistral")
+
+
+def get_gemini_client() -> GeminiClient:
+    return registry.get("gemini")
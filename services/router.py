@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from services.errors import LLMError, LLMResponseError
+from services.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class Route(NamedTuple):
+    provider: str
+    # Telemetry operation whose latency distribution sets the hedge deadline
+    operation: str
+    call: Callable[[], Any]
+
+
+class ProviderRouter:
+    """
+    Runs a primary provider call and, if it has not answered by its p95 latency, also fires the
+    secondary and keeps the first valid result (hedging). Errors or invalid results from one route
+    fall back to the other.
+
+    A thread cannot be cancelled, so in run() the losing call keeps its worker until it returns (its
+    result still warms the caches). At most `max_hedges` hedged calls run at once, past that the
+    primary is left to answer alone, so losers cannot take the whole pool from other requests.
+    arun() cancels the losing task.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        min_delay: float = 2.0,
+        default_delay: float = 15.0,
+        max_workers: int = 32,
+        max_hedges: int = 8,
+    ):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+        self._hedge_slots = threading.BoundedSemaphore(max_hedges)
+        self._delays: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+    def hedge_delay(self, route: Route) -> float:
+        # The quantile comes from the shared metrics table, re-read at most every 30s
+        key = (route.provider, route.operation)
+        cached = self._delays.get(key)
+        if cached and time.monotonic() - cached[1] < 30:
+            return cached[0]
+        observed = telemetry.latency_quantile(route.provider, route.operation, self.quantile)
+        delay = max(self.min_delay, observed) if observed else self.default_delay
+        self._delays[key] = (delay, time.monotonic())
+        return delay
+
+    def _record(self, operation: str, name: str) -> None:
+        telemetry.record_counter("router", operation, name)
+
+    def run(
+        self,
+        primary: Route,
+        secondary: Optional[Route] = None,
+        hedge: bool = True,
+        is_valid: Callable[[Any], bool] = bool,
+    ) -> Any:
+        """Raises the last LLMError when no route produced a valid result."""
+        operation = primary.operation
+        pending: Dict[Future, Route] = {self._executor.submit(primary.call): primary}
+        errors: List[Exception] = []
+
+        if secondary and hedge:
+            done, _ = wait(pending, timeout=self.hedge_delay(primary))
+            if not done and self._hedge_slots.acquire(blocking=False):
+                self._record(operation, "hedged")
+                future = self._executor.submit(secondary.call)
+                future.add_done_callback(lambda _: self._hedge_slots.release())
+                pending[future] = secondary
+                secondary = None
+            elif not done:
+                self._record(operation, "hedge_skipped")
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                route = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    logger.warning("%s %s failed: %s", route.provider, route.operation, e)
+                    result = None
+                else:
+                    if is_valid(result):
+                        self._record(operation, f"won:{route.provider}")
+                        return result
+                    errors.append(LLMResponseError(route.provider, f"Invalid {route.operation} result"))
+
+                # Fall back to the secondary if it was not already racing
+                if not pending and secondary:
+                    self._record(operation, "fallback")
+                    pending[self._executor.submit(secondary.call)] = secondary
+                    secondary = None
+
+        error = errors[-1]
+        raise error if isinstance(error, LLMError) else LLMError(primary.provider, str(error))
+
+    async def arun(
+        self,
+        primary: Tuple[str, str, Callable[[], Awaitable[Any]]],
+        secondary: Optional[Tuple[str, str, Callable[[], Awaitable[Any]]]] = None,
+        hedge: bool = True,
+        is_valid: Callable[[Any], bool] = bool,
+    ) -> Any:
+        """Async counterpart of run(): routes are (provider, operation, coroutine function)."""
+        primary_route, secondary_route = Route(*primary), Route(*secondary) if secondary else None
+        operation = primary_route.operation
+        pending: Dict[asyncio.Task, Route] = {asyncio.ensure_future(primary_route.call()): primary_route}
+        errors: List[Exception] = []
+
+        try:
+            if secondary_route and hedge:
+                delay = await asyncio.to_thread(self.hedge_delay, primary_route)
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    self._record(operation, "hedged")
+                    pending[asyncio.ensure_future(secondary_route.call())] = secondary_route
+                    secondary_route = None
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    route = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        errors.append(e)
+                        logger.warning("%s %s failed: %s", route.provider, route.operation, e)
+                        result = None
+                    else:
+                        if is_valid(result):
+                            self._record(operation, f"won:{route.provider}")
+                            return result
+                        errors.append(LLMResponseError(route.provider, f"Invalid {route.operation} result"))
+
+                    if not pending and secondary_route:
+                        self._record(operation, "fallback")
+                        pending[asyncio.ensure_future(secondary_route.call())] = secondary_route
+                        secondary_route = None
+        finally:
+            # The losing call (or every call, if we were cancelled) must not outlive the request's loop
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        error = errors[-1]
+        raise error if isinstance(error, LLMError) else LLMError(primary_route.provider, str(error))
+
+
+router: ProviderRouter = ProviderRouter(
+    quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+    min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "2")),
+    default_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "15")),
+    max_hedges=int(os.getenv("LLM_HEDGE_MAX_CONCURRENT", "8")),
+)
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from services.sqlite_state import DEFAULT_STATE_PATH, get_connection
+
+
+class SingleFlightError(Exception):
+    """Raised to followers when the leader's call failed."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: one leader runs the function, followers wait for
+    and receive its result. Threads of one process share an in-memory call; processes coordinate
+    through a lease row in the shared SQLite state file. Results must be JSON-serialisable.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        lease_seconds: float = 300,
+        result_ttl: float = 30,
+        poll_interval: float = 0.2,
+        path: str = DEFAULT_STATE_PATH,
+    ):
+        self.namespace = namespace
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.path = path
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._table_ready = False
+
+    # Cross-process coordination
+
+    def _connection(self):
+        conn = get_connection(self.path)
+        if not self._table_ready:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS singleflight_calls (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            self._table_ready = True
+        return conn
+
+    def _claim(self, key: str) -> Tuple[bool, str]:
+        """Returns (is_leader, owner). A running, unexpired row from another process makes us a follower."""
+        now = time.time()
+        owner = uuid.uuid4().hex
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT owner, status, expires_at FROM singleflight_calls WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row and row[1] == "RUNNING" and row[2] > now:
+                conn.execute("COMMIT")
+                return False, row[0]
+
+            conn.execute(
+                "INSERT OR REPLACE INTO singleflight_calls (namespace, key, owner, status, result, expires_at) "
+                "VALUES (?, ?, ?, 'RUNNING', NULL, ?)",
+                (self.namespace, key, owner, now + self.lease_seconds),
+            )
+            # Housekeeping: finished calls only need to outlive their followers' polling
+            conn.execute(
+                "DELETE FROM singleflight_calls WHERE namespace = ? AND expires_at < ?",
+                (self.namespace, now - self.result_ttl),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True, owner
+
+    def _publish(self, key: str, owner: str, result: Any = None, error: Optional[BaseException] = None) -> None:
+        status = "FAILED" if error is not None else "DONE"
+        payload = json.dumps(str(error) if error is not None else result)
+        self._connection().execute(
+            "UPDATE singleflight_calls SET status = ?, result = ?, expires_at = ? "
+            "WHERE namespace = ? AND key = ? AND owner = ?",
+            (status, payload, time.time() + self.result_ttl, self.namespace, key, owner),
+        )
+
+    def _check(self, key: str, owner: str) -> Optional[Tuple[str, Any]]:
+        """None while the leader is running; ('DONE'|'FAILED', payload) when finished; ('LOST', None) if it died."""
+        row = self._connection().execute(
+            "SELECT owner, status, result, expires_at FROM singleflight_calls WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None or row[0] != owner:
+            return "LOST", None
+        if row[1] == "RUNNING":
+            return ("LOST", None) if row[3] <= time.time() else None
+        return row[1], json.loads(row[2])
+
+    def _follow_result(self, outcome: Tuple[str, Any]) -> Any:
+        status, payload = outcome
+        if status == "FAILED":
+            raise SingleFlightError(payload)
+        return payload
+
+    def _run_as_process_leader(self, key: str, fn: Callable[[], Any]) -> Any:
+        while True:
+            is_leader, owner = self._claim(key)
+            if is_leader:
+                try:
+                    result = fn()
+                except BaseException as e:
+                    self._publish(key, owner, error=e)
+                    raise
+                self._publish(key, owner, result=result)
+                return result
+
+            # Another process is running it: wait for its result, or take over if its lease expires
+            outcome = None
+            while outcome is None:
+                time.sleep(self.poll_interval)
+                outcome = self._check(key, owner)
+            if outcome[0] != "LOST":
+                return self._follow_result(outcome)
+
+    # Public API
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_as_process_leader(key, fn)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant: coroutines on the same event loop share one call, processes share through SQLite."""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        future = self._async_calls.get(loop_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[loop_key] = future
+        try:
+            result = await self._arun_as_process_leader(key, fn)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._async_calls.pop(loop_key, None)
+
+    async def _arun_as_process_leader(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            is_leader, owner = await asyncio.to_thread(self._claim, key)
+            if is_leader:
+                try:
+                    result = await fn()
+                except BaseException as e:
+                    await asyncio.to_thread(self._publish, key, owner, None, e)
+                    raise
+                await asyncio.to_thread(self._publish, key, owner, result)
+                return result
+
+            outcome = None
+            while outcome is None:
+                await asyncio.sleep(self.poll_interval)
+                outcome = await asyncio.to_thread(self._check, key, owner)
+            if outcome[0] != "LOST":
+                return self._follow_result(outcome)
@@ -0,0 +1,28 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict
+
+# SQLite file shared by every worker process for cross-process LLM state (caches, rate limit buckets).
+# WAL keeps readers and the single writer out of each other's way.
+DEFAULT_STATE_PATH = os.getenv(
+    "LLM_CACHE_PATH", str(Path(__file__).resolve().parent.parent / "llm_cache.sqlite3")
+)
+
+_local = threading.local()
+
+
+def get_connection(path: str = DEFAULT_STATE_PATH) -> sqlite3.Connection:
+    # sqlite3 connections cannot be shared across threads, keep one per thread and path
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = conn
+    return conn
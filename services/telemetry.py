@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from services.sqlite_state import DEFAULT_STATE_PATH, get_connection
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+STANDARD_COUNTERS: Tuple[str, ...] = (
+    "calls",
+    "latency_sum",
+    "cache_hits",
+    "cache_misses",
+    "prompt_tokens",
+    "completion_tokens",
+    "cost_usd",
+)
+
+# USD per million (input, output) tokens, overridable per provider
+PRICES_PER_MTOK: Dict[str, Tuple[float, float]] = {
+    "mistral": (
+        float(os.getenv("MISTRAL_PRICE_INPUT_PER_MTOK", "0.4")),
+        float(os.getenv("MISTRAL_PRICE_OUTPUT_PER_MTOK", "2.0")),
+    ),
+    "gemini": (
+        float(os.getenv("GEMINI_PRICE_INPUT_PER_MTOK", "0.3")),
+        float(os.getenv("GEMINI_PRICE_OUTPUT_PER_MTOK", "2.5")),
+    ),
+}
+
+Series = Tuple[str, str]  # (provider, operation)
+
+
+class LLMTelemetry:
+    """
+    Aggregates per (provider, operation) counters in memory and periodically adds them to the shared
+    SQLite state file, so the metrics endpoint reports totals across every worker process.
+    Counters are flat names: calls, errors:<class>, cache_hits, cache_misses, prompt_tokens,
+    completion_tokens, cost_usd, latency_sum, latency_bucket:<le>.
+    """
+
+    def __init__(self, flush_interval: float = 10.0, path: str = DEFAULT_STATE_PATH):
+        self.flush_interval = flush_interval
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: Dict[Series, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._last_flush = time.monotonic()
+        self._table_ready = False
+
+    def _add(self, series: Series, counters: Dict[str, float]) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                self._pending[series][name] += value
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def record_call(self, provider: str, operation: str, latency: float, error: Optional[Exception] = None) -> None:
+        counters = {"calls": 1, "latency_sum": latency}
+        for bound in LATENCY_BUCKETS:
+            if latency <= bound:
+                counters[f"latency_bucket:{bound}"] = 1
+        counters["latency_bucket:+Inf"] = 1
+        if error is not None:
+            counters[f"errors:{type(error).__name__}"] = 1
+        self._add((provider, operation), counters)
+
+    def record_usage(self, provider: str, operation: str, prompt_tokens: int, completion_tokens: int) -> None:
+        input_price, output_price = PRICES_PER_MTOK.get(provider, (0.0, 0.0))
+        cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+        self._add(
+            (provider, operation),
+            {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "cost_usd": cost},
+        )
+
+    def record_counter(self, provider: str, operation: str, name: str, value: float = 1) -> None:
+        self._add((provider, operation), {name: value})
+
+    def record_cache(self, provider: str, operation: str, hit: bool) -> None:
+        self._add((provider, operation), {"cache_hits" if hit else "cache_misses": 1})
+
+    def _connection(self):
+        conn = get_connection(self.path)
+        if not self._table_ready:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_metrics (
+                    provider TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (provider, operation, name)
+                )
+                """
+            )
+            self._table_ready = True
+        return conn
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: defaultdict(float))
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        rows = [
+            (provider, operation, name, value)
+            for (provider, operation), counters in pending.items()
+            for name, value in counters.items()
+        ]
+        conn = self._connection()
+        try:
+            conn.executemany(
+                "INSERT INTO llm_metrics (provider, operation, name, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (provider, operation, name) DO UPDATE SET value = value + excluded.value",
+                rows,
+            )
+        except Exception:
+            # Metrics must never break an LLM call: keep the deltas for the next flush
+            with self._lock:
+                for (provider, operation), counters in pending.items():
+                    for name, value in counters.items():
+                        self._pending[(provider, operation)][name] += value
+
+    def totals(self) -> Dict[Series, Dict[str, float]]:
+        self.flush()
+        totals: Dict[Series, Dict[str, float]] = defaultdict(dict)
+        for provider, operation, name, value in self._connection().execute(
+            "SELECT provider, operation, name, value FROM llm_metrics"
+        ):
+            totals[(provider, operation)][name] = value
+        return totals
+
+    def latency_quantile(self, provider: str, operation: str, quantile: float) -> Optional[float]:
+        """Upper bucket bound below which `quantile` of the calls finished, None without data."""
+        counters = self.totals().get((provider, operation), {})
+        total = counters.get("latency_bucket:+Inf", 0)
+        if not total:
+            return None
+        for bound in LATENCY_BUCKETS:
+            if counters.get(f"latency_bucket:{bound}", 0) >= quantile * total:
+                return bound
+        return None
+
+    def snapshot(self) -> List[Dict]:
+        series = []
+        for (provider, operation), counters in sorted(self.totals().items()):
+            calls = counters.get("calls", 0)
+            series.append(
+                {
+                    "provider": provider,
+                    "operation": operation,
+                    "calls": int(calls),
+                    "errors": {
+                        name.split(":", 1)[1]: int(value)
+                        for name, value in counters.items()
+                        if name.startswith("errors:")
+                    },
+                    "cache_hits": int(counters.get("cache_hits", 0)),
+                    "cache_misses": int(counters.get("cache_misses", 0)),
+                    "prompt_tokens": int(counters.get("prompt_tokens", 0)),
+                    "completion_tokens": int(counters.get("completion_tokens", 0)),
+                    "cost_usd": round(counters.get("cost_usd", 0.0), 6),
+                    "latency_avg": round(counters.get("latency_sum", 0.0) / calls, 3) if calls else None,
+                    "latency_buckets": {
+                        name.split(":", 1)[1]: int(value)
+                        for name, value in counters.items()
+                        if name.startswith("latency_bucket:")
+                    },
+                    "latency_sum": round(counters.get("latency_sum", 0.0), 3),
+                    # Free-form counters, e.g. the router's hedged / fallback / won:<provider>
+                    "events": {
+                        name: int(value)
+                        for name, value in counters.items()
+                        if name not in STANDARD_COUNTERS and not name.startswith(("errors:", "latency_bucket:"))
+                    },
+                }
+            )
+        return series
+
+
+def to_prometheus(series: List[Dict]) -> str:
+    lines = [
+        "# TYPE llm_calls_total counter",
+        "# TYPE llm_errors_total counter",
+        "# TYPE llm_cache_requests_total counter",
+        "# TYPE llm_tokens_total counter",
+        "# TYPE llm_cost_usd_total counter",
+        "# TYPE llm_latency_seconds histogram",
+        "# TYPE llm_events_total counter",
+    ]
+    for item in series:
+        labels = f'provider="{item["provider"]}",operation="{item["operation"]}"'
+        lines.append(f"llm_calls_total{{{labels}}} {item['calls']}")
+        for error_class, count in sorted(item["errors"].items()):
+            lines.append(f'llm_errors_total{{{labels},error="{error_class}"}} {count}')
+        lines.append(f'llm_cache_requests_total{{{labels},result="hit"}} {item["cache_hits"]}')
+        lines.append(f'llm_cache_requests_total{{{labels},result="miss"}} {item["cache_misses"]}')
+        lines.append(f'llm_tokens_total{{{labels},type="prompt"}} {item["prompt_tokens"]}')
+        lines.append(f'llm_tokens_total{{{labels},type="completion"}} {item["completion_tokens"]}')
+        lines.append(f"llm_cost_usd_total{{{labels}}} {item['cost_usd']}")
+        for bound in [str(b) for b in LATENCY_BUCKETS] + ["+Inf"]:
+            count = item["latency_buckets"].get(bound, 0)
+            lines.append(f'llm_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f"llm_latency_seconds_sum{{{labels}}} {item['latency_sum']}")
+        lines.append(f"llm_latency_seconds_count{{{labels}}} {item['calls']}")
+        for event, count in sorted(item["events"].items()):
+            lines.append(f'llm_events_total{{{labels},event="{event}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+telemetry: LLMTelemetry = LLMTelemetry(
+    flush_interval=float(os.getenv("LLM_TELEMETRY_FLUSH_INTERVAL", "10"))
+)
@@ -0,0 +1,779 @@
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+from tenacity import wait_none
+
+from services.batch import TERMINAL_STATUSES, LocalBatchBackend, MistralBatchBackend, interactive_responder, write_jsonl
+from services.cache import DiskCache
+from services.errors import LLMError, LLMRateLimitError, LLMRequestError, LLMResponseError
+from services.mistral_service import MistralClient
+from services.rate_limit import ProviderPolicy, TokenBucket
+from services.registry import ProviderRegistry
+from services.router import ProviderRouter, Route
+from services.singleflight import SingleFlight, SingleFlightError, _Call
+from services.sqlite_state import get_connection
+from services.telemetry import LLMTelemetry
+
+
+class StateFileTestCase(SimpleTestCase):
+    """Points the SQLite-backed helpers at a throwaway state file and stubs out telemetry."""
+
+    telemetry_modules = ("services.router", "services.rate_limit")
+
+    def setUp(self):
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        self.state_path = os.path.join(state.name, "state.sqlite3")
+        self.telemetry = mock.Mock()
+        self.telemetry.latency_quantile.return_value = None
+        for module in self.telemetry_modules:
+            patcher = mock.patch(f"{module}.telemetry", self.telemetry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class Clock:
+    """Controlled time.time() / time.monotonic()."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeProvider:
+    """A provider call that records its invocations and can be held until the test releases it."""
+
+    def __init__(self, result: Any = None, error: Exception = None, hold: bool = False):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def __call__(self) -> Any:
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class ProviderRegistryTests(SimpleTestCase):
+    def test_every_caller_gets_the_one_instance_built(self):
+        built = []
+        start = threading.Barrier(8)
+
+        def factory():
+            built.append(object())
+            return built[-1]
+
+        registry = ProviderRegistry()
+        registry.register("mistral", factory)
+        instances = []
+
+        def get():
+            start.wait(5)
+            instances.append(registry.get("mistral"))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(built), 1)
+        self.assertEqual({id(instance) for instance in instances}, {id(built[0])})
+
+    def test_reset_and_register_drop_the_cached_instance(self):
+        registry = ProviderRegistry()
+        registry.register("mistral", object)
+        first = registry.get("mistral")
+        registry.reset()
+        second = registry.get("mistral")
+        self.assertIsNot(first, second)
+
+        registry.register("mistral", lambda: "replacement")
+        self.assertEqual(registry.get("mistral"), "replacement")
+
+
+class ProviderRouterTests(StateFileTestCase):
+    def router(self, delay: float, max_hedges: int = 8) -> ProviderRouter:
+        router = ProviderRouter(max_workers=4, max_hedges=max_hedges)
+        router.hedge_delay = lambda route: delay
+        return router
+
+    def counters(self) -> List[str]:
+        return [call.args[2] for call in self.telemetry.record_counter.call_args_list]
+
+    def test_primary_answering_in_time_cancels_the_hedge(self):
+        primary, secondary = FakeProvider({"town": "Lyon"}), FakeProvider({"town": "Nice"})
+        result = self.router(delay=5).run(Route("mistral", "chat", primary), Route("gemini", "chat", secondary))
+
+        self.assertEqual(result, {"town": "Lyon"})
+        self.assertEqual(secondary.calls, 0)
+        self.assertEqual(self.counters(), ["won:mistral"])
+
+    def test_slow_primary_is_hedged_and_the_first_valid_result_wins(self):
+        primary, secondary = FakeProvider({"town": "Lyon"}, hold=True), FakeProvider({"town": "Nice"})
+        result = self.router(delay=0).run(Route("mistral", "chat", primary), Route("gemini", "chat", secondary))
+        primary.release.set()
+
+        self.assertEqual(result, {"town": "Nice"})
+        self.assertEqual(self.counters(), ["hedged", "won:gemini"])
+
+    def test_no_hedge_is_fired_while_every_hedge_slot_is_taken(self):
+        router = self.router(delay=0, max_hedges=1)
+        primary, secondary = FakeProvider({"town": "Lyon"}, hold=True), FakeProvider({"town": "Nice"}, hold=True)
+        first = threading.Thread(
+            target=router.run, args=(Route("mistral", "chat", primary), Route("gemini", "chat", secondary))
+        )
+        first.start()
+        self.assertTrue(secondary.started.wait(5))
+
+        late_primary, late_secondary = FakeProvider({"town": "Paris"}, hold=True), FakeProvider({"town": "Lille"})
+        threading.Timer(0.1, late_primary.release.set).start()
+        result = router.run(Route("mistral", "chat", late_primary), Route("gemini", "chat", late_secondary))
+        primary.release.set()
+        secondary.release.set()
+        first.join(5)
+
+        self.assertEqual(result, {"town": "Paris"})
+        self.assertEqual(late_secondary.calls, 0)
+        self.assertIn("hedge_skipped", self.counters())
+
+    def test_without_hedging_the_secondary_only_runs_as_fallback(self):
+        primary, secondary = FakeProvider({"town": "Lyon"}), FakeProvider({"town": "Nice"})
+        result = self.router(delay=0).run(
+            Route("mistral", "chat", primary), Route("gemini", "chat", secondary), hedge=False
+        )
+        self.assertEqual(result, {"town": "Lyon"})
+        self.assertEqual(secondary.calls, 0)
+
+    def test_classified_error_falls_back_to_the_secondary(self):
+        primary = FakeProvider(error=LLMRateLimitError("mistral", "Too many requests", 429))
+        secondary = FakeProvider({"town": "Nice"})
+        with self.assertLogs("services.router", "WARNING"):
+            result = self.router(delay=5).run(Route("mistral", "chat", primary), Route("gemini", "chat", secondary))
+
+        self.assertEqual(result, {"town": "Nice"})
+        self.assertEqual(self.counters(), ["fallback", "won:gemini"])
+
+    def test_invalid_result_falls_back_and_last_error_is_raised(self):
+        primary = FakeProvider({})
+        secondary = FakeProvider(error=LLMRequestError("gemini", "Bad request", 400))
+        with self.assertLogs("services.router", "WARNING"), self.assertRaises(LLMRequestError):
+            self.router(delay=5).run(Route("mistral", "chat", primary), Route("gemini", "chat", secondary))
+
+    def test_unclassified_errors_are_wrapped(self):
+        primary = FakeProvider(error=ValueError("boom"))
+        with self.assertLogs("services.router", "WARNING"), self.assertRaises(LLMError) as raised:
+            self.router(delay=5).run(Route("mistral", "chat", primary))
+        self.assertEqual(raised.exception.provider, "mistral")
+
+    def test_hedge_delay_follows_the_observed_quantile(self):
+        router = ProviderRouter(min_delay=2.0, default_delay=15.0, max_workers=1)
+        route = Route("mistral", "chat", lambda: None)
+        clock = Clock()
+        with mock.patch("services.router.time.monotonic", clock):
+            self.assertEqual(router.hedge_delay(route), 15.0)
+
+            self.telemetry.latency_quantile.return_value = 0.5
+            # Cached for 30 seconds
+            self.assertEqual(router.hedge_delay(route), 15.0)
+            clock.advance(31)
+            self.assertEqual(router.hedge_delay(route), 2.0)
+
+            self.telemetry.latency_quantile.return_value = 10.0
+            clock.advance(31)
+            self.assertEqual(router.hedge_delay(route), 10.0)
+
+    def test_async_hedge_and_fallback(self):
+        router = self.router(delay=0)
+
+        async def scenario():
+            primary_release = asyncio.Event()
+
+            async def slow_primary():
+                await primary_release.wait()
+                return {"town": "Lyon"}
+
+            async def secondary():
+                return {"town": "Nice"}
+
+            async def failing():
+                raise LLMRateLimitError("mistral", "Too many requests", 429)
+
+            hedged = await router.arun(("mistral", "chat", slow_primary), ("gemini", "chat", secondary))
+            primary_release.set()
+            with self.assertLogs("services.router", "WARNING"):
+                fallback = await router.arun(("mistral", "chat", failing), ("gemini", "chat", secondary), hedge=False)
+            return hedged, fallback
+
+        self.assertEqual(asyncio.run(scenario()), ({"town": "Nice"}, {"town": "Nice"}))
+
+
+    def test_async_losing_route_is_cancelled(self):
+        router = self.router(delay=0)
+        cancelled = []
+
+        async def scenario():
+            async def slow_primary():
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append("mistral")
+                    raise
+                return {"town": "Lyon"}
+
+            async def secondary():
+                return {"town": "Nice"}
+
+            result = await router.arun(("mistral", "chat", slow_primary), ("gemini", "chat", secondary))
+            # Already cancelled when arun returns, not when asyncio.run tears the loop down
+            return result, list(cancelled)
+
+        self.assertEqual(asyncio.run(scenario()), ({"town": "Nice"}, ["mistral"]))
+
+
+class SingleFlightTests(StateFileTestCase):
+    def flight(self, **kwargs) -> SingleFlight:
+        return SingleFlight("test", poll_interval=0.01, path=self.state_path, **kwargs)
+
+    def run_concurrently(self, flight: SingleFlight, fn: FakeProvider, count: int) -> List[Any]:
+        """
+        Calls flight.do("key", fn) from `count` threads and releases fn only once every other thread is
+        waiting on the leader's call. Returns each thread's result or exception.
+        """
+        outcomes: List[Any] = [None] * count
+        waiting = threading.Semaphore(0)
+
+        class ObservedCall(_Call):
+            def __init__(self):
+                super().__init__()
+                done_wait = self.done.wait
+
+                def wait(*args) -> bool:
+                    waiting.release()
+                    return done_wait(*args)
+
+                self.done.wait = wait
+
+        def call(index: int) -> None:
+            try:
+                outcomes[index] = flight.do("key", fn)
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+        with mock.patch("services.singleflight._Call", ObservedCall):
+            for thread in threads:
+                thread.start()
+            self.assertTrue(fn.started.wait(5))
+            for _ in range(count - 1):
+                self.assertTrue(waiting.acquire(timeout=5))
+            fn.release.set()
+            for thread in threads:
+                thread.join(5)
+        return outcomes
+
+    def test_concurrent_calls_share_the_leader_result(self):
+        leader = FakeProvider({"town": "Lyon"}, hold=True)
+        outcomes = self.run_concurrently(self.flight(), leader, 4)
+
+        self.assertEqual(leader.calls, 1)
+        self.assertEqual(outcomes, [{"town": "Lyon"}] * 4)
+
+    def test_leader_failure_propagates_to_waiters(self):
+        flight = self.flight()
+        leader = FakeProvider(error=LLMRateLimitError("mistral", "Too many requests", 429), hold=True)
+        outcomes = self.run_concurrently(flight, leader, 3)
+
+        self.assertEqual(leader.calls, 1)
+        self.assertTrue(all(isinstance(outcome, LLMRateLimitError) for outcome in outcomes))
+        # The failure is not cached: the next call runs again
+        self.assertEqual(flight.do("key", lambda: "retried"), "retried")
+
+    def test_follower_of_another_process_receives_its_result_or_error(self):
+        flight = self.flight()
+        provider = FakeProvider("not called")
+        for outcome in ({"result": {"town": "Lyon"}}, {"error": LLMError("mistral", "quota exceeded")}):
+            # Another process holds the lease on "key"
+            _, owner = flight._claim("key")
+            polling = threading.Event()
+            check = flight._check
+            received: List[Any] = []
+
+            def follow() -> None:
+                try:
+                    received.append(flight.do("key", provider))
+                except SingleFlightError as e:
+                    received.append(e)
+
+            with mock.patch.object(flight, "_check", lambda *args: polling.set() or check(*args)):
+                thread = threading.Thread(target=follow)
+                thread.start()
+                self.assertTrue(polling.wait(5))
+                flight._publish("key", owner, **outcome)
+                thread.join(5)
+
+            if "result" in outcome:
+                self.assertEqual(received, [{"town": "Lyon"}])
+            else:
+                self.assertIsInstance(received[0], SingleFlightError)
+                self.assertIn("quota exceeded", str(received[0]))
+        self.assertEqual(provider.calls, 0)
+
+    def test_expired_lease_is_taken_over(self):
+        flight = self.flight(lease_seconds=60)
+        clock = Clock()
+        with mock.patch("services.singleflight.time.time", clock):
+            flight._claim("key")
+            # The other process died: its lease runs out
+            clock.advance(61)
+            provider = FakeProvider("recomputed")
+            self.assertEqual(flight.do("key", provider), "recomputed")
+        self.assertEqual(provider.calls, 1)
+
+    def test_async_calls_on_one_loop_are_coalesced(self):
+        flight = self.flight()
+        calls = []
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def fetch():
+                calls.append(1)
+                await release.wait()
+                return "shared"
+
+            tasks = [asyncio.ensure_future(flight.ado("key", fetch)) for _ in range(3)]
+            while not calls:
+                await asyncio.sleep(0)
+            release.set()
+            return await asyncio.gather(*tasks)
+
+        self.assertEqual(asyncio.run(scenario()), ["shared"] * 3)
+        self.assertEqual(len(calls), 1)
+
+
+class TokenBucketTests(StateFileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.clock = Clock()
+        patcher = mock.patch("services.rate_limit.time.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refills_at_the_configured_rate(self):
+        bucket = TokenBucket("mistral:rpm", capacity=2, per_seconds=60, path=self.state_path)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 30)
+
+        self.clock.advance(30)
+        self.assertEqual(bucket.try_acquire(), 0)
+        # Never refills beyond capacity
+        self.clock.advance(600)
+        self.assertEqual(bucket.try_acquire(2), 0)
+        self.assertGreater(bucket.try_acquire(), 0)
+
+    def test_state_is_shared_between_instances(self):
+        first = TokenBucket("gemini:tpm", capacity=1000, per_seconds=60, path=self.state_path)
+        second = TokenBucket("gemini:tpm", capacity=1000, per_seconds=60, path=self.state_path)
+        self.assertEqual(first.try_acquire(800), 0)
+        self.assertAlmostEqual(second.try_acquire(400), 200 / (1000 / 60))
+
+    def test_oversized_request_waits_for_a_full_bucket(self):
+        bucket = TokenBucket("mistral:tpm", capacity=100, per_seconds=60, path=self.state_path)
+        self.assertEqual(bucket.try_acquire(50), 0)
+        self.assertAlmostEqual(bucket.try_acquire(500), 30)
+        self.clock.advance(30)
+        self.assertEqual(bucket.try_acquire(500), 0)
+
+    def test_concurrent_acquires_never_overdraw(self):
+        bucket = TokenBucket("mistral:rpm", capacity=20, per_seconds=60, path=self.state_path)
+        granted = []
+
+        def take():
+            for _ in range(10):
+                granted.append(bucket.try_acquire() == 0)
+
+        threads = [threading.Thread(target=take) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(granted.count(True), 20)
+
+
+class ProviderPolicyTests(StateFileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = ProviderPolicy("mistral", rpm=100, tpm=10_000, max_attempts=3)
+        self.policy.requests = TokenBucket("mistral:rpm", 100, path=self.state_path)
+        self.policy.tokens = TokenBucket("mistral:tpm", 10_000, path=self.state_path)
+        patcher = mock.patch("services.rate_limit.wait_random_exponential", return_value=wait_none())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def failing(self, *errors: Exception) -> Callable[[], str]:
+        remaining = list(errors)
+
+        def call() -> str:
+            if remaining:
+                raise remaining.pop(0)
+            return "ok"
+
+        return call
+
+    def test_retryable_errors_are_retried(self):
+        server_error = type("SDKError", (Exception,), {"status_code": 503})("unavailable")
+        with self.assertLogs("services.rate_limit", "WARNING"):
+            self.assertEqual(self.policy.call(self.failing(server_error, server_error), operation="chat"), "ok")
+        errors = [call.args[3] for call in self.telemetry.record_call.call_args_list if len(call.args) > 3]
+        self.assertEqual([type(error).__name__ for error in errors], ["LLMServerError", "LLMServerError"])
+
+    def test_non_retryable_errors_are_raised_at_once(self):
+        bad_request = type("SDKError", (Exception,), {"status_code": 400})("bad request")
+        with self.assertRaises(LLMRequestError):
+            self.policy.call(self.failing(bad_request, bad_request))
+        self.assertEqual(self.telemetry.record_call.call_count, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        rate_limited = LLMRateLimitError("mistral", "Too many requests", 429)
+        with self.assertLogs("services.rate_limit", "WARNING"), self.assertRaises(LLMRateLimitError):
+            self.policy.call(self.failing(*[rate_limited] * 5))
+        self.assertEqual(self.telemetry.record_call.call_count, 3)
+
+    def test_unusable_answers_are_not_retried(self):
+        with self.assertRaises(LLMResponseError):
+            self.policy.call(self.failing(ValueError("no status")))
+
+
+def fill_cache(path: str, worker: int, count: int) -> None:
+    # Runs in a separate process: its own connection to the shared file
+    cache = DiskCache("shared", ttl=600, max_entries=1000, path=path)
+    for index in range(count):
+        cache.set(f"{worker}:{index}", {"worker": worker, "index": index})
+        cache.get(f"{worker}:{index // 2}")
+
+
+class DiskCacheTests(StateFileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.clock = Clock()
+        patcher = mock.patch("services.cache.time.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache(self, namespace: str = "test", ttl: int = 60, max_entries: int = 10) -> DiskCache:
+        return DiskCache(namespace, ttl=ttl, max_entries=max_entries, path=self.state_path)
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = self.cache(ttl=60)
+        cache.set("default", {"answer": 42})
+        cache.set("short", "brief", ttl=5)
+
+        self.clock.advance(5)
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.get("default"), {"answer": 42})
+        self.clock.advance(55)
+        self.assertIsNone(cache.get("default"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "size": 0})
+
+    def test_least_recently_used_entries_are_evicted_first(self):
+        cache = self.cache(max_entries=3)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+            self.clock.advance(1)
+        # Reading "a" makes "b" the least recently used
+        self.assertEqual(cache.get("a"), "a")
+        self.clock.advance(1)
+
+        cache.set("d", "d")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual([cache.get(key) for key in ("a", "c", "d")], ["a", "c", "d"])
+
+        self.clock.advance(1)
+        cache.set("e", "e")
+        # "a" was read before "c" and "d" in the line above
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 3)
+
+    def test_expired_entries_are_purged_before_evicting_live_ones(self):
+        cache = self.cache(max_entries=2)
+        cache.set("stale", 1, ttl=1)
+        cache.set("live", 2)
+        self.clock.advance(2)
+        cache.set("new", 3)
+        self.assertEqual((cache.get("live"), cache.get("new")), (2, 3))
+
+    def test_namespaces_are_isolated(self):
+        first, second = self.cache("first", max_entries=1), self.cache("second", max_entries=1)
+        first.set("key", "first")
+        second.set("key", "second")
+        second.set("other", "second")
+        self.assertEqual(first.get("key"), "first")
+        first.clear()
+        self.assertEqual(second.get("other"), "second")
+
+    def test_concurrent_get_and_set_from_threads(self):
+        cache = self.cache(max_entries=50)
+        errors: List[Exception] = []
+
+        def work(worker: int) -> None:
+            try:
+                for index in range(40):
+                    cache.set(f"{worker}:{index}", index)
+                    cache.get(f"{worker}:{index}")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.stats()["size"], 50)
+        self.assertEqual(cache.stats()["hits"] + cache.stats()["misses"], 160)
+
+
+class SharedStateFileTests(StateFileTestCase):
+    def test_connection_per_thread_in_wal_mode(self):
+        conn = get_connection(self.state_path)
+        self.assertIs(get_connection(self.state_path), conn)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+        other: List[Any] = []
+        thread = threading.Thread(target=lambda: other.append(get_connection(self.state_path)))
+        thread.start()
+        thread.join(5)
+        self.assertIsNot(other[0], conn)
+
+    def test_processes_share_the_cache(self):
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=fill_cache, args=(self.state_path, worker, 25)) for worker in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        self.assertEqual([process.exitcode for process in processes], [0, 0, 0])
+
+        cache = DiskCache("shared", ttl=600, max_entries=1000, path=self.state_path)
+        self.assertEqual(cache.stats()["size"], 75)
+        self.assertEqual(cache.get("2:24"), {"worker": 2, "index": 24})
+
+
+class LLMTelemetryTests(StateFileTestCase):
+    def test_workers_add_up_in_the_state_file(self):
+        # Two worker processes, each with its own in-memory counters
+        first = LLMTelemetry(flush_interval=60, path=self.state_path)
+        second = LLMTelemetry(flush_interval=60, path=self.state_path)
+        first.record_call("mistral", "chat", 0.3)
+        first.record_usage("mistral", "chat", prompt_tokens=1_000_000, completion_tokens=0)
+        first.record_cache("mistral", "chat", hit=False)
+        first.flush()
+        second.record_call("mistral", "chat", 3.0, error=LLMRateLimitError("mistral", "Too many requests", 429))
+        second.record_cache("mistral", "chat", hit=True)
+        second.record_counter("mistral", "chat", "hedged")
+
+        [series] = second.snapshot()
+        self.assertEqual(series["calls"], 2)
+        self.assertEqual(series["errors"], {"LLMRateLimitError": 1})
+        self.assertEqual((series["cache_hits"], series["cache_misses"]), (1, 1))
+        self.assertEqual(series["latency_avg"], 1.65)
+        self.assertEqual((series["latency_buckets"]["0.5"], series["latency_buckets"]["5"]), (1, 2))
+        self.assertEqual(series["events"], {"hedged": 1})
+        self.assertEqual(second.latency_quantile("mistral", "chat", 0.5), 0.5)
+        self.assertEqual(first.latency_quantile("gemini", "chat", 0.5), None)
+
+    def test_metrics_endpoint(self):
+        telemetry = LLMTelemetry(path=self.state_path)
+        telemetry.record_call("gemini", "search", 0.2)
+        client = APIClient()
+        with mock.patch("circus_agent_backend.metrics.telemetry", telemetry):
+            response = client.get("/api/metrics/llm/")
+            scrape = client.get("/api/metrics/llm/?format=prometheus")
+
+        self.assertEqual([(s["provider"], s["calls"]) for s in response.json()["series"]], [("gemini", 1)])
+        self.assertEqual(scrape["Content-Type"], "text/plain; charset=utf-8")
+        body = scrape.content.decode()
+        self.assertIn('llm_calls_total{provider="gemini",operation="search"} 1', body)
+        self.assertIn('llm_latency_seconds_bucket{provider="gemini",operation="search",le="0.25"} 1', body)
+
+
+class LocalBatchBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_input(self, *prompts: str) -> str:
+        path = os.path.join(self.directory, "input.jsonl")
+        with open(path, "w", encoding="utf-8") as fh:
+            requests = (
+                {"custom_id": str(index), "body": {"messages": [{"role": "user", "content": prompt}]}}
+                for index, prompt in enumerate(prompts)
+            )
+            self.assertEqual(write_jsonl(requests, fh), len(prompts))
+            fh.write("\n")
+        return path
+
+    def test_answers_each_request_in_the_provider_format(self):
+        def respond(body: Dict[str, Any]) -> str:
+            prompt = body["messages"][-1]["content"]
+            if prompt == "fail":
+                raise LLMError("local", "refused")
+            return prompt.upper()
+
+        backend = LocalBatchBackend(respond, directory=self.directory)
+        job = backend.submit(self.write_input("lyon", "fail", "nice"))
+
+        self.assertEqual((job.status, job.total_requests, job.completed_requests), ("SUCCESS", 3, 3))
+        self.assertIn(job.status, TERMINAL_STATUSES)
+        self.assertEqual(backend.get(job.id), job)
+
+        results = list(backend.results(job))
+        self.assertEqual([r["custom_id"] for r in results], ["0", "1", "2"])
+        self.assertEqual(results[0]["response"]["body"]["choices"][0]["message"]["content"], "LYON")
+        self.assertIsNone(results[0]["error"])
+        self.assertIsNone(results[1]["response"])
+        self.assertIn("refused", results[1]["error"]["message"])
+
+    def test_interactive_responder_forwards_messages_and_arguments(self):
+        chat = mock.Mock(return_value="answer")
+        respond = interactive_responder(mock.Mock(chat=chat))
+        body = {
+            "messages": [{"role": "system", "content": "rules"}, {"role": "user", "content": "question"}],
+            "temperature": 0.2,
+        }
+        self.assertEqual(respond(body), "answer")
+        chat.assert_called_once_with(prompt="question", system="rules", cache_policy="enrich", temperature=0.2)
+
+
+def mistral_client(sdk: Any, state_path: str) -> MistralClient:
+    """A MistralClient over a fake SDK, with its cache and rate limits in the test's state file."""
+    client = MistralClient.__new__(MistralClient)
+    client.client = sdk
+    client.model = "mistral-test"
+    client.chat_cache = DiskCache("mistral_chat", ttl=60, max_entries=10, path=state_path)
+    client.policy = ProviderPolicy("mistral", rpm=100, tpm=100_000, max_attempts=1)
+    client.policy.requests = TokenBucket("mistral:rpm", 100, path=state_path)
+    client.policy.tokens = TokenBucket("mistral:tpm", 100_000, path=state_path)
+    return client
+
+
+def stream_event(content: str) -> SimpleNamespace:
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(data=SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)]))
+
+
+class FakeAsyncStream:
+    def __init__(self, chunks: List[str]):
+        self.chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield stream_event(chunk)
+
+
+class MistralAsyncStreamTests(StateFileTestCase):
+    telemetry_modules = StateFileTestCase.telemetry_modules + ("services.mistral_service",)
+
+    def test_deltas_are_yielded_then_cached(self):
+        opened = []
+
+        async def stream_async(**kwargs):
+            opened.append(kwargs)
+            return FakeAsyncStream(["Bon", "jour"])
+
+        client = mistral_client(SimpleNamespace(chat=SimpleNamespace(stream_async=stream_async)), self.state_path)
+
+        async def collect(**kwargs) -> List[str]:
+            return [chunk async for chunk in client.astream_chat("Write", cache_policy="application_mail", **kwargs)]
+
+        self.assertEqual(asyncio.run(collect()), ["Bon", "jour"])
+        # The completed stream is cached and replayed as one chunk, regenerate streams again
+        self.assertEqual(asyncio.run(collect()), ["Bonjour"])
+        self.assertEqual(asyncio.run(collect(regenerate=True)), ["Bon", "jour"])
+        self.assertEqual(len(opened), 2)
+
+
+class MistralBatchBackendTests(StateFileTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch("services.rate_limit.wait_random_exponential", return_value=wait_none())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.input_path = os.path.join(os.path.dirname(self.state_path), "input.jsonl")
+        with open(self.input_path, "w", encoding="utf-8") as fh:
+            write_jsonl([{"custom_id": "1", "body": {"messages": []}}], fh)
+
+    def test_retried_upload_sends_the_whole_file(self):
+        uploads: List[bytes] = []
+
+        def upload(file, purpose):
+            uploads.append(file.content.read())
+            if len(uploads) == 1:
+                raise type("SDKError", (Exception,), {"status_code": 503})("upload interrupted")
+            return SimpleNamespace(id="file-1")
+
+        job = SimpleNamespace(id="job-1", status="QUEUED", total_requests=1, completed_requests=0, output_file=None)
+        sdk = SimpleNamespace(
+            files=SimpleNamespace(upload=upload),
+            batch=SimpleNamespace(jobs=SimpleNamespace(create=mock.Mock(return_value=job))),
+        )
+        client = mistral_client(sdk, self.state_path)
+        client.policy.max_attempts = 2
+
+        with self.assertLogs("services.rate_limit", "WARNING"):
+            submitted = MistralBatchBackend(client).submit(self.input_path)
+
+        with open(self.input_path, "rb") as fh:
+            self.assertEqual(uploads, [fh.read()] * 2)
+        self.assertEqual(submitted.id, "job-1")
+        self.assertEqual(sdk.batch.jobs.create.call_args.kwargs["input_files"], ["file-1"])
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_workers_boot_without_the_llm_sdks(self):
+        # A fresh interpreter, as a web worker: load the application and every view through the URLconf
+        code = (
+            "import sys, circus_agent_backend.wsgi; "
+            "from django.urls import get_resolver; get_resolver().url_patterns; "
+            "print(','.join(m for m in ('mistralai', 'google.genai', 'httpx', 'pandas') if m in sys.modules))"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(out.stdout.strip(), "")
@@ -0,0 +1,3 @@
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for Latin-script text, good enough for budgeting without a tokenizer
+    return len(text) // 4 + 1 if text else 0